@@ -8,70 +8,402 @@ This module implements the Microsoft Agent Framework integration for:
 - Tool calling for canvas operations
 """
 
+import asyncio
+import hashlib
 import json
 import logging
-from typing import Any, Dict, List, Optional, Annotated, Union
+import random
+import re
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from types import MappingProxyType
+from typing import Any, Deque, Dict, List, Optional, Annotated, Tuple, Union
 
 from datetime import datetime
+from functools import lru_cache
 
 from pydantic import Field
-from typing import Any as TypingAny, cast
+from typing import Any as TypingAny
+
+from app.core.compat import apply_agent_framework_shim
+from app.core.serialization import dumps, extract_json_object, loads
+from app.deps import get_mcp_bicep_tool, get_mcp_terraform_tool
+
 try:
-    from agent_framework import ChatAgent, ChatMessage, TextContent, UriContent
-except Exception:
-    # Optional dependencies - allow module to be imported in environments
-    # where the agent_framework packages are not installed. Provide
-    # lightweight placeholders so code that instantiates message helpers works.
-    ChatAgent = None
-
-    class ChatMessage:
-        def __init__(self, role=None, contents=None):
-            # contents is expected to be a sequence of content objects
-            self.role = role
-            self.contents = contents or []
-
-        def __repr__(self):
-            return f"ChatMessage(role={self.role!r}, contents={self.contents!r})"
-
-    class TextContent:
-        def __init__(self, text: str):
-            self.text = text
-
-        def __repr__(self):
-            return f"TextContent(text={self.text!r})"
-
-    class UriContent:
-        def __init__(self, uri: str, media_type: str = None):
-            self.uri = uri
-            self.media_type = media_type
-
-        def __repr__(self):
-            return f"UriContent(uri={self.uri!r}, media_type={self.media_type!r})"
-
-    class AzureAIAgentClient:  # placeholder
-        pass
-
-    class OpenAIAssistantsClient:  # placeholder
-        pass
-
-    class OpenAIResponsesClient:  # placeholder
-        pass
-
-# To keep static type checkers happy in environments where the real
-# agent_framework types differ or aren't installed, normalize the names to
-# a permissive Any type for internal use. This avoids brittle type-mismatch
-# errors from the analyzer while preserving runtime behavior.
-ChatAgent = TypingAny if ChatAgent is None else ChatAgent
-ChatMessage = TypingAny if ChatMessage is None else ChatMessage
-TextContent = TypingAny if TextContent is None else TextContent
-UriContent = TypingAny if UriContent is None else UriContent
-AzureAIAgentClient = cast(TypingAny, globals().get('AzureAIAgentClient') or TypingAny)
-OpenAIAssistantsClient = cast(TypingAny, globals().get('OpenAIAssistantsClient') or TypingAny)
-OpenAIResponsesClient = cast(TypingAny, globals().get('OpenAIResponsesClient') or TypingAny)
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+    _TRANSIENT_ERRORS: Tuple[type, ...] = (
+        ConnectionError, asyncio.TimeoutError, APIConnectionError, InternalServerError, RateLimitError
+    )
+except ImportError:  # pragma: no cover - openai is optional for Azure AI agent clients
+    _TRANSIENT_ERRORS = (ConnectionError, asyncio.TimeoutError)
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def _load_agent_framework() -> Optional[Tuple[Any, Any, Any, Any]]:
+    """Import the agent_framework message helpers on first use.
+
+    agent_framework is an optional, heavy dependency that most requests never
+    touch, so it is not imported with this module. Returns ``(ChatAgent,
+    ChatMessage, TextContent, UriContent)``, or None when it is unavailable;
+    the result is cached for the life of the process.
+    """
+    apply_agent_framework_shim()
+    try:
+        from agent_framework import ChatAgent, ChatMessage, TextContent, UriContent
+    except Exception:
+        return None
+    return ChatAgent, ChatMessage, TextContent, UriContent
+
+
+class _KeywordMatcher:
+    """Single-pass keyword classifier used by analyze_diagram.
+
+    ``keywords`` maps a substring to a resource kind. Its order is the match
+    priority: when several keywords occur in the same string the kind listed
+    first wins, mirroring the if/elif cascade this replaces.
+    """
+
+    def __init__(self, keywords: Dict[str, str]):
+        self.keywords = keywords
+        self.priority: Dict[str, int] = {}
+        for kind in keywords.values():
+            self.priority.setdefault(kind, len(self.priority))
+        alternation = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+        # The lookahead lets finditer report every occurrence, including
+        # overlapping ones, in one scan of the string.
+        self.pattern = re.compile(f"(?=({alternation}))")
+
+    def classify(self, text: str, extra: tuple = ()) -> Optional[str]:
+        """Return the highest-priority kind found in ``text``.
+
+        ``extra`` holds ``(kind, matched)`` pairs for signals that don't come
+        from ``text`` itself (e.g. the node category).
+        """
+        best: Optional[str] = None
+        best_rank = len(self.priority)
+        for match in self.pattern.finditer(text):
+            kind = self.keywords[match.group(1)]
+            rank = self.priority[kind]
+            if rank < best_rank:
+                best, best_rank = kind, rank
+        for kind, matched in extra:
+            if matched and self.priority[kind] < best_rank:
+                best, best_rank = kind, self.priority[kind]
+        return best
+
+
+_RTYPE_MATCHER = _KeywordMatcher({
+    "storage": "storage",
+    "web": "function",
+    "function": "function",
+    "cosmos": "cosmos",
+    "sql": "sql",
+    "redis": "redis",
+    "network": "vnet",
+    "vnet": "vnet",
+})
+
+_TITLE_MATCHER = _KeywordMatcher({
+    "storage": "storage",
+    "blob": "storage",
+    "function": "function",
+    "func": "function",
+    "sql": "sql",
+    "database": "sql",
+    "cosmos": "cosmos",
+    "redis": "redis",
+    "vnet": "vnet",
+    "subnet": "vnet",
+    "network": "vnet",
+    "monitor": "monitor",
+    "activity log": "monitor",
+    "advisor": "monitor",
+    "insights": "monitor",
+    "active directory": "identity",
+    "ad": "identity",
+    "machine": "machinelearning",
+    "ml": "machinelearning",
+    "learning": "machinelearning",
+})
+
+
+# Azure services recognised in natural-language architecture descriptions
+_SERVICE_MAPPING = MappingProxyType({
+    "web app": {"type": "azure.appservice", "icon": "mdi:web"},
+    "function": {"type": "azure.functions", "icon": "mdi:lambda"},
+    "storage": {"type": "azure.storage", "icon": "mdi:database"},
+    "database": {"type": "azure.sql", "icon": "mdi:database-outline"},
+    "cosmos": {"type": "azure.cosmos", "icon": "mdi:database-outline"},
+    "redis": {"type": "azure.redis", "icon": "mdi:memory"},
+    "api management": {"type": "azure.apim", "icon": "mdi:api"},
+    "front door": {"type": "azure.frontdoor", "icon": "mdi:door"},
+    "application gateway": {"type": "azure.appgateway", "icon": "mdi:gateway"},
+    "openai": {"type": "azure.openai", "icon": "mdi:robot"},
+    "ai search": {"type": "azure.search", "icon": "mdi:magnify"},
+    "key vault": {"type": "azure.keyvault", "icon": "mdi:key"},
+    "monitor": {"type": "azure.monitor", "icon": "mdi:monitor"},
+    "insights": {"type": "azure.insights", "icon": "mdi:chart-line"}
+})
+
+_SERVICE_RE = re.compile(
+    "(?=(" + "|".join(re.escape(k) for k in sorted(_SERVICE_MAPPING, key=len, reverse=True)) + "))"
+)
+
+
+# System prompt for the chat agent created in AzureArchitectAgent.initialize
+_AGENT_INSTRUCTIONS = """You are the Azure Architect Agent, an expert in Azure cloud architecture and Infrastructure as Code.
+
+Your capabilities include:
+1. Analyzing ReactFlow diagrams and providing architecture insights
+2. Generating Bicep Infrastructure as Code from diagrams
+3. Creating deployment plans for Azure resources
+4. Generating ReactFlow diagrams from natural language descriptions
+5. Analyzing uploaded architecture images (vision-enabled)
+6. Providing best practices and recommendations
+
+When users ask about their architecture:
+- Ask for the diagram JSON if not provided
+- Analyze the components and connections
+- Suggest improvements and best practices
+- Generate appropriate IaC templates
+- Help plan deployments step by step
+- Create visual diagrams from descriptions
+- Analyze uploaded architecture images when provided
+
+Always prioritize security, scalability, and cost optimization in your recommendations.
+Use the available tools to analyze diagrams, generate code, and create visualizations when requested."""
+
+
+# Prompt prefix for AI-driven Bicep generation in generate_bicep_code
+_BICEP_INSTRUCTION = (
+    "You are an Azure Cloud Infrastructure as Code generator. Given the diagram JSON under 'diagram', "
+    "produce a realistic production-ready Bicep template mapping each service to appropriate Azure resource types. "
+    "Infer sensible naming (using namePrefix param), add parameters for locations, SKUs, and secrets (but do NOT include secret values). "
+    "Include monitoring if include_monitoring is true and basic security best-practice resources (e.g., log analytics workspace) if include_security is true. "
+    "Return ONLY a JSON object with keys 'bicep_code' (string) and 'parameters' (object). No markdown, no commentary."
+)
+
+
+# MCP-grounded prompt prefixes. They stay byte-identical across calls so only
+# the diagram/code suffix varies (which also keeps them prompt-cache friendly).
+_BICEP_MCP_INSTRUCTION = (
+    "You are an Azure IaC generator with access to Azure Bicep MCP tools. "
+    "Use the MCP tools to look up correct resource types, properties, and API versions "
+    "for each service in the diagram. Before emitting each resource block, verify "
+    "required properties and allowed SKUs using MCP schema lookups. "
+    "Return ONLY JSON with keys 'bicep_code' (string) and 'parameters' (object). "
+    "No markdown, no commentary."
+)
+
+_BICEP_MCP_VALIDATE_INSTRUCTION = (
+    "Validate this Bicep template for syntax and schema correctness using "
+    "Azure Bicep MCP tools. Check resource types, properties, and API versions. "
+    "Return ONLY JSON: {\"valid\": boolean, \"errors\": [\"...\"], \"warnings\": [\"...\"]}"
+)
+
+_BICEP_MCP_GENERATE_VALIDATE_INSTRUCTION = (
+    "You are an Azure IaC generator with access to Azure Bicep MCP tools. "
+    "Use the MCP tools to look up correct resource types, properties, and API versions "
+    "for each service in the diagram, then validate the finished template for syntax "
+    "and schema correctness with the same tools. "
+    "Return ONLY JSON with keys 'bicep_code' (string), 'parameters' (object) and "
+    "'validation' ({\"valid\": boolean, \"errors\": [\"...\"], \"warnings\": [\"...\"]}). "
+    "No markdown, no commentary."
+)
+
+_TF_MCP_INSTRUCTION = (
+    "Generate Terraform modules for this Azure architecture diagram. "
+    "Use the Terraform MCP tools to lookup providers, resources, arguments, and examples "
+    "from the Terraform Registry before emitting code. Ensure all resource types and "
+    "arguments are valid for the specified provider version. "
+    "Return ONLY JSON: {'terraform_code': string, 'variables': object, 'outputs': object}."
+)
+
+_TF_MCP_VALIDATE_INSTRUCTION = (
+    "Validate this Terraform configuration for syntax and provider schema correctness using "
+    "Terraform MCP tools. Check resource types, arguments, and provider requirements. "
+    "Return ONLY JSON: {\"valid\": boolean, \"errors\": [\"...\"], \"warnings\": [\"...\"]}"
+)
+
+_TF_MCP_GENERATE_VALIDATE_INSTRUCTION = (
+    "Generate Terraform modules for this Azure architecture diagram. "
+    "Use the Terraform MCP tools to lookup providers, resources, arguments, and examples "
+    "from the Terraform Registry before emitting code, then validate the finished "
+    "configuration for syntax and provider schema correctness with the same tools. "
+    "Return ONLY JSON: {\"terraform_code\": string, \"variables\": object, \"outputs\": object, "
+    "\"validation\": {\"valid\": boolean, \"errors\": [\"...\"], \"warnings\": [\"...\"]}}."
+)
+
+_TF_MCP_PROVIDER_INFO_TEMPLATE = (
+    "Get provider information for '%s' including available resource types, "
+    "data sources, and recent version information using Terraform MCP tools. "
+    "Return ONLY JSON: {\"provider\": string, \"version\": string, \"resources\": [string], \"data_sources\": [string]}"
+)
+
+
+# Pre-serialized payloads for the fixed-shape tool results. Only the variable
+# fields are interpolated; string inputs are escaped via dumps() first.
+_PLAN_NEXT_STEPS = (
+    "Validate Bicep template syntax",
+    "Run what-if deployment analysis",
+    "Execute deployment with monitoring",
+)
+
+_PLAN_TEMPLATE = (
+    '{"deployment_name":"azarch-deploy-%s","subscription_id":%s,"resource_group":%s,'
+    '"template_size":%d,"estimated_resources":%d,"deployment_mode":"Incremental",'
+    '"validation_required":true,"estimated_duration":"5-10 minutes",'
+    '"next_steps":' + dumps(_PLAN_NEXT_STEPS).replace("%", "%%") + '}'
+)
+
+_IMAGE_ANALYSIS_TEMPLATE = (
+    '{"image_url":%s,"target_region":%s,"analysis_type":"architecture_diagram",'
+    '"timestamp":"%s","note":"Image analysis will be performed by the AI model with vision capabilities"}'
+)
+
+
+# LRU cache of analyze_diagram results keyed by a digest of the diagram content
+_ANALYSIS_CACHE_SIZE = 256
+_ANALYSIS_CACHE: "OrderedDict[Tuple[bytes, str], str]" = OrderedDict()
+
+
+def _analysis_cache_key(diagram_json: Any, target_region: str) -> Tuple[bytes, str]:
+    """Build a compact cache key for analyze_diagram.
+
+    Dict inputs are canonicalized with sorted keys so logically equal diagrams
+    share an entry; only a short digest is retained rather than the full text.
+    """
+    if isinstance(diagram_json, str):
+        raw = diagram_json
+    elif isinstance(diagram_json, dict):
+        raw = json.dumps(diagram_json, sort_keys=True, default=str)
+    else:
+        raw = ""
+    digest = hashlib.blake2b(raw.encode(), digest_size=16).digest()
+    return digest, str(target_region)
+
+
+# Number of trailing conversation messages included as chat context
+CHAT_HISTORY_WINDOW = 10
+
+# Prompt shape used when prior conversation turns are prepended to a message
+_CONTEXT_PROMPT = "Context:\n%s\n\nUser: %s"
+
+ConversationHistory = Union[List[Dict[str, Any]], Deque[Dict[str, Any]]]
+
+
+def _history_context(conversation_history: ConversationHistory) -> str:
+    """Render the trailing window of a conversation as prompt context.
+
+    Callers may pass a ``deque(maxlen=CHAT_HISTORY_WINDOW)`` so that the
+    window is maintained on append and never needs re-slicing here.
+    """
+    if isinstance(conversation_history, deque):
+        skip = max(len(conversation_history) - CHAT_HISTORY_WINDOW, 0)
+        recent = islice(conversation_history, skip, None)
+    else:
+        recent = conversation_history[-CHAT_HISTORY_WINDOW:]
+    return "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent])
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Locates the opening brace of the JSON blob that follows a "Diagram Data:" marker
+_DIAGRAM_DATA_RE = re.compile(r"Diagram Data:[^{]*(\{)")
+
+
+# Responses above this size are parsed off the event loop
+_EXTRACT_JSON_THREAD_THRESHOLD = 100_000
+
+
+async def _extract_json_async(txt: str) -> Optional[Dict[str, Any]]:
+    """Async wrapper around ``extract_json_object`` for use inside request handlers.
+
+    Multi-megabyte IaC responses are parsed in a worker thread so they do not
+    stall other requests on the event loop; small ones stay inline to avoid the
+    thread hand-off.
+    """
+    if len(txt) > _EXTRACT_JSON_THREAD_THRESHOLD:
+        return await asyncio.to_thread(extract_json_object, txt)
+    return extract_json_object(txt)
+
+
+@lru_cache(maxsize=4096)
+def _symbol_name(idx: int, kind: str) -> str:
+    """Bicep symbol for the idx-th node; cached so repeated shapes share strings."""
+    return f"res{idx}_{kind}"
+
+
+def analyze_diagram_struct(
+    diagram_json: Union[str, Dict[str, Any]],
+    target_region: str = "westeurope",
+) -> Dict[Any, Dict[str, Any]]:
+    """Classify diagram nodes and return the resource symbol map.
+
+    This is the structured core of the ``analyze_diagram`` tool for in-process
+    callers, which would otherwise serialize the result only to parse it again.
+    """
+    # Parse diagram JSON safely
+    if isinstance(diagram_json, str):
+        try:
+            diagram = loads(diagram_json)
+        except Exception:
+            diagram = {"nodes": [], "edges": []}
+    elif isinstance(diagram_json, dict):
+        diagram = diagram_json
+    else:
+        diagram = {"nodes": [], "edges": []}
+
+    nodes = diagram.get("nodes", [])
+
+    # Bind hot lookups as locals and collect keys/values side by side;
+    # the mapping is only assembled once, after the loop.
+    classify_rtype = _RTYPE_MATCHER.classify
+    symbol_name = _symbol_name
+    classify_title = _TITLE_MATCHER.classify
+    _isinstance = isinstance
+    _str = str
+    symbol_ids: List[Any] = []
+    symbol_entries: List[Dict[str, Any]] = []
+    add_id = symbol_ids.append
+    add_entry = symbol_entries.append
+
+    # Normalize node metadata so generator can detect types
+    for i, node in enumerate(nodes):
+        node_data = node.get("data", {}) or {}
+        title = _str(node_data["title"]) if "title" in node_data else f"resource{i}"
+        # Try several places for a resource type: explicit resourceType, type, or title keywords
+        rtype = node_data["resourceType"] if "resourceType" in node_data else node_data.get("type")
+        if _isinstance(rtype, _str) and rtype.strip() == "":
+            rtype = None
+
+        # Lower each string once; the classifiers below only read these locals
+        rt = _str(rtype).lower() if rtype else ""
+        lt = title.lower()
+        category_l = (node_data.get("category") or "").lower()
+
+        detected = classify_rtype(rt) if rt else None
+        if detected is None:
+            detected = classify_title(lt, extra=(
+                ("identity", "identity" in category_l),
+                ("machinelearning", "ai" in category_l),
+            )) or "generic"
+
+        add_id(node.get("id", _str(i)))
+        add_entry({
+            "symbol": symbol_name(i, detected),
+            "kind": detected,
+            "title": title,
+            "data": node_data,
+            "index": i,
+        })
+
+    return dict(zip(symbol_ids, symbol_entries))
+
+
 # Tool functions for the agent
 def analyze_diagram(
     diagram_json: Annotated[str, Field(description="ReactFlow diagram JSON string")],
@@ -79,93 +411,23 @@ def analyze_diagram(
 ) -> str:
     """Analyze a ReactFlow diagram and provide architecture insights."""
     try:
-        # Parse diagram JSON safely
-        if isinstance(diagram_json, str):
-            try:
-                diagram = json.loads(diagram_json)
-            except Exception:
-                diagram = {"nodes": [], "edges": []}
-        elif isinstance(diagram_json, dict):
-            diagram = diagram_json
-        else:
-            diagram = {"nodes": [], "edges": []}
-
-        nodes = diagram.get("nodes", [])
-
-        # Resource naming helpers and maps
-        resource_symbols = {}
-
-        def symbol_name(idx: int, kind: str) -> str:
-            return f"res{idx}_{kind}"
-
-        # Helper to safe-get data fields
-        def get_field(d: dict, *keys, default=None):
-            for k in keys:
-                if k in d:
-                    return d[k]
-            return default
-
-        # Normalize node metadata so generator can detect types
-        for i, node in enumerate(nodes):
-            node_data = node.get("data", {}) or {}
-            title = str(get_field(node_data, "title", default=f"resource{i}"))
-            # Try several places for a resource type: explicit resourceType, type, or title keywords
-            rtype = get_field(node_data, "resourceType", "type", default=None)
-            if isinstance(rtype, str) and rtype.strip() == "":
-                rtype = None
-
-            detected = None
-            if rtype:
-                rt = str(rtype).lower()
-                if "storage" in rt:
-                    detected = "storage"
-                elif "web" in rt or "function" in rt:
-                    detected = "function"
-                elif "sql" in rt and "cosmos" not in rt:
-                    detected = "sql"
-                elif "cosmos" in rt:
-                    detected = "cosmos"
-                elif "redis" in rt:
-                    detected = "redis"
-                elif "network" in rt or "vnet" in rt:
-                    detected = "vnet"
-
-            if detected is None:
-                lt = title.lower()
-                if "storage" in lt or "blob" in lt:
-                    detected = "storage"
-                elif "function" in lt or "func" in lt:
-                    detected = "function"
-                elif "sql" in lt or "database" in lt:
-                    detected = "sql"
-                elif "cosmos" in lt:
-                    detected = "cosmos"
-                elif "redis" in lt:
-                    detected = "redis"
-                elif "vnet" in lt or "subnet" in lt or "network" in lt:
-                    detected = "vnet"
-                elif "monitor" in lt or "activity log" in lt or "advisor" in lt or "insights" in lt:
-                    detected = "monitor"
-                elif "identity" in (node_data.get("category") or "").lower() or "active directory" in lt or "ad" in lt:
-                    detected = "identity"
-                elif "machine" in lt or "ml" in lt or "learning" in lt or "ai" in (node_data.get("category") or "").lower():
-                    detected = "machinelearning"
-                else:
-                    detected = "generic"
-
-            resource_symbols[node.get("id", str(i))] = {
-                "symbol": symbol_name(i, detected),
-                "kind": detected,
-                "title": title,
-                "data": node_data,
-                "index": i,
-            }
-
-        return json.dumps(resource_symbols, indent=2)
+        # The analysis is a pure function of the diagram content and region,
+        # and the agent tends to re-analyze the same diagram on every turn.
+        cache_key = _analysis_cache_key(diagram_json, target_region)
+        cached = _ANALYSIS_CACHE.get(cache_key)
+        if cached is not None:
+            _ANALYSIS_CACHE.move_to_end(cache_key)
+            return cached
+
+        result = dumps(analyze_diagram_struct(diagram_json, target_region))
+        _ANALYSIS_CACHE[cache_key] = result
+        if len(_ANALYSIS_CACHE) > _ANALYSIS_CACHE_SIZE:
+            _ANALYSIS_CACHE.popitem(last=False)
+        return result
 
     except Exception as e:
         logger.error(f"Error analyzing diagram: {e}")
-        return json.dumps({"error": str(e)})
+        return dumps({"error": str(e)})
 
 
 def plan_deployment(
@@ -175,23 +437,13 @@ def plan_deployment(
 ) -> str:
     """Create a deployment plan for the given Bicep template."""
     try:
-        plan = {
-            "deployment_name": f"azarch-deploy-{datetime.now().strftime('%Y%m%d-%H%M%S')}",
-            "subscription_id": subscription_id,
-            "resource_group": resource_group,
-            "template_size": len(bicep_content),
-            "estimated_resources": bicep_content.count("resource "),
-            "deployment_mode": "Incremental",
-            "validation_required": True,
-            "estimated_duration": "5-10 minutes",
-            "next_steps": [
-                "Validate Bicep template syntax",
-                "Run what-if deployment analysis",
-                "Execute deployment with monitoring"
-            ]
-        }
-        
-        return json.dumps(plan, indent=2)
+        return _PLAN_TEMPLATE % (
+            time.strftime('%Y%m%d-%H%M%S'),
+            dumps(subscription_id),
+            dumps(resource_group),
+            len(bicep_content),
+            bicep_content.count("resource "),
+        )
         
     except Exception as e:
         return f"Error creating deployment plan: {str(e)}"
@@ -203,25 +455,6 @@ def generate_reactflow_diagram(
 ) -> str:
     """Generate a ReactFlow diagram JSON from architecture description."""
     try:
-        # Parse common Azure services from description
-        services = []
-        service_mapping = {
-            "web app": {"type": "azure.appservice", "icon": "mdi:web"},
-            "function": {"type": "azure.functions", "icon": "mdi:lambda"},
-            "storage": {"type": "azure.storage", "icon": "mdi:database"},
-            "database": {"type": "azure.sql", "icon": "mdi:database-outline"},
-            "cosmos": {"type": "azure.cosmos", "icon": "mdi:database-outline"},
-            "redis": {"type": "azure.redis", "icon": "mdi:memory"},
-            "api management": {"type": "azure.apim", "icon": "mdi:api"},
-            "front door": {"type": "azure.frontdoor", "icon": "mdi:door"},
-            "application gateway": {"type": "azure.appgateway", "icon": "mdi:gateway"},
-            "openai": {"type": "azure.openai", "icon": "mdi:robot"},
-            "ai search": {"type": "azure.search", "icon": "mdi:magnify"},
-            "key vault": {"type": "azure.keyvault", "icon": "mdi:key"},
-            "monitor": {"type": "azure.monitor", "icon": "mdi:monitor"},
-            "insights": {"type": "azure.insights", "icon": "mdi:chart-line"}
-        }
-        
         description_lower = architecture_description.lower()
         node_id = 1
         
@@ -229,8 +462,11 @@ def generate_reactflow_diagram(
         nodes = []
         edges = []
         
-        for service_name, service_config in service_mapping.items():
-            if service_name in description_lower:
+        # One scan of the description finds every mentioned service; nodes are
+        # still emitted in mapping order so layouts stay stable.
+        mentioned = {m.group(1) for m in _SERVICE_RE.finditer(description_lower)}
+        for service_name, service_config in _SERVICE_MAPPING.items():
+            if service_name in mentioned:
                 node = {
                     "id": f"node_{node_id}",
                     "type": "azureService",
@@ -265,7 +501,7 @@ def generate_reactflow_diagram(
             "viewport": {"x": 0, "y": 0, "zoom": 1}
         }
         
-        return json.dumps(diagram, indent=2)
+        return dumps(diagram)
         
     except Exception as e:
         return f"Error generating ReactFlow diagram: {str(e)}"
@@ -283,20 +519,60 @@ def analyze_image_for_architecture(
     try:
         # This function will be used with vision-capable models
         # The actual image analysis will be done by the LLM with vision capabilities
-        analysis = {
-            "image_url": image_url,
-            "target_region": target_region,
-            "analysis_type": "architecture_diagram",
-            "timestamp": datetime.now().isoformat(),
-            "note": "Image analysis will be performed by the AI model with vision capabilities"
-        }
-        
-        return json.dumps(analysis, indent=2)
+        return _IMAGE_ANALYSIS_TEMPLATE % (
+            dumps(image_url),
+            dumps(target_region),
+            datetime.now().isoformat(),
+        )
         
     except Exception as e:
         return f"Error analyzing image: {str(e)}"
 
 
+@lru_cache(maxsize=8)
+def _class_defines_create_agent(client_cls: type) -> bool:
+    return callable(getattr(client_cls, "create_agent", None))
+
+
+def _resolve_client_api(agent_client: Any) -> Tuple[Optional[str], bool]:
+    """Resolve how to drive an agent client.
+
+    Returns the attribute used to obtain the chat agent (``create_agent``,
+    or ``chat``/``run`` for clients that act as the agent themselves) and
+    whether the client supports vision. Clients whose class defines
+    ``create_agent``, as the agent framework clients do, are answered from a
+    per-class cache; anything else (wrappers, mocks, APIs exposed as
+    instance attributes or through ``__getattr__``) is probed on the
+    instance.
+    """
+    if _class_defines_create_agent(type(agent_client)):
+        return "create_agent", True
+    use_vision = hasattr(agent_client, "create_agent") or hasattr(agent_client, "chat")
+    if callable(getattr(agent_client, "create_agent", None)):
+        return "create_agent", use_vision
+    for name in ("chat", "run"):
+        if getattr(agent_client, name, None):
+            return name, use_vision
+    return None, use_vision
+
+
+def _validation_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize an LLM validation reply to {"valid", "errors", "warnings"}."""
+    return {
+        "valid": result.get("valid", False),
+        "errors": result.get("errors", []),
+        "warnings": result.get("warnings", [])
+    }
+
+
+# Attempts (including the first) for MCP agent runs failing with transient errors
+_MCP_RUN_ATTEMPTS = 3
+
+# How long a resolved MCP tool handle (or its absence) is reused before asking
+# app.deps again
+_MCP_TOOL_TTL = 60.0
+
+
 class AzureArchitectAgent:
     """Azure Architect MAF Agent for chat-driven architecture planning."""
 
@@ -305,7 +581,13 @@ class AzureArchitectAgent:
         # mismatches with optional dependencies in different environments.
         self.agent_client = agent_client
         self.chat_agent = None
-        self.use_vision = hasattr(agent_client, "create_agent") or hasattr(agent_client, "chat")
+        self._client_entrypoint, self.use_vision = _resolve_client_api(agent_client)
+        # MCP tool handles, re-resolved at most every _MCP_TOOL_TTL seconds
+        self._mcp_bicep_tool: Any = None
+        self._mcp_tf_tool: Any = None
+        self._mcp_bicep_refreshed_at = float("-inf")
+        self._mcp_tf_refreshed_at = float("-inf")
+        self._mcp_tool_lock = asyncio.Lock()
         
     async def initialize(self) -> None:
         """Initialize the chat agent with tools."""
@@ -317,64 +599,39 @@ class AzureArchitectAgent:
         # Add vision tool only for OpenAI Responses client
         if self.use_vision:
             tools.append(analyze_image_for_architecture)
-        
-        instructions = """You are the Azure Architect Agent, an expert in Azure cloud architecture and Infrastructure as Code.
-
-Your capabilities include:
-1. Analyzing ReactFlow diagrams and providing architecture insights
-2. Generating Bicep Infrastructure as Code from diagrams
-3. Creating deployment plans for Azure resources
-4. Generating ReactFlow diagrams from natural language descriptions
-5. Analyzing uploaded architecture images (vision-enabled)
-6. Providing best practices and recommendations
-
-When users ask about their architecture:
-- Ask for the diagram JSON if not provided
-- Analyze the components and connections
-- Suggest improvements and best practices
-- Generate appropriate IaC templates
-- Help plan deployments step by step
-- Create visual diagrams from descriptions
-- Analyze uploaded architecture images when provided
-
-Always prioritize security, scalability, and cost optimization in your recommendations.
-Use the available tools to analyze diagrams, generate code, and create visualizations when requested."""
 
         # Create agent with appropriate client
         # Create agent using whichever client API is available. Use getattr
         # to avoid static type errors when optional libs are missing.
         try:
-            create_fn = getattr(self.agent_client, "create_agent", None)
-            if callable(create_fn):
+            if self._client_entrypoint == "create_agent":
+                create_fn = self.agent_client.create_agent
                 # Some clients accept a name parameter; be permissive.
                 try:
-                    self.chat_agent = create_fn(name="AzureArchitectAgent", instructions=instructions, tools=tools)
+                    self.chat_agent = create_fn(name="AzureArchitectAgent", instructions=_AGENT_INSTRUCTIONS, tools=tools)
                 except TypeError:
                     # Fallback to calling without name
-                    self.chat_agent = create_fn(instructions=instructions, tools=tools)
+                    self.chat_agent = create_fn(instructions=_AGENT_INSTRUCTIONS, tools=tools)
             else:
                 # If the client doesn't provide create_agent, assume it can act
                 # as a chat client directly or will be wrapped elsewhere.
-                self.chat_agent = getattr(self.agent_client, "chat", None) or getattr(self.agent_client, "run", None)
+                self.chat_agent = (
+                    getattr(self.agent_client, self._client_entrypoint) if self._client_entrypoint else None
+                )
         except Exception:
             self.chat_agent = None
         
         logger.info(f"Azure Architect MAF Agent initialized successfully (Vision: {self.use_vision})")
     
-    async def chat(self, message: str, conversation_history: Optional[List[Dict[str, Any]]] = None) -> str:
+    async def chat(self, message: str, conversation_history: Optional[ConversationHistory] = None) -> str:
         """Send a message to the agent and get a response."""
         if not self.chat_agent:
             raise RuntimeError("Agent not initialized")
         
         try:
             # Include conversation history if provided
-            context = ""
             if conversation_history:
-                context = "\n".join([
-                    f"{msg['role']}: {msg['content']}" 
-                    for msg in conversation_history[-10:]  # Last 10 messages
-                ])
-                message = f"Context:\n{context}\n\nUser: {message}"
+                message = _CONTEXT_PROMPT % (_history_context(conversation_history), message)
             
             response = await self.chat_agent.run(message)
             return response.result
@@ -383,20 +640,15 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             logger.error(f"Error in agent chat: {e}")
             return f"I apologize, but I encountered an error: {str(e)}"
     
-    async def stream_chat(self, message: str, conversation_history: Optional[List[Dict[str, Any]]] = None):
+    async def stream_chat(self, message: str, conversation_history: Optional[ConversationHistory] = None):
         """Stream chat response from the agent."""
         if not self.chat_agent:
             raise RuntimeError("Agent not initialized")
         
         try:
             # Include conversation history if provided
-            context = ""
             if conversation_history:
-                context = "\n".join([
-                    f"{msg['role']}: {msg['content']}" 
-                    for msg in conversation_history[-10:]  # Last 10 messages
-                ])
-                message = f"Context:\n{context}\n\nUser: {message}"
+                message = _CONTEXT_PROMPT % (_history_context(conversation_history), message)
             
             async for chunk in self.chat_agent.run_stream(message):
                 if chunk.delta:
@@ -412,10 +664,12 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             return "Image analysis not available with current configuration"
         
         try:
-            # If the ChatMessage/TextContent/UriContent helpers are available
-            # and callable, use them; otherwise fall back to a simple text
-            # prompt that includes the image URL.
-            if callable(ChatMessage) and callable(TextContent) and callable(UriContent):
+            # If the agent_framework message helpers are available, send a
+            # multimodal message; otherwise fall back to a simple text prompt
+            # that includes the image URL.
+            af = _load_agent_framework()
+            if af is not None:
+                _, ChatMessage, TextContent, UriContent = af
                 message = ChatMessage(
                     role="user",
                     contents=[
@@ -460,30 +714,15 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             else:
                 raw_text = str(architecture_description)
                 diagram = None
-                marker = "Diagram Data:"
-                if marker in raw_text:
-                    idx = raw_text.index(marker) + len(marker)
-                    rest = raw_text[idx:]
-                    brace_start = rest.find('{')
-                    if brace_start != -1:
-                        depth = 0
-                        end = -1
-                        for i, ch in enumerate(rest[brace_start:]):
-                            if ch == '{': depth += 1
-                            elif ch == '}':
-                                depth -= 1
-                                if depth == 0:
-                                    end = brace_start + i + 1
-                                    break
-                        if end != -1:
-                            json_blob = rest[brace_start:end]
-                            try:
-                                diagram = json.loads(json_blob)
-                            except Exception:
-                                diagram = None
+                marker_match = _DIAGRAM_DATA_RE.search(raw_text)
+                if marker_match:
+                    try:
+                        diagram = _JSON_DECODER.raw_decode(raw_text, marker_match.start(1))[0]
+                    except ValueError:
+                        diagram = None
                 if diagram is None:
                     try:
-                        diagram = json.loads(raw_text)
+                        diagram = loads(raw_text)
                     except Exception:
                         diagram = {"nodes": [], "edges": []}
 
@@ -495,19 +734,18 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             # If service_configs are provided, merge them into each node's data
             try:
                 nodes = diagram.get("nodes", []) if isinstance(diagram, dict) else []
-                if isinstance(service_configs, dict) and isinstance(nodes, list):
+                if service_configs and isinstance(service_configs, dict) and isinstance(nodes, list):
                     for n in nodes:
-                        nid = n.get("id") or (n.get("data") or {}).get("id")
-                        if not nid:
+                        n_data = n.get("data")
+                        if not isinstance(n_data, dict):
                             continue
-                        sc = service_configs.get(nid)
-                        if sc and isinstance(n.get("data"), dict):
-                            # Merge shallowly; do not overwrite existing nested maps unless present
-                            n_data = n.get("data") or {}
-                            for k, v in (sc.items() if isinstance(sc, dict) else []):
-                                if v is not None:
-                                    n_data.setdefault(k, v)
-                            n["data"] = n_data
+                        sc = service_configs.get(n.get("id") or n_data.get("id"))
+                        if not sc or not isinstance(sc, dict):
+                            continue
+                        # Merge shallowly in place; do not overwrite existing nested maps unless present
+                        for k, v in sc.items():
+                            if v is not None:
+                                n_data.setdefault(k, v)
             except Exception:
                 # Non-fatal; proceed without enriched data
                 pass
@@ -515,13 +753,6 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             # Always attempt model first if chat_agent exists (unless explicitly disabled via _force_model=False).
             if self.chat_agent:
                 try:
-                    instruction = (
-                        "You are an Azure Cloud Infrastructure as Code generator. Given the diagram JSON under 'diagram', "
-                        "produce a realistic production-ready Bicep template mapping each service to appropriate Azure resource types. "
-                        "Infer sensible naming (using namePrefix param), add parameters for locations, SKUs, and secrets (but do NOT include secret values). "
-                        "Include monitoring if include_monitoring is true and basic security best-practice resources (e.g., log analytics workspace) if include_security is true. "
-                        "Return ONLY a JSON object with keys 'bicep_code' (string) and 'parameters' (object). No markdown, no commentary."
-                    )
                     payload = {
                         "diagram": {"nodes": diagram.get("nodes", []), "edges": diagram.get("edges", [])},
                         "requirements": {
@@ -530,26 +761,11 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
                             "include_security": include_security,
                         },
                     }
-                    prompt = f"{instruction}\n\nDiagram Data: {json.dumps(payload, separators=(',',':'))}"
+                    prompt = f"{_BICEP_INSTRUCTION}\n\nDiagram Data: {dumps(payload)}"
                     resp = await self.chat_agent.run(prompt)
                     text = getattr(resp, "result", str(resp))
                     # Attempt robust JSON extraction
-                    def _extract_json(txt: str):
-                        start = txt.find('{')
-                        if start == -1: return None
-                        depth = 0
-                        for i, ch in enumerate(txt[start:]):
-                            if ch == '{': depth += 1
-                            elif ch == '}':
-                                depth -= 1
-                                if depth == 0:
-                                    end = start + i + 1
-                                    try:
-                                        return json.loads(txt[start:end])
-                                    except Exception:
-                                        return None
-                        return None
-                    parsed = _extract_json(text) or (json.loads(text) if text.strip().startswith('{') else None)
+                    parsed = await _extract_json_async(text)
                     if parsed and isinstance(parsed, dict) and parsed.get("bicep_code"):
                         return {"bicep_code": parsed.get("bicep_code", ""), "parameters": parsed.get("parameters", {})}
                     else:
@@ -572,7 +788,7 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
         try:
             # Prepare the prompt based on input type
             if isinstance(architecture_description, dict):
-                context = json.dumps(architecture_description, indent=2)
+                context = dumps(architecture_description)
             else:
                 context = str(architecture_description)
 
@@ -606,28 +822,75 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             text = getattr(response, "result", str(response))
 
             # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    result = json.loads(text[start:end])
-                    # Ensure expected structure
-                    return {
-                        "terraform_code": result.get("terraform_code", ""),
-                        "parameters": result.get("parameters", {"provider": provider})
-                    }
-            except Exception as parse_error:
-                logger.warning(f"Failed to parse Terraform JSON response: {parse_error}")
-                # Return text as-is if JSON parsing fails
+            result = await _extract_json_async(text)
+            if result is not None:
+                # Ensure expected structure
                 return {
-                    "terraform_code": text,
-                    "parameters": {"provider": provider}
+                    "terraform_code": result.get("terraform_code", ""),
+                    "parameters": result.get("parameters", {"provider": provider})
                 }
 
+            logger.warning("Failed to parse Terraform JSON response")
+            # Return text as-is if JSON parsing fails
+            return {
+                "terraform_code": text,
+                "parameters": {"provider": provider}
+            }
+
         except Exception as e:
             logger.error(f"Error in generate_terraform_code: {e}")
             return {"terraform_code": "", "parameters": {"provider": provider}, "error": str(e)}
 
+    async def _get_bicep_tool(self) -> Any:
+        """Return the Azure Bicep MCP tool, cached on the agent for ``_MCP_TOOL_TTL``."""
+        if time.monotonic() - self._mcp_bicep_refreshed_at < _MCP_TOOL_TTL:
+            return self._mcp_bicep_tool
+        async with self._mcp_tool_lock:
+            # Another caller may have refreshed the handle while we waited
+            if time.monotonic() - self._mcp_bicep_refreshed_at >= _MCP_TOOL_TTL:
+                self._mcp_bicep_tool = await get_mcp_bicep_tool()
+                self._mcp_bicep_refreshed_at = time.monotonic()
+        return self._mcp_bicep_tool
+
+    async def _get_tf_tool(self) -> Any:
+        """Return the Terraform MCP tool, cached on the agent for ``_MCP_TOOL_TTL``."""
+        if time.monotonic() - self._mcp_tf_refreshed_at < _MCP_TOOL_TTL:
+            return self._mcp_tf_tool
+        async with self._mcp_tool_lock:
+            if time.monotonic() - self._mcp_tf_refreshed_at >= _MCP_TOOL_TTL:
+                self._mcp_tf_tool = await get_mcp_terraform_tool()
+                self._mcp_tf_refreshed_at = time.monotonic()
+        return self._mcp_tf_tool
+
+    async def _run_with_retry(self, prompt: str, tools: Any = None, attempts: int = _MCP_RUN_ATTEMPTS) -> Any:
+        """Run the chat agent, retrying transient network/service failures.
+        
+        Uses exponential backoff with a little jitter (0.5s, 1s, ...) so a
+        brief MCP or model hiccup doesn't drop callers onto the non-MCP
+        fallback path. Non-transient errors propagate immediately.
+        """
+        for attempt in range(attempts):
+            try:
+                return await self.chat_agent.run(prompt, tools=tools)
+            except _TRANSIENT_ERRORS as e:
+                if attempt == attempts - 1:
+                    raise
+                delay = 0.5 * 2 ** attempt + random.random() * 0.1
+                logger.warning(f"Transient agent run failure ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _run_mcp_json(self, prompt: str, tool: Any) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Run ``prompt`` with an MCP tool attached and extract the JSON reply.
+        
+        Returns the parsed object (None when no JSON object was found) and the
+        raw response text for callers that fall back to it.
+        """
+        # agent_framework accepts tools either at agent creation or per run;
+        # the streamable MCP tool is provided per run here
+        resp = await self._run_with_retry(prompt, tools=tool)
+        text = getattr(resp, "result", str(resp))
+        return await _extract_json_async(text), text
+
     async def generate_bicep_via_mcp(self, diagram: dict, region: str = "westeurope") -> dict:
         """
         Generate Bicep using MCP Bicep schema tools for enhanced accuracy.
@@ -642,23 +905,12 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
 
         try:
             # Import and get MCP tool
-            from app.deps import get_mcp_bicep_tool
-            mcp_tool = await get_mcp_bicep_tool()
+            mcp_tool = await self._get_bicep_tool()
             
             if mcp_tool is None:
                 logger.warning("MCP Bicep tool not available, falling back to standard generation")
                 return await self.generate_bicep_code({"diagram": diagram})
 
-            # Build instruction that emphasizes MCP usage
-            instruction = (
-                "You are an Azure IaC generator with access to Azure Bicep MCP tools. "
-                "Use the MCP tools to look up correct resource types, properties, and API versions "
-                "for each service in the diagram. Before emitting each resource block, verify "
-                "required properties and allowed SKUs using MCP schema lookups. "
-                "Return ONLY JSON with keys 'bicep_code' (string) and 'parameters' (object). "
-                "No markdown, no commentary."
-            )
-            
             payload = {
                 "diagram": {"nodes": diagram.get("nodes", []), "edges": diagram.get("edges", [])},
                 "requirements": {
@@ -669,34 +921,9 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
                 },
             }
             
-            prompt = f"{instruction}\n\nDiagram Data: {json.dumps(payload, separators=(',',':'))}"
-
-            # Run with MCP tool available by passing the tool into the run call
-            # Note: agent_framework expects tools to be passed either at agent
-            # creation or per-run; we provide the streamable MCP tool here.
-            resp = await self.chat_agent.run(prompt, tools=mcp_tool)
-            text = getattr(resp, "result", str(resp))
-
-            # Robust JSON extraction (same as standard method)
-            def _extract_json(txt: str):
-                start = txt.find('{')
-                if start == -1: 
-                    return None
-                depth = 0
-                for i, ch in enumerate(txt[start:]):
-                    if ch == '{': 
-                        depth += 1
-                    elif ch == '}':
-                        depth -= 1
-                        if depth == 0:
-                            end = start + i + 1
-                            try: 
-                                return json.loads(txt[start:end])
-                            except Exception: 
-                                return None
-                return None
-
-            parsed = _extract_json(text) or (json.loads(text) if text.strip().startswith('{') else None)
+            prompt = f"{_BICEP_MCP_INSTRUCTION}\n\nDiagram Data: {dumps(payload)}"
+
+            parsed, _ = await self._run_mcp_json(prompt, mcp_tool)
             if not parsed or "bicep_code" not in parsed:
                 raise ValueError("MCP-enhanced Bicep generation failed - no valid bicep_code returned")
                 
@@ -721,37 +948,17 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             return {"valid": False, "errors": ["Agent not initialized"]}
 
         try:
-            from app.deps import get_mcp_bicep_tool
-            mcp_tool = await get_mcp_bicep_tool()
+            mcp_tool = await self._get_bicep_tool()
             
             if mcp_tool is None:
                 return {"valid": False, "errors": ["MCP Bicep tool not available"]}
 
-            prompt = (
-                "Validate this Bicep template for syntax and schema correctness using "
-                "Azure Bicep MCP tools. Check resource types, properties, and API versions. "
-                "Return ONLY JSON: {\"valid\": boolean, \"errors\": [\"...\"], \"warnings\": [\"...\"]}\n\n"
-                f"```bicep\n{bicep_code}\n```"
-            )
-            
-            resp = await self.chat_agent.run(prompt)
-            text = getattr(resp, "result", str(resp))
+            prompt = f"{_BICEP_MCP_VALIDATE_INSTRUCTION}\n\n```bicep\n{bicep_code}\n```"
             
-            # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    validation_result = json.loads(text[start:end])
-                    # Ensure expected structure
-                    return {
-                        "valid": validation_result.get("valid", False),
-                        "errors": validation_result.get("errors", []),
-                        "warnings": validation_result.get("warnings", [])
-                    }
-            except Exception:
-                pass
-                
+            validation_result, _ = await self._run_mcp_json(prompt, mcp_tool)
+            if validation_result is not None:
+                return _validation_payload(validation_result)
+
             return {"valid": False, "errors": ["Unable to parse MCP validation response"]}
             
         except Exception as e:
@@ -771,41 +978,23 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             return await self.generate_terraform_code({"diagram": diagram, "provider": provider})
 
         try:
-            from app.deps import get_mcp_terraform_tool
-            tf_mcp = await get_mcp_terraform_tool()
+            tf_mcp = await self._get_tf_tool()
             
             if tf_mcp is None:
                 logger.info("Terraform MCP tool not available, falling back to standard generation")
                 return await self.generate_terraform_code({"diagram": diagram, "provider": provider})
 
-            prompt = (
-                "Generate Terraform modules for this Azure architecture diagram. "
-                "Use the Terraform MCP tools to lookup providers, resources, arguments, and examples "
-                "from the Terraform Registry before emitting code. Ensure all resource types and "
-                "arguments are valid for the specified provider version. "
-                "Return ONLY JSON: {'terraform_code': string, 'variables': object, 'outputs': object}.\n\n"
-                f"Diagram: {json.dumps(diagram, separators=(',',':'))}\n"
-                f"Provider: {provider}"
-            )
+            prompt = f"{_TF_MCP_INSTRUCTION}\n\nDiagram: {dumps(diagram)}\nProvider: {provider}"
             
-            resp = await self.chat_agent.run(prompt, tools=tf_mcp)
-            text = getattr(resp, "result", str(resp))
-            
-            # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    parsed = json.loads(text[start:end])
-                    return {
-                        "terraform_code": parsed.get("terraform_code", ""),
-                        "variables": parsed.get("variables", {}),
-                        "outputs": parsed.get("outputs", {}),
-                        "provider": provider
-                    }
-            except Exception as parse_err:
-                logger.warning(f"Failed to parse MCP Terraform response: {parse_err}")
-                
+            parsed, text = await self._run_mcp_json(prompt, tf_mcp)
+            if parsed is not None:
+                return {
+                    "terraform_code": parsed.get("terraform_code", ""),
+                    "variables": parsed.get("variables", {}),
+                    "outputs": parsed.get("outputs", {}),
+                    "provider": provider
+                }
+
             # If JSON parsing fails, extract text content
             logger.info("JSON parsing failed, attempting text extraction")
             return {
@@ -831,38 +1020,17 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             return {"valid": False, "errors": ["Agent not initialized"]}
 
         try:
-            from app.deps import get_mcp_terraform_tool
-            tf_mcp = await get_mcp_terraform_tool()
+            tf_mcp = await self._get_tf_tool()
             
             if tf_mcp is None:
                 return {"valid": False, "errors": ["Terraform MCP tool not available"]}
 
-            prompt = (
-                "Validate this Terraform configuration for syntax and provider schema correctness using "
-                "Terraform MCP tools. Check resource types, arguments, and provider requirements. "
-                f"Provider: {provider}. "
-                "Return ONLY JSON: {\"valid\": boolean, \"errors\": [\"...\"], \"warnings\": [\"...\"]}\n\n"
-                f"```hcl\n{terraform_code}\n```"
-            )
+            prompt = f"{_TF_MCP_VALIDATE_INSTRUCTION}\n\nProvider: {provider}\n\n```hcl\n{terraform_code}\n```"
             
-            resp = await self.chat_agent.run(prompt, tools=tf_mcp)
-            text = getattr(resp, "result", str(resp))
-            
-            # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    validation_result = json.loads(text[start:end])
-                    # Ensure expected structure
-                    return {
-                        "valid": validation_result.get("valid", False),
-                        "errors": validation_result.get("errors", []),
-                        "warnings": validation_result.get("warnings", [])
-                    }
-            except Exception:
-                pass
-                
+            validation_result, _ = await self._run_mcp_json(prompt, tf_mcp)
+            if validation_result is not None:
+                return _validation_payload(validation_result)
+
             return {"valid": False, "errors": ["Unable to parse MCP validation response"]}
             
         except Exception as e:
@@ -879,32 +1047,105 @@ Use the available tools to analyze diagrams, generate code, and create visualiza
             return {"error": "Agent not initialized"}
 
         try:
-            from app.deps import get_mcp_terraform_tool
-            tf_mcp = await get_mcp_terraform_tool()
+            tf_mcp = await self._get_tf_tool()
             
             if tf_mcp is None:
                 return {"error": "Terraform MCP tool not available"}
 
-            prompt = (
-                f"Get provider information for '{provider}' including available resource types, "
-                "data sources, and recent version information using Terraform MCP tools. "
-                "Return ONLY JSON: {\"provider\": string, \"version\": string, \"resources\": [string], \"data_sources\": [string]}"
-            )
-            
-            resp = await self.chat_agent.run(prompt, tools=tf_mcp)
-            text = getattr(resp, "result", str(resp))
+            prompt = _TF_MCP_PROVIDER_INFO_TEMPLATE % provider
             
-            # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    return json.loads(text[start:end])
-            except Exception:
-                pass
-                
+            parsed, _ = await self._run_mcp_json(prompt, tf_mcp)
+            if parsed is not None:
+                return parsed
+
             return {"error": "Unable to parse provider info response"}
             
         except Exception as e:
             logger.exception(f"MCP provider info lookup failed: {e}")
-            return {"error": f"Provider info error: {str(e)}"}
\ No newline at end of file
+            return {"error": f"Provider info error: {str(e)}"}
+
+    async def generate_and_validate_bicep(self, diagram: dict, region: str = "westeurope") -> dict:
+        """
+        Generate and self-validate Bicep in a single MCP-grounded agent run.
+        
+        Shares one prompt (instructions + diagram) between generation and
+        validation instead of issuing two separate LLM round-trips. Falls back
+        to ``generate_bicep_via_mcp`` followed by ``validate_bicep_with_mcp``
+        when the combined response cannot be used.
+        
+        Returns {'bicep_code': str, 'parameters': dict, 'validation': {valid, errors, warnings}}
+        """
+        if not self.chat_agent:
+            raise RuntimeError("Agent not initialized")
+
+        try:
+            mcp_tool = await self._get_bicep_tool()
+
+            if mcp_tool is not None:
+                payload = {
+                    "diagram": {"nodes": diagram.get("nodes", []), "edges": diagram.get("edges", [])},
+                    "requirements": {
+                        "target_format": "bicep",
+                        "include_monitoring": True,
+                        "include_security": True,
+                        "region": region
+                    },
+                }
+                prompt = f"{_BICEP_MCP_GENERATE_VALIDATE_INSTRUCTION}\n\nDiagram Data: {dumps(payload)}"
+
+                parsed, _ = await self._run_mcp_json(prompt, mcp_tool)
+                if parsed and parsed.get("bicep_code"):
+                    return {
+                        "bicep_code": parsed["bicep_code"],
+                        "parameters": parsed.get("parameters", {}),
+                        "validation": _validation_payload(parsed.get("validation") or {})
+                    }
+                logger.warning("Combined Bicep generate+validate response unusable, running steps separately")
+
+        except Exception as e:
+            logger.exception(f"Combined MCP Bicep generate+validate failed: {e}")
+
+        result = await self.generate_bicep_via_mcp(diagram, region=region)
+        bicep_code = result.get("bicep_code", "")
+        result["validation"] = await self.validate_bicep_with_mcp(bicep_code) if bicep_code else {}
+        return result
+
+    async def generate_and_validate_terraform(self, diagram: dict, provider: str = "azurerm") -> dict:
+        """
+        Generate and self-validate Terraform in a single MCP-grounded agent run.
+        
+        Terraform counterpart of ``generate_and_validate_bicep``; falls back to
+        ``generate_terraform_via_mcp`` followed by ``validate_terraform_with_mcp``.
+        
+        Returns {'terraform_code': str, 'variables': dict, 'outputs': dict, 'provider': str, 'validation': dict}
+        """
+        if not self.chat_agent:
+            logger.warning("Agent not initialized, falling back to standard generation")
+            return await self.generate_terraform_code({"diagram": diagram, "provider": provider})
+
+        try:
+            tf_mcp = await self._get_tf_tool()
+
+            if tf_mcp is not None:
+                prompt = f"{_TF_MCP_GENERATE_VALIDATE_INSTRUCTION}\n\nDiagram: {dumps(diagram)}\nProvider: {provider}"
+
+                parsed, _ = await self._run_mcp_json(prompt, tf_mcp)
+                if parsed and parsed.get("terraform_code"):
+                    return {
+                        "terraform_code": parsed["terraform_code"],
+                        "variables": parsed.get("variables", {}),
+                        "outputs": parsed.get("outputs", {}),
+                        "provider": provider,
+                        "validation": _validation_payload(parsed.get("validation") or {})
+                    }
+                logger.warning("Combined Terraform generate+validate response unusable, running steps separately")
+
+        except Exception as e:
+            logger.exception(f"Combined MCP Terraform generate+validate failed: {e}")
+
+        result = await self.generate_terraform_via_mcp(diagram, provider=provider)
+        terraform_code = result.get("terraform_code", "")
+        result["validation"] = (
+            await self.validate_terraform_with_mcp(terraform_code, provider=provider) if terraform_code else {}
+        )
+        return result
@@ -3,17 +3,54 @@
 import json
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Dict, List
 from uuid import uuid4
 
+from azure.storage.blob import BlobSasPermissions, generate_blob_sas
 from fastapi import APIRouter, HTTPException, Request, Depends, UploadFile, File
 from pydantic import BaseModel
 
-from app.core.azure_client import AzureClientManager
+from app.core.azure_client import MAX_SAS_LIFETIME, AzureClientManager
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Asset type by lower-cased file extension; anything else is a 'document'
+_ASSET_TYPE_BY_EXT = MappingProxyType({
+    'bicep': 'bicep',
+    'tf': 'terraform',
+    'json': 'document',
+    'png': 'image',
+    'jpg': 'image',
+    'jpeg': 'image',
+    'svg': 'image',
+    'pdf': 'document',
+    'md': 'document'
+})
+
+# Maximum number of sub-requests in a single blob batch call
+_DELETE_BATCH_SIZE = 256
+
+# Bytes read from an uploaded file at a time when streaming it to blob storage
+_UPLOAD_READ_SIZE = 4 * 1024 * 1024
+
+
+async def _iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    """Read an uploaded file in chunks.
+    
+    ``UploadFile.read`` runs in the threadpool, so an upload spooled to disk
+    never blocks the event loop.
+    """
+    while chunk := await file.read(_UPLOAD_READ_SIZE):
+        yield chunk
+
+
+def _asset_type(filename: str) -> str:
+    """Determine asset type based on file extension."""
+    _, dot, file_ext = filename.rpartition('.')
+    return _ASSET_TYPE_BY_EXT.get(file_ext.lower(), 'document') if dot else 'document'
+
 
 class AssetResponse(BaseModel):
     """Asset response model."""
@@ -42,31 +79,26 @@ async def upload_asset(
         now = datetime.utcnow()
         
         # Determine asset type based on file extension
-        file_ext = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
-        asset_type = {
-            'bicep': 'bicep',
-            'tf': 'terraform',
-            'json': 'document',
-            'png': 'image',
-            'jpg': 'image',
-            'jpeg': 'image',
-            'svg': 'image',
-            'pdf': 'document',
-            'md': 'document'
-        }.get(file_ext, 'document')
-        
-        # Read file content
-        content = await file.read()
-        
-        # Upload to blob storage
+        asset_type = _asset_type(file.filename)
+        
+        # Upload to blob storage, streaming the spooled upload file in chunks
+        # rather than reading the whole payload into memory first
         blob_client = azure_clients.get_blob_client()
         container_name = "assets"
         blob_name = f"{project_id}/{asset_id}/{file.filename}"
         
-        await blob_client.get_blob_client(
+        upload_client = blob_client.get_blob_client(
             container=container_name,
             blob=blob_name
-        ).upload_blob(content, overwrite=True)
+        )
+        await file.seek(0)
+        await upload_client.upload_blob(
+            _iter_upload(file), overwrite=True, length=file.size, max_concurrency=4
+        )
+        
+        size = file.size
+        if size is None:
+            size = (await upload_client.get_blob_properties()).size
         
         # Generate SAS URL for access
         sas_url = await generate_sas_url(
@@ -77,7 +109,7 @@ async def upload_asset(
             "id": asset_id,
             "name": file.filename,
             "type": asset_type,
-            "size": len(content),
+            "size": size,
             "url": sas_url,
             "created_at": now,
         }
@@ -100,43 +132,37 @@ async def list_project_assets(
         blob_client = azure_clients.get_blob_client()
         container_name = "assets"
         
+        # Collect asset blobs first (path: project_id/asset_id/filename) so
+        # their SAS URLs can share one signing key. Pages are fetched in
+        # large batches; no extra properties (metadata, tags) are requested.
+        pager = blob_client.get_container_client(container_name).list_blobs(
+            name_starts_with=f"{project_id}/",
+            results_per_page=500
+        )
+        blobs = []
+        async for page in pager.by_page():
+            blobs.extend([blob async for blob in page if blob.name.count('/') >= 2])
+        
+        # Generate fresh SAS URLs, resolving the signing key once for all
+        signing_kwargs = await _sas_signing_kwargs(azure_clients)
+        sas_urls = [
+            _sas_url(azure_clients, container_name, blob.name, 24, signing_kwargs)
+            for blob in blobs
+        ]
+        
         assets = []
-        async for blob in blob_client.get_container_client(container_name).list_blobs(
-            name_starts_with=f"{project_id}/"
-        ):
-            # Parse asset info from blob path: project_id/asset_id/filename
-            path_parts = blob.name.split('/')
-            if len(path_parts) >= 3:
-                asset_id = path_parts[1]
-                filename = '/'.join(path_parts[2:])  # Handle nested paths
-                
-                # Generate fresh SAS URL
-                sas_url = await generate_sas_url(
-                    azure_clients, container_name, blob.name, hours=24
-                )
-                
-                # Determine asset type
-                file_ext = filename.split('.')[-1].lower() if '.' in filename else ''
-                asset_type = {
-                    'bicep': 'bicep',
-                    'tf': 'terraform',
-                    'json': 'document',
-                    'png': 'image',
-                    'jpg': 'image',
-                    'jpeg': 'image',
-                    'svg': 'image',
-                    'pdf': 'document',
-                    'md': 'document'
-                }.get(file_ext, 'document')
-                
-                assets.append(AssetResponse(
-                    id=asset_id,
-                    name=filename,
-                    type=asset_type,
-                    size=blob.size,
-                    url=sas_url,
-                    created_at=blob.last_modified or datetime.utcnow()
-                ))
+        for blob, sas_url in zip(blobs, sas_urls):
+            # Parse asset info from blob path; filename keeps any nested path
+            _, asset_id, filename = blob.name.split('/', 2)
+            
+            assets.append(AssetResponse(
+                id=asset_id,
+                name=filename,
+                type=_asset_type(filename),
+                size=blob.size,
+                url=sas_url,
+                created_at=blob.last_modified or datetime.utcnow()
+            ))
         
         # Sort by created_at descending
         assets.sort(key=lambda a: a.created_at, reverse=True)
@@ -158,20 +184,22 @@ async def delete_asset(
         blob_client = azure_clients.get_blob_client()
         container_name = "assets"
         
-        # Find and delete all blobs for this asset
-        deleted_count = 0
-        async for blob in blob_client.get_container_client(container_name).list_blobs(
-            name_starts_with=f"{project_id}/{asset_id}/"
-        ):
-            await blob_client.get_blob_client(
-                container=container_name,
-                blob=blob.name
-            ).delete_blob()
-            deleted_count += 1
+        # Find all blobs for this asset, then delete them with batch requests
+        container_client = blob_client.get_container_client(container_name)
+        blob_names = [
+            blob.name
+            async for blob in container_client.list_blobs(
+                name_starts_with=f"{project_id}/{asset_id}/"
+            )
+        ]
+        deleted_count = len(blob_names)
         
         if deleted_count == 0:
             raise HTTPException(status_code=404, detail="Asset not found")
         
+        for start in range(0, deleted_count, _DELETE_BATCH_SIZE):
+            await container_client.delete_blobs(*blob_names[start:start + _DELETE_BATCH_SIZE])
+        
         logger.info(f"Deleted asset {asset_id} from project {project_id}")
         return {"message": f"Asset deleted successfully ({deleted_count} files)"}
         
@@ -188,21 +216,55 @@ async def generate_sas_url(
     blob_name: str,
     hours: int = 24
 ) -> str:
-    """Generate a SAS URL for blob access."""
+    """Generate a read-only SAS URL for blob access, valid for ``hours``.
+    
+    When signed with the cached user delegation key the lifetime is capped at
+    ``MAX_SAS_LIFETIME`` (24 hours), the longest the key is guaranteed to
+    stay valid for; SAS signed with the client credential are not capped.
+    """
+    signing_kwargs = await _sas_signing_kwargs(azure_clients)
+    return _sas_url(azure_clients, container_name, blob_name, hours, signing_kwargs)
+
+
+async def _sas_signing_kwargs(azure_clients: AzureClientManager) -> Dict[str, Any]:
+    """Resolve the key to sign SAS tokens with, as ``generate_blob_sas`` arguments.
+    
+    Signs with the cached user delegation key so each SAS is a local HMAC;
+    falls back to the client credential (e.g. shared key / emulator).
+    """
+    try:
+        return {"user_delegation_key": await azure_clients.get_user_delegation_key()}
+    except Exception as key_error:
+        logger.debug(f"User delegation key unavailable, signing with client credential: {key_error}")
+        try:
+            return {"credential": azure_clients.get_blob_client().credential}
+        except Exception:
+            return {}
+
+
+def _sas_url(
+    azure_clients: AzureClientManager,
+    container_name: str,
+    blob_name: str,
+    hours: int,
+    signing_kwargs: Dict[str, Any]
+) -> str:
+    """Sign a read-only SAS URL locally with keys from ``_sas_signing_kwargs``."""
     try:
-        from azure.storage.blob import generate_blob_sas, BlobSasPermissions
-        from azure.core.credentials import AzureNamedKeyCredential
-        
         blob_client = azure_clients.get_blob_client()
         
+        lifetime = timedelta(hours=hours)
+        if "user_delegation_key" in signing_kwargs:
+            lifetime = min(lifetime, MAX_SAS_LIFETIME)
+        
         # Generate SAS token
         sas_token = generate_blob_sas(
             account_name=blob_client.account_name,
             container_name=container_name,
             blob_name=blob_name,
-            credential=blob_client.credential,
             permission=BlobSasPermissions(read=True),
-            expiry=datetime.utcnow() + timedelta(hours=hours)
+            expiry=datetime.utcnow() + lifetime,
+            **signing_kwargs
         )
         
         # Construct SAS URL
@@ -216,7 +278,7 @@ async def generate_sas_url(
     except Exception as e:
         logger.error(f"Failed to generate SAS URL: {e}")
         # Fallback to direct blob URL (may not work without proper access)
-        return blob_client.get_blob_client(
+        return azure_clients.get_blob_client().get_blob_client(
             container=container_name,
             blob=blob_name
-        ).url
\ No newline at end of file
+        ).url
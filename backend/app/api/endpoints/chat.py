@@ -2,6 +2,7 @@
 
 import json
 import logging
+from collections import deque
 from datetime import datetime
 from typing import Any, Dict, List
 from uuid import uuid4
@@ -9,6 +10,7 @@ from uuid import uuid4
 from fastapi import APIRouter, HTTPException, Request, Depends
 from pydantic import BaseModel
 
+from app.agents.azure_architect_agent import CHAT_HISTORY_WINDOW
 from app.core.azure_client import AzureClientManager
 
 logger = logging.getLogger(__name__)
@@ -69,11 +71,14 @@ async def send_message(
         conversation_id = chat_request.conversation_id or str(uuid4())
         
         # Load existing conversation if available
-        conversation_history = []
+        # Only the trailing window is sent to the agent, so only convert those messages
+        conversation_history = deque(maxlen=CHAT_HISTORY_WINDOW)
         if chat_request.conversation_id:
             try:
                 conversation = await _load_conversation(conversation_id, azure_clients)
-                conversation_history = [msg.dict() for msg in conversation.messages]
+                conversation_history.extend(
+                    msg.dict() for msg in conversation.messages[-CHAT_HISTORY_WINDOW:]
+                )
             except HTTPException:
                 # Conversation not found, start fresh
                 pass
@@ -39,6 +39,17 @@ if use_openai == "true" and api_key:
 else:
     logger.warning(f"⚠️ OpenAI client not initialized - USE_OPENAI_FALLBACK: '{use_openai}', API_KEY exists: {bool(api_key)}")
 
+# System messages are shared across requests; keeping them byte-identical also
+# lets OpenAI reuse its prompt cache for the common prefix
+SYSTEM_MSG = {
+    "role": "system",
+    "content": "You are an expert Azure Architect AI assistant. You help users design cloud architectures, generate Infrastructure as Code (Bicep/Terraform), analyze diagrams, and provide Azure best practices. Be helpful, accurate, and concise in your responses."
+}
+JSON_MODE_SYSTEM_MSG = {
+    "role": "system",
+    "content": "Respond only with a single valid JSON object."
+}
+
 
 class ChatMessage(BaseModel):
     """Chat message model."""
@@ -52,6 +63,7 @@ class ChatRequest(BaseModel):
     message: str
     conversation_history: List[ChatMessage] = []
     model: str = "gpt-4"
+    json_mode: bool = False  # Ask the model for a single JSON object response
 
 
 class ChatResponse(BaseModel):
@@ -67,43 +79,41 @@ async def chat_completion(request: ChatRequest) -> ChatResponse:
     try:
         logger.info(f"Received chat request: message='{request.message}', history_length={len(request.conversation_history)}")
         
+        usage = None
         if not openai_client:
             # Fallback response if OpenAI is not available
             response_content = "I'm currently running in mock mode. Please configure OpenAI API key for AI responses."
         else:
-            # Build conversation history for OpenAI
-            messages = []
-            
-            # Add system message for Azure Architect context
-            messages.append({
-                "role": "system",
-                "content": "You are an expert Azure Architect AI assistant. You help users design cloud architectures, generate Infrastructure as Code (Bicep/Terraform), analyze diagrams, and provide Azure best practices. Be helpful, accurate, and concise in your responses."
-            })
-            
-            # Add conversation history
-            for msg in request.conversation_history:
-                messages.append({
-                    "role": msg.role,
-                    "content": msg.content
-                })
-            
-            # Add current user message
-            messages.append({
-                "role": "user",
-                "content": request.message
-            })
+            # Build conversation history for OpenAI: system context, prior
+            # turns, then the current user message
+            messages = [
+                SYSTEM_MSG,
+                *({"role": msg.role, "content": msg.content} for msg in request.conversation_history),
+                {"role": "user", "content": request.message},
+            ]
             
             logger.info(f"Sending {len(messages)} messages to OpenAI")
             
+            completion_kwargs: Dict[str, Any] = {"temperature": 0.7}
+            if request.json_mode:
+                # JSON mode guarantees a parseable object, but the API requires
+                # the word "JSON" to appear in the messages
+                messages.insert(1, JSON_MODE_SYSTEM_MSG)
+                completion_kwargs = {
+                    "temperature": 0.0,
+                    "response_format": {"type": "json_object"}
+                }
+            
             # Call OpenAI API
             response = openai_client.chat.completions.create(
                 model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
                 messages=messages,
                 max_tokens=1000,
-                temperature=0.7
+                **completion_kwargs
             )
             
             response_content = response.choices[0].message.content or "No response generated"
+            usage = response.usage.model_dump() if response.usage else None
             logger.info(f"Received OpenAI response: {len(response_content)} characters")
         
         response_message = ChatMessage(
@@ -114,7 +124,7 @@ async def chat_completion(request: ChatRequest) -> ChatResponse:
         return ChatResponse(
             message=response_message,
             model=request.model,
-            usage={"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}
+            usage=usage
         )
         
     except Exception as e:
@@ -1,19 +1,121 @@
 """Deployment management endpoints."""
 
-import json
+import asyncio
 import logging
-from datetime import datetime
-from typing import Any, Dict, List
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
 from uuid import uuid4
 
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from azure.storage.blob import ContentSettings
+from azure.storage.blob.aio import BlobClient, ContainerClient
 from fastapi import APIRouter, HTTPException, Request, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 
-from app.core.azure_client import AzureClientManager
+from app.core.config import settings
+from app.core.serialization import dumps_bytes, loads
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Blob container holding deployment records and logs
+DEPLOYMENTS_CONTAINER = "deployments"
+
+# Maximum concurrent blob downloads when listing deployments
+_LIST_DOWNLOAD_CONCURRENCY = 32
+
+# Characters and length allowed in blob index tag values. Records are only
+# tagged with values that fit, and filters on anything else fall back to a
+# full listing instead of building a tag query.
+_TAG_VALUE_RE = re.compile(r"[A-Za-z0-9 +\-./:=_]*")
+_TAG_VALUE_MAX_LEN = 256
+
+# Summary index of all deployments (DeploymentResponse fields plus project_id,
+# and the ETag of the record version each entry was taken from) so
+# list_deployments is a single download instead of a container scan
+_INDEX_BLOB = "index.json"
+_INDEX_UPDATE_ATTEMPTS = 5
+
+# Index entries are refreshed when a record's status changes, by a background
+# task that batches pending entries into one index write; failed writes are
+# retried with backoff before being left to the reconcile below. The status
+# each deployment was last queued with (per process) decides what changed.
+_INDEX_WRITE_ATTEMPTS = 3
+_INDEX_RETRY_DELAY = 0.5
+_indexed_status: Dict[str, str | None] = {}
+_pending_index_entries: Dict[str, Dict[str, Any]] = {}
+_index_writer: asyncio.Task | None = None
+
+# Minimum seconds between background reconciliations of the index with the
+# stored records (per process), which repair entries lost to a failed or
+# raced index update
+_INDEX_RECONCILE_INTERVAL = 300.0
+_next_reconcile_at = 0.0
+_reconcile_task: asyncio.Task | None = None
+
+# Deployment log entries, one JSON object per line in an append blob. Older
+# deployments kept their logs as a single JSON array written on completion.
+_LOGS_BLOB = "logs.ndjson"
+_LEGACY_LOGS_BLOB = "logs.json"
+
+# Parallel ranged GETs per readall() of a multi-chunk blob; chunks() always
+# fetches ranges one at a time
+_DOWNLOAD_MAX_CONCURRENCY = 4
+
+_JSON_CONTENT_SETTINGS = ContentSettings(content_type="application/json")
+_NDJSON_CONTENT_SETTINGS = ContentSettings(content_type="application/x-ndjson")
+
+# Read-modify-write attempts for cancel_deployment before giving up
+_CANCEL_ATTEMPTS = 3
+
+# Deployment states after which the record no longer changes
+_TERMINAL_STATUSES = frozenset({"succeeded", "failed", "cancelled"})
+
+# Minimum seconds between progress-only writes of a deployment record
+_PROGRESS_WRITE_INTERVAL = 1.0
+
+# Short-lived list_deployments results by (project_id, status) filter, as
+# (expires_at monotonic, deployments). Cleared on every record write.
+_LIST_CACHE_TTL = 2.0
+_list_cache: Dict[Tuple[str | None, str | None], Tuple[float, List["DeploymentResponse"]]] = {}
+
+# In-flight deployment processes by deployment id. Holding the task reference
+# keeps it from being garbage collected and lets cancel_deployment stop it.
+_deployment_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _now_ms() -> int:
+    """Current time as epoch milliseconds, the form timestamps are stored in."""
+    return int(time.time() * 1000)
+
+
+def _is_tag_value(value: str) -> bool:
+    """Whether ``value`` can be stored as a blob index tag value."""
+    return len(value) <= _TAG_VALUE_MAX_LEN and _TAG_VALUE_RE.fullmatch(value) is not None
+
+
+def _to_datetime(value: Any) -> Any:
+    """Convert a stored timestamp to an aware UTC datetime.
+    
+    Timestamps are stored as epoch milliseconds; records written before that
+    hold naive UTC ISO strings, which are read as UTC. Anything else is
+    passed through for pydantic to validate.
+    """
+    if isinstance(value, int):
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return value
+
 
 class DeploymentRequest(BaseModel):
     """Deployment request model."""
@@ -38,6 +140,11 @@ class DeploymentResponse(BaseModel):
     completed_at: datetime | None = None
     error_message: str | None = None
     deployed_resources: List[Dict[str, Any]] = []
+    
+    @field_validator("created_at", "completed_at", mode="before")
+    @classmethod
+    def _parse_timestamp(cls, value: Any) -> Any:
+        return _to_datetime(value)
 
 
 class DeploymentLog(BaseModel):
@@ -46,39 +153,75 @@ class DeploymentLog(BaseModel):
     level: str  # 'info', 'warning', 'error'
     message: str
     operation: str | None = None
+    
+    @field_validator("timestamp", mode="before")
+    @classmethod
+    def _parse_timestamp(cls, value: Any) -> Any:
+        return _to_datetime(value)
+
+
+_INDEX_FIELDS = (*DeploymentResponse.model_fields, "project_id")
 
 
-def get_azure_clients(request: Request) -> AzureClientManager:
-    """Dependency to get Azure clients from app state."""
-    return request.app.state.azure_clients
+def _resp(deployment_data: Dict[str, Any]) -> DeploymentResponse:
+    """Build a response from a stored deployment record without re-validating it.
+    
+    Records are only written by this module, so apart from converting the
+    stored timestamps back into datetimes they already match the model.
+    """
+    completed_at = deployment_data.get("completed_at")
+    return DeploymentResponse.model_construct(**{
+        **deployment_data,
+        "created_at": _to_datetime(deployment_data["created_at"]),
+        "completed_at": _to_datetime(completed_at) if completed_at else None,
+    })
+
+
+def get_deployments_container(request: Request) -> ContainerClient:
+    """Dependency to get the shared deployments container client from app state.
+    
+    Falls back to the client manager's cached container client when startup
+    could not attach one (e.g. storage was unavailable at the time).
+    """
+    container = getattr(request.app.state, "deployments_container", None)
+    if container is None:
+        try:
+            container = request.app.state.azure_clients.get_container_client(DEPLOYMENTS_CONTAINER)
+        except Exception as e:
+            logger.error(f"Deployments storage unavailable: {e}")
+            raise HTTPException(status_code=500, detail=f"Deployments storage unavailable: {str(e)}")
+    return container
 
 
 @router.post("/deploy", response_model=DeploymentResponse)
 async def create_deployment(
     deployment_request: DeploymentRequest,
     project_id: str | None = None,
-    azure_clients: AzureClientManager = Depends(get_azure_clients)
+    container: ContainerClient = Depends(get_deployments_container)
 ) -> DeploymentResponse:
     """Create a new deployment."""
     try:
-        deployment_id = str(uuid4())
-        now = datetime.utcnow()
+        deployment_id = uuid4().hex
+        now = datetime.now(timezone.utc)
         
-        deployment_name = f"azarch-deploy-{now.strftime('%Y%m%d-%H%M%S')}"
+        # Suffix with part of the id so deployments created in the same second get distinct names
+        deployment_name = f"azarch-deploy-{now:%Y%m%d-%H%M%S}-{deployment_id[:6]}"
         
         # Create deployment record
         deployment_data = {
             "id": deployment_id,
             "name": deployment_name,
-            "status": "pending",
+            # Saved straight as running: the simulator starts right away, so
+            # a separate pending write would never be observed
+            "status": "running",
             "resource_group": deployment_request.resource_group,
             "subscription_id": deployment_request.subscription_id,
             "template_format": deployment_request.template_format,
             "template_content": deployment_request.template_content,
             "parameters": deployment_request.parameters,
             "validation_only": deployment_request.validation_only,
-            "progress": 0,
-            "created_at": now.isoformat(),
+            "progress": 10,
+            "created_at": int(now.timestamp() * 1000),
             "completed_at": None,
             "error_message": None,
             "deployed_resources": [],
@@ -86,21 +229,18 @@ async def create_deployment(
         }
         
         # Save deployment record to blob storage
-        blob_client = azure_clients.get_blob_client()
-        container_name = "deployments"
-        blob_name = f"{deployment_id}/deployment.json"
-        
-        await blob_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        ).upload_blob(json.dumps(deployment_data, indent=2), overwrite=True)
+        etag = await _save_deployment(container, deployment_data)
         
-        # Start deployment process (async)
+        # Start deployment process in the background and return immediately
         # In a real implementation, this would trigger Azure deployment
-        await _simulate_deployment_process(deployment_id, deployment_request, azure_clients)
+        task = asyncio.create_task(
+            _simulate_deployment_process(deployment_id, dict(deployment_data), etag, deployment_request, container)
+        )
+        _deployment_tasks[deployment_id] = task
+        task.add_done_callback(lambda _: _deployment_tasks.pop(deployment_id, None))
         
         logger.info(f"Created deployment {deployment_id}: {deployment_name}")
-        return DeploymentResponse(**deployment_data)
+        return _resp(deployment_data)
         
     except Exception as e:
         logger.error(f"Failed to create deployment: {e}")
@@ -110,21 +250,12 @@ async def create_deployment(
 @router.get("/{deployment_id}", response_model=DeploymentResponse)
 async def get_deployment(
     deployment_id: str,
-    azure_clients: AzureClientManager = Depends(get_azure_clients)
+    container: ContainerClient = Depends(get_deployments_container)
 ) -> DeploymentResponse:
     """Get deployment status."""
     try:
-        blob_client = azure_clients.get_blob_client()
-        container_name = "deployments"
-        blob_name = f"{deployment_id}/deployment.json"
-        
-        blob_data = await blob_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        ).download_blob()
-        
-        deployment_data = json.loads(await blob_data.readall())
-        return DeploymentResponse(**deployment_data)
+        deployment_data, _ = await _load_raw_deployment(container, deployment_id)
+        return _resp(deployment_data)
         
     except Exception as e:
         logger.error(f"Failed to get deployment {deployment_id}: {e}")
@@ -134,21 +265,12 @@ async def get_deployment(
 @router.get("/{deployment_id}/logs", response_model=List[DeploymentLog])
 async def get_deployment_logs(
     deployment_id: str,
-    azure_clients: AzureClientManager = Depends(get_azure_clients)
+    container: ContainerClient = Depends(get_deployments_container)
 ) -> List[DeploymentLog]:
     """Get deployment logs."""
     try:
-        blob_client = azure_clients.get_blob_client()
-        container_name = "deployments"
-        blob_name = f"{deployment_id}/logs.json"
-        
         try:
-            blob_data = await blob_client.get_blob_client(
-                container=container_name,
-                blob=blob_name
-            ).download_blob()
-            
-            logs_data = json.loads(await blob_data.readall())
+            logs_data = await read_deployment_logs(container, deployment_id)
             return [DeploymentLog(**log) for log in logs_data]
             
         except Exception:
@@ -163,30 +285,36 @@ async def get_deployment_logs(
 @router.post("/{deployment_id}/cancel")
 async def cancel_deployment(
     deployment_id: str,
-    azure_clients: AzureClientManager = Depends(get_azure_clients)
+    container: ContainerClient = Depends(get_deployments_container)
 ) -> Dict[str, str]:
     """Cancel a deployment."""
     try:
-        # Get current deployment
-        deployment = await get_deployment(deployment_id, azure_clients)
-        
-        if deployment.status in ["succeeded", "failed"]:
-            raise HTTPException(status_code=400, detail="Cannot cancel completed deployment")
-        
-        # Update status to cancelled
-        blob_client = azure_clients.get_blob_client()
-        container_name = "deployments"
-        blob_name = f"{deployment_id}/deployment.json"
-        
-        deployment_data = deployment.dict()
-        deployment_data["status"] = "cancelled"
-        deployment_data["completed_at"] = datetime.utcnow().isoformat()
-        deployment_data["error_message"] = "Deployment cancelled by user"
-        
-        await blob_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        ).upload_blob(json.dumps(deployment_data, indent=2), overwrite=True)
+        # Stop the background process before recording the cancellation
+        task = _deployment_tasks.pop(deployment_id, None)
+        if task is not None:
+            task.cancel()
+        
+        for attempt in range(_CANCEL_ATTEMPTS):
+            # Get current deployment record as stored
+            try:
+                deployment_data, etag = await _load_raw_deployment(container, deployment_id)
+            except ResourceNotFoundError:
+                raise HTTPException(status_code=404, detail="Deployment not found")
+            
+            if deployment_data.get("status") in ["succeeded", "failed"]:
+                raise HTTPException(status_code=400, detail="Cannot cancel completed deployment")
+            
+            # Update status to cancelled, only if nobody wrote the record since we read it
+            deployment_data["status"] = "cancelled"
+            deployment_data["completed_at"] = _now_ms()
+            deployment_data["error_message"] = "Deployment cancelled by user"
+            
+            try:
+                await _save_deployment(container, deployment_data, etag)
+                break
+            except ResourceModifiedError:
+                if attempt == _CANCEL_ATTEMPTS - 1:
+                    raise
         
         logger.info(f"Cancelled deployment {deployment_id}")
         return {"message": "Deployment cancelled successfully"}
@@ -202,101 +330,491 @@ async def cancel_deployment(
 async def list_deployments(
     project_id: str | None = None,
     status: str | None = None,
-    azure_clients: AzureClientManager = Depends(get_azure_clients)
+    container: ContainerClient = Depends(get_deployments_container)
 ) -> List[DeploymentResponse]:
     """List deployments with optional filtering."""
+    cache_key = (project_id, status)
+    cached = _list_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return list(cached[1])
+    
     try:
-        blob_client = azure_clients.get_blob_client()
-        container_name = "deployments"
+        # Serve from the summary index when present; otherwise list and
+        # download the individual records
+        records = await _load_index(container)
+        if records is None:
+            names = await _list_deployment_names(container, project_id, status)
+            loaded = await _load_deployment_records(container, names)
+            records = [record for record, _ in loaded]
+            if not (project_id or status):
+                # A full listing seeds the index so later calls skip the scan;
+                # records saved while it was being seeded are merged in by an
+                # immediate reconcile
+                await _create_index(container, loaded)
+                _schedule_reconcile(container, force=True)
+        else:
+            _schedule_reconcile(container)
         
         deployments = []
-        async for blob in blob_client.get_container_client(container_name).list_blobs():
-            if blob.name.endswith("/deployment.json"):
-                try:
-                    blob_data = await blob_client.get_blob_client(
-                        container=container_name,
-                        blob=blob.name
-                    ).download_blob()
-                    
-                    deployment_data = json.loads(await blob_data.readall())
-                    
-                    # Apply filters
-                    if project_id and deployment_data.get("project_id") != project_id:
-                        continue
-                    if status and deployment_data.get("status") != status:
-                        continue
-                    
-                    deployments.append(DeploymentResponse(**deployment_data))
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to load deployment from {blob.name}: {e}")
-                    continue
+        for deployment_data in records:
+            # Apply filters
+            if project_id and deployment_data.get("project_id") != project_id:
+                continue
+            if status and deployment_data.get("status") != status:
+                continue
+            
+            try:
+                deployments.append(_resp(deployment_data))
+            except Exception as e:
+                logger.warning(f"Failed to load deployment {deployment_data.get('id')}: {e}")
         
         # Sort by created_at descending
         deployments.sort(key=lambda d: d.created_at, reverse=True)
-        return deployments
+        _list_cache[cache_key] = (time.monotonic() + _LIST_CACHE_TTL, deployments)
+        return list(deployments)
         
     except Exception as e:
         logger.error(f"Failed to list deployments: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to list deployments: {str(e)}")
 
 
+@router.post("/index/rebuild")
+async def rebuild_deployments_index(
+    container: ContainerClient = Depends(get_deployments_container)
+) -> Dict[str, str]:
+    """Rebuild the deployments index from the stored deployment records."""
+    try:
+        names = await _list_deployment_names(container, None, None)
+        loaded = await _load_deployment_records(container, names)
+        await _create_index(container, loaded, overwrite=True)
+        _list_cache.clear()
+        
+        logger.info(f"Rebuilt deployments index ({len(loaded)} deployments)")
+        return {"message": f"Deployments index rebuilt ({len(loaded)} deployments)"}
+        
+    except Exception as e:
+        logger.error(f"Failed to rebuild deployments index: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild deployments index: {str(e)}")
+
+
+async def _download_json(blob: BlobClient) -> Tuple[Any, str]:
+    """Download and parse a JSON blob, returning the document and its ETag.
+    
+    ``readall()`` fetches the ranges of a multi-chunk blob concurrently, up to
+    ``_DOWNLOAD_MAX_CONCURRENCY`` at a time.
+    """
+    stream = await blob.download_blob(max_concurrency=_DOWNLOAD_MAX_CONCURRENCY)
+    return loads(await stream.readall()), stream.properties.etag
+
+
+async def _upload_json(blob: BlobClient, document: Any, **kwargs: Any) -> Dict[str, Any]:
+    """Serialize and upload a JSON document in a single Put Blob request.
+    
+    Passing encoded bytes with an explicit length keeps the SDK off its
+    chunked upload path. Extra keyword arguments go to ``upload_blob``.
+    """
+    body = dumps_bytes(document)
+    return await blob.upload_blob(
+        body, length=len(body), content_settings=_JSON_CONTENT_SETTINGS, **kwargs
+    )
+
+
+async def _load_raw_deployment(container: ContainerClient, deployment_id: str) -> Tuple[Dict[str, Any], str]:
+    """Load a deployment record as the stored dict, plus its ETag, without building a response model."""
+    return await _download_json(container.get_blob_client(f"{deployment_id}/deployment.json"))
+
+
+async def _save_deployment(
+    container: ContainerClient,
+    deployment_data: Dict[str, Any],
+    etag: str | None = None
+) -> str:
+    """Write a deployment record, queueing its index entry if the status changed.
+    
+    The summary index is updated in the background, so a save is a single
+    blob write; progress-only changes reach the index with the next status
+    change or reconcile. The record is tagged with the fields list_deployments filters on, where
+    their values are valid tag values; if the service rejects the tags the
+    record is written untagged. When ``etag`` is given the write only
+    succeeds if the stored record is still that version (raises
+    ``ResourceModifiedError`` otherwise). Cached list_deployments results are
+    dropped once written. Returns the new ETag.
+    """
+    conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+    blob = container.get_blob_client(f"{deployment_data['id']}/deployment.json")
+    tags = {
+        key: value
+        for key, value in (
+            ("project_id", deployment_data.get("project_id") or ""),
+            ("status", deployment_data.get("status") or ""),
+        )
+        if _is_tag_value(value)
+    }
+    try:
+        result = await _upload_json(blob, deployment_data, overwrite=True, tags=tags or None, **conditions)
+    except ResourceModifiedError:
+        raise
+    except HttpResponseError as e:
+        if not tags:
+            raise
+        # Tags only narrow filtered listings; accounts without blob index
+        # tags (e.g. hierarchical namespace) reject them on every write
+        logger.debug(f"Saving deployment {deployment_data['id']} without index tags: {e}")
+        result = await _upload_json(blob, deployment_data, overwrite=True, **conditions)
+    _queue_index_entry(container, deployment_data, result["etag"])
+    _list_cache.clear()
+    return result["etag"]
+
+
+def _queue_index_entry(container: ContainerClient, deployment_data: Dict[str, Any], etag: str) -> None:
+    """Queue a deployment's index entry for the background writer if its status changed."""
+    global _index_writer
+    deployment_id = deployment_data["id"]
+    status = deployment_data.get("status")
+    if deployment_id in _indexed_status and _indexed_status[deployment_id] == status:
+        return
+    if status in _TERMINAL_STATUSES:
+        _indexed_status.pop(deployment_id, None)
+    else:
+        _indexed_status[deployment_id] = status
+    _pending_index_entries[deployment_id] = _index_entry(deployment_data, etag)
+    if _index_writer is None or _index_writer.done():
+        _index_writer = asyncio.create_task(_write_index_entries(container))
+
+
+async def _write_index_entries(container: ContainerClient) -> None:
+    """Upsert queued index entries, batching whatever queued up during each write."""
+    while _pending_index_entries:
+        entries = dict(_pending_index_entries)
+        _pending_index_entries.clear()
+        
+        def _upsert(index: Dict[str, Any]) -> int:
+            index.update(entries)
+            return len(entries)
+        
+        for attempt in range(_INDEX_WRITE_ATTEMPTS):
+            try:
+                await _modify_index(container, _upsert)
+                _list_cache.clear()
+                break
+            except Exception as e:
+                if attempt == _INDEX_WRITE_ATTEMPTS - 1:
+                    # The records themselves are saved; the next reconcile repairs the entries
+                    logger.warning(f"Failed to update deployments index for {', '.join(entries)}: {e}")
+                else:
+                    await asyncio.sleep(_INDEX_RETRY_DELAY * 2 ** attempt)
+
+
+def _index_entry(deployment_data: Dict[str, Any], etag: str | None) -> Dict[str, Any]:
+    """Summary of a deployment record, as of record version ``etag``, as kept in the index blob."""
+    entry = {key: deployment_data[key] for key in _INDEX_FIELDS if key in deployment_data}
+    entry["etag"] = etag.strip('"') if etag else None
+    return entry
+
+
+async def _load_index(container: ContainerClient) -> List[Dict[str, Any]] | None:
+    """Load deployment summaries from the index blob, or None if there is no usable index."""
+    try:
+        index, _ = await _download_json(container.get_blob_client(_INDEX_BLOB))
+        return list(index.values())
+    except ResourceNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Failed to read deployments index, listing records instead: {e}")
+        return None
+
+
+async def _create_index(
+    container: ContainerClient,
+    loaded: List[Tuple[Dict[str, Any], str]],
+    overwrite: bool = False
+) -> None:
+    """Write the index blob from a full listing of (record, ETag) pairs.
+    
+    Unless ``overwrite`` is set, a concurrently created index wins and
+    failures are only logged.
+    """
+    index = {record["id"]: _index_entry(record, etag) for record, etag in loaded if "id" in record}
+    try:
+        await _upload_json(container.get_blob_client(_INDEX_BLOB), index, overwrite=overwrite)
+    except ResourceExistsError:
+        pass
+    except Exception as e:
+        if overwrite:
+            raise
+        logger.warning(f"Failed to create deployments index: {e}")
+
+
+async def _modify_index(
+    container: ContainerClient, mutate: Callable[[Dict[str, Any]], int]
+) -> int | None:
+    """Apply ``mutate`` to the index blob and write it back if anything changed.
+    
+    Read-modify-write guarded by the blob ETag so concurrent writers don't drop
+    each other's entries; retried on conflict. ``mutate`` returns how many
+    entries it changed, which is returned; None means there is no index yet.
+    """
+    blob = container.get_blob_client(_INDEX_BLOB)
+    for _ in range(_INDEX_UPDATE_ATTEMPTS):
+        try:
+            index, etag = await _download_json(blob)
+        except ResourceNotFoundError:
+            return None
+        changed = mutate(index)
+        if not changed:
+            return 0
+        try:
+            await _upload_json(
+                blob,
+                index,
+                overwrite=True,
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified,
+            )
+            return changed
+        except ResourceModifiedError:
+            continue
+    raise RuntimeError(f"index still changing after {_INDEX_UPDATE_ATTEMPTS} attempts")
+
+
+async def _reconcile_index(container: ContainerClient) -> int | None:
+    """Bring the index in line with the stored deployment records.
+    
+    Each record blob's ETag, from a single listing, is compared with the one
+    its index entry was taken from, so only records missing from the index
+    or changed behind its back are downloaded; entries whose record is gone
+    are dropped. Entries rewritten while this runs are left alone. Returns
+    the number of entries changed, or None when there is no index yet.
+    """
+    try:
+        index, _ = await _download_json(container.get_blob_client(_INDEX_BLOB))
+    except ResourceNotFoundError:
+        return None
+    # Listed after the index was read, and records are written before their
+    # entries, so every indexed record that still exists is in the listing
+    stored = {
+        blob.name.rsplit("/", 1)[0]: blob.etag.strip('"')
+        async for blob in container.list_blobs()
+        if blob.name.endswith("/deployment.json")
+    }
+    expected = {}
+    for deployment_id in stored.keys() | index.keys():
+        indexed_etag = (index.get(deployment_id) or {}).get("etag")
+        if stored.get(deployment_id) != indexed_etag:
+            expected[deployment_id] = indexed_etag
+    if not expected:
+        return 0
+    
+    loaded = await _load_deployment_records(
+        container, [f"{deployment_id}/deployment.json" for deployment_id in expected if deployment_id in stored]
+    )
+    fresh = {record["id"]: _index_entry(record, etag) for record, etag in loaded if "id" in record}
+    
+    def _merge(current: Dict[str, Any]) -> int:
+        changed = 0
+        for deployment_id, indexed_etag in expected.items():
+            if (current.get(deployment_id) or {}).get("etag") != indexed_etag:
+                continue
+            if deployment_id in fresh:
+                current[deployment_id] = fresh[deployment_id]
+            elif deployment_id in stored or current.pop(deployment_id, None) is None:
+                continue
+            changed += 1
+        return changed
+    
+    return await _modify_index(container, _merge)
+
+
+def _schedule_reconcile(container: ContainerClient, force: bool = False) -> None:
+    """Start a background index reconcile if the interval has passed (or ``force``)."""
+    global _next_reconcile_at, _reconcile_task
+    if _reconcile_task is not None and not _reconcile_task.done():
+        return
+    now = time.monotonic()
+    if not force and now < _next_reconcile_at:
+        return
+    _next_reconcile_at = now + _INDEX_RECONCILE_INTERVAL
+    _reconcile_task = asyncio.create_task(_reconcile_in_background(container))
+
+
+async def _reconcile_in_background(container: ContainerClient) -> None:
+    try:
+        changed = await _reconcile_index(container)
+    except Exception as e:
+        logger.warning(f"Failed to reconcile deployments index: {e}")
+        return
+    if changed:
+        _list_cache.clear()
+        logger.info(f"Repaired {changed} deployments index entries")
+
+
+async def _load_deployment_records(
+    container: ContainerClient, names: List[str]
+) -> List[Tuple[Dict[str, Any], str]]:
+    """Download deployment records and their ETags concurrently, skipping ones that fail to load.
+    
+    Concurrency is bounded to stay within the SDK connection pool.
+    """
+    semaphore = asyncio.Semaphore(_LIST_DOWNLOAD_CONCURRENCY)
+    
+    async def _load(name: str) -> Tuple[Dict[str, Any], str]:
+        async with semaphore:
+            return await _download_json(container.get_blob_client(name))
+    
+    results = await asyncio.gather(*(_load(name) for name in names), return_exceptions=True)
+    
+    records = []
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Failed to load deployment from {name}: {result}")
+            continue
+        records.append(result)
+    return records
+
+
+async def _list_deployment_names(
+    container: ContainerClient,
+    project_id: str | None,
+    status: str | None
+) -> List[str]:
+    """List deployment record blob names, pre-filtered server-side when possible.
+    
+    Filters are resolved with a blob index tag query so only matching records
+    need downloading; callers still re-check the filters on the loaded data.
+    Falls back to a full container listing for unfiltered calls, values that
+    can't be expressed as tag values, or accounts without index tag support.
+    """
+    clauses = [(key, value) for key, value in (("project_id", project_id), ("status", status)) if value]
+    if clauses and all(_is_tag_value(value) for _, value in clauses):
+        query = " AND ".join(f"{key} = '{value}'" for key, value in clauses)
+        try:
+            return [
+                blob.name
+                async for blob in container.find_blobs_by_tags(query)
+                if blob.name.endswith("/deployment.json")
+            ]
+        except Exception as e:
+            logger.debug(f"Blob index tag query unavailable, listing container: {e}")
+    
+    return [
+        blob.name
+        async for blob in container.list_blobs()
+        if blob.name.endswith("/deployment.json")
+    ]
+
+
+async def read_deployment_logs(container: ContainerClient, deployment_id: str) -> List[Dict[str, Any]]:
+    """Read the log entries written so far for a deployment.
+    
+    The append blob is streamed and parsed line by line; deployments without
+    one fall back to the legacy JSON array, or an empty list.
+    """
+    try:
+        stream = await container.get_blob_client(f"{deployment_id}/{_LOGS_BLOB}").download_blob()
+    except ResourceNotFoundError:
+        try:
+            logs, _ = await _download_json(container.get_blob_client(f"{deployment_id}/{_LEGACY_LOGS_BLOB}"))
+        except ResourceNotFoundError:
+            return []
+        return logs
+    
+    logs = []
+    pending = b""
+    async for chunk in stream.chunks():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        logs.extend(loads(line) for line in lines if line)
+    if pending:
+        logs.append(loads(pending))
+    return logs
+
+
+class _DeploymentSuperseded(Exception):
+    """The stored deployment record reached a terminal state behind the writer's back."""
+
+
+class _ProgressWriter:
+    """Coalesces progress writes of a deployment record.
+    
+    Progress-only updates are persisted at most once per
+    ``_PROGRESS_WRITE_INTERVAL``; status transitions and terminal states are
+    always written. Writes are conditional on the ETag of the writer's last
+    write, so a concurrent cancel is never silently overwritten.
+    """
+    
+    def __init__(self, container: ContainerClient, deployment_data: Dict[str, Any], etag: str | None):
+        self._container = container
+        self._etag = etag
+        self._last_status = deployment_data.get("status")
+        self._last_write = time.monotonic()
+    
+    async def write(self, deployment_data: Dict[str, Any]) -> None:
+        try:
+            self._etag = await _save_deployment(self._container, deployment_data, self._etag)
+        except ResourceModifiedError:
+            stored, self._etag = await _load_raw_deployment(self._container, deployment_data["id"])
+            if stored.get("status") in _TERMINAL_STATUSES:
+                raise _DeploymentSuperseded(stored.get("status"))
+            self._etag = await _save_deployment(self._container, deployment_data, self._etag)
+        self._last_status = deployment_data.get("status")
+        self._last_write = time.monotonic()
+    
+    async def maybe_write(self, deployment_data: Dict[str, Any]) -> None:
+        status = deployment_data.get("status")
+        if (
+            status != self._last_status
+            or status in _TERMINAL_STATUSES
+            or time.monotonic() - self._last_write >= _PROGRESS_WRITE_INTERVAL
+        ):
+            await self.write(deployment_data)
+
+
 async def _simulate_deployment_process(
     deployment_id: str,
+    deployment_data: Dict[str, Any],
+    etag: str,
     deployment_request: DeploymentRequest,
-    azure_clients: AzureClientManager
+    container: ContainerClient
 ) -> None:
-    """Simulate deployment process (in production, this would use Azure Resource Manager)."""
-    import asyncio
+    """Simulate deployment process (in production, this would use Azure Resource Manager).
     
+    ``deployment_data`` is the record create_deployment just saved (at
+    ``etag``); it is updated in memory and written back at each step rather
+    than re-downloaded.
+    """
     try:
-        blob_client = azure_clients.get_blob_client()
-        container_name = "deployments"
+        writer = _ProgressWriter(container, deployment_data, etag)
         
-        # Create logs
-        logs = []
+        # Create logs; each entry is appended as it happens so readers see
+        # live progress and nothing is held in memory
+        logs_blob = container.get_blob_client(f"{deployment_id}/{_LOGS_BLOB}")
+        await logs_blob.create_append_blob(content_settings=_NDJSON_CONTENT_SETTINGS)
         
-        def add_log(level: str, message: str, operation: str = None):
-            logs.append({
-                "timestamp": datetime.utcnow().isoformat(),
+        async def add_log(level: str, message: str, operation: str = None):
+            line = dumps_bytes({
+                "timestamp": _now_ms(),
                 "level": level,
                 "message": message,
                 "operation": operation
-            })
+            }) + b"\n"
+            await logs_blob.append_block(line, length=len(line))
         
-        # Update deployment status to running
-        add_log("info", "Starting deployment process", "initialize")
-        
-        deployment_blob = f"{deployment_id}/deployment.json"
-        blob_data = await blob_client.get_blob_client(
-            container=container_name,
-            blob=deployment_blob
-        ).download_blob()
-        
-        deployment_data = json.loads(await blob_data.readall())
-        deployment_data["status"] = "running"
-        deployment_data["progress"] = 10
-        
-        await blob_client.get_blob_client(
-            container=container_name,
-            blob=deployment_blob
-        ).upload_blob(json.dumps(deployment_data, indent=2), overwrite=True)
+        # The record was saved as running by create_deployment
+        await add_log("info", "Starting deployment process", "initialize")
         
         # Simulate validation
-        add_log("info", "Validating template syntax", "validate")
-        await asyncio.sleep(1)
+        await add_log("info", "Validating template syntax", "validate")
+        if settings.DEPLOYMENT_SIM_DELAY_SEC:
+            await asyncio.sleep(settings.DEPLOYMENT_SIM_DELAY_SEC)
         deployment_data["progress"] = 30
         
-        await blob_client.get_blob_client(
-            container=container_name,
-            blob=deployment_blob
-        ).upload_blob(json.dumps(deployment_data, indent=2), overwrite=True)
+        await writer.maybe_write(deployment_data)
         
         if deployment_request.validation_only:
-            add_log("info", "Validation completed successfully", "validate")
+            final_log = ("Validation completed successfully", "validate")
             deployment_data["status"] = "succeeded"
             deployment_data["progress"] = 100
-            deployment_data["completed_at"] = datetime.utcnow().isoformat()
+            deployment_data["completed_at"] = _now_ms()
         else:
             # Simulate deployment steps
             steps = [
@@ -307,14 +825,12 @@ async def _simulate_deployment_process(
             ]
             
             for step_msg, progress in steps:
-                add_log("info", step_msg, "deploy")
-                await asyncio.sleep(2)
+                await add_log("info", step_msg, "deploy")
+                if settings.DEPLOYMENT_SIM_DELAY_SEC:
+                    await asyncio.sleep(settings.DEPLOYMENT_SIM_DELAY_SEC)
                 deployment_data["progress"] = progress
                 
-                await blob_client.get_blob_client(
-                    container=container_name,
-                    blob=deployment_blob
-                ).upload_blob(json.dumps(deployment_data, indent=2), overwrite=True)
+                await writer.maybe_write(deployment_data)
             
             # Simulate deployed resources
             deployment_data["deployed_resources"] = [
@@ -323,34 +839,27 @@ async def _simulate_deployment_process(
                 {"type": "Microsoft.Insights/components", "name": "appinsights001", "status": "Succeeded"}
             ]
             
-            add_log("info", "Deployment completed successfully", "complete")
+            final_log = ("Deployment completed successfully", "complete")
             deployment_data["status"] = "succeeded"
-            deployment_data["completed_at"] = datetime.utcnow().isoformat()
-        
-        # Save final deployment state
-        await blob_client.get_blob_client(
-            container=container_name,
-            blob=deployment_blob
-        ).upload_blob(json.dumps(deployment_data, indent=2), overwrite=True)
+            deployment_data["completed_at"] = _now_ms()
         
-        # Save logs
-        logs_blob = f"{deployment_id}/logs.json"
-        await blob_client.get_blob_client(
-            container=container_name,
-            blob=logs_blob
-        ).upload_blob(json.dumps(logs, indent=2), overwrite=True)
+        # Save final deployment state and the closing log entry; they are
+        # independent blobs, so write them concurrently
+        await asyncio.gather(
+            add_log("info", *final_log),
+            writer.maybe_write(deployment_data),
+        )
         
+    except _DeploymentSuperseded as e:
+        logger.info(f"Deployment {deployment_id} was {e} elsewhere; stopping simulation")
     except Exception as e:
         logger.error(f"Deployment simulation failed: {e}")
         # Update deployment as failed
         try:
             deployment_data["status"] = "failed"
             deployment_data["error_message"] = str(e)
-            deployment_data["completed_at"] = datetime.utcnow().isoformat()
+            deployment_data["completed_at"] = _now_ms()
             
-            await blob_client.get_blob_client(
-                container=container_name,
-                blob=deployment_blob
-            ).upload_blob(json.dumps(deployment_data, indent=2), overwrite=True)
+            await writer.write(deployment_data)
         except Exception as save_error:
             logger.error(f"Failed to save error state: {save_error}")
\ No newline at end of file
@@ -2,12 +2,15 @@
 API endpoint for analyzing architecture diagrams using OpenAI Vision
 """
 import base64
+import hashlib
 import logging
 import json
 import re
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional, Literal
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Literal, Tuple
 import os
 import asyncio
 from dotenv import load_dotenv
@@ -18,74 +21,167 @@ except Exception:
     AsyncOpenAI = None
 import openai
 
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+from app.core.responses import FastJSONResponse
+from app.core.serialization import loads
+
+try:
+    # Deterministic analyzers used when the model is unavailable or its output can't be parsed
+    from app.agents.azure_architect_agent import (
+        analyze_diagram_struct as _det_analyze,
+        analyze_image_for_architecture as _det_image_analyze,
+    )
+except Exception:  # pragma: no cover - agent deps are optional
+    _det_analyze = _det_image_analyze = None
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# NOTE: We intentionally avoid creating a top-level OpenAI client here so that
-# env changes during startup won't leave a stale client. The endpoint will
-# create an AsyncOpenAI client per-request when needed (safe for async FastAPI).
+# NOTE: The AsyncOpenAI client is created once at application startup (see the
+# lifespan in main.py) and shared via ``app.state.openai`` so requests reuse its
+# connection pool instead of paying a new TLS handshake each time.
+
+# Bound on concurrent vision calls to OpenAI, to stay clear of rate limits under
+# load; the timeout keeps a stuck call from holding a slot
+_OPENAI_SEMAPHORE = asyncio.Semaphore(int(os.getenv("OPENAI_CONCURRENCY", "8")))
+_OPENAI_TIMEOUT = 30.0
+
+# Patterns used when pulling JSON out of model responses
+_FENCED_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)\s*```", re.IGNORECASE)
+_FENCE_STRIP_RE = re.compile(r"```[a-zA-Z0-9_+-]*")
+_TRAILING_COMMA_RE = re.compile(r",\s*(\}|\])")
+
+# Responses above this size are parsed off the event loop
+_EXTRACT_JSON_THREAD_THRESHOLD = 4096
 
 
 def find_all_balanced_jsons(s: str) -> List[str]:
-    """Return all balanced-brace substrings that look like JSON objects found in s."""
-    results = []
-    if not s:
-        return results
-    starts = [m.start() for m in re.finditer(r"\{", s)]
-    for start_idx in starts:
-        depth = 0
-        for i, ch in enumerate(s[start_idx:], start=start_idx):
-            if ch == '{':
-                depth += 1
-            elif ch == '}':
-                depth -= 1
-                if depth == 0:
-                    cand = s[start_idx:i+1]
-                    results.append(cand)
-                    break
-    return results
+    """Return all balanced-brace substrings that look like JSON objects found in s.
+
+    Single pass with a stack of open-brace positions; every closing brace that
+    matches an open one yields that span (nested objects included), in order
+    of their opening brace.
+    """
+    if not s or '{' not in s:
+        return []
+    spans = []
+    stack = []
+    for i, ch in enumerate(s):
+        if ch == '{':
+            stack.append(i)
+        elif ch == '}' and stack:
+            start_idx = stack.pop()
+            spans.append((start_idx, i + 1))
+    spans.sort()
+    return [s[start:end] for start, end in spans]
+
+
+async def stream_completion_json_text(async_client: Any, **kwargs: Any) -> str:
+    """Stream a chat completion and return its text once the first JSON object closes.
+
+    Structural braces are counted as deltas arrive; when the outermost object
+    is closed the stream is abandoned instead of waiting for the rest of the
+    output. Inside the object, string literals (with backslash escapes) are
+    tracked so braces in values such as labels don't count. If no object
+    closes, the whole output is returned.
+    """
+    stream = await async_client.chat.completions.create(stream=True, **kwargs)
+    parts: List[str] = []
+    depth = 0
+    in_string = escaped = False
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            parts.append(delta)
+            for ch in delta:
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif ch == '\\':
+                        escaped = True
+                    elif ch == '"':
+                        in_string = False
+                elif ch == '"' and depth:
+                    in_string = True
+                elif ch == '{':
+                    depth += 1
+                elif ch == '}' and depth:
+                    depth -= 1
+                    if depth == 0:
+                        return "".join(parts)
+    finally:
+        await stream.close()
+    return "".join(parts)
 
 
 def extract_json_from_text(text: Optional[str]) -> Optional[dict]:
     """Attempt to extract a JSON object from free-form assistant text.
 
     Strategy:
+    - If the whole text is a JSON object, return it directly.
     - If fenced ```json blocks exist, scan their contents for balanced JSON candidates.
     - Otherwise, scan the whole text for balanced JSON candidates.
-    - Try candidates from largest->smallest, attempt json.loads, then simple repairs.
+    - Try candidates from largest->smallest, attempt to parse, then simple repairs.
     - Return the first successfully decoded dict, or None.
     """
     if not text:
         return None
 
+    # Fast path: the model usually returns a bare JSON object
+    stripped_text = text.strip()
+    if stripped_text.startswith('{') and stripped_text.endswith('}'):
+        try:
+            return loads(stripped_text)
+        except Exception:
+            pass
+
     candidates: List[str] = []
 
     # Prefer explicit fenced blocks first
-    fenced = re.findall(r"```(?:json)?\s*([\s\S]*?)\s*```", text, re.IGNORECASE)
+    fenced = _FENCED_RE.findall(text)
     if fenced:
         for block in fenced:
             block = block.strip()
             logger.info('Found fenced JSON block preview: %s', block[:200])
+            # A clean fenced object needs no sub-object scan
+            try:
+                parsed = loads(block)
+            except Exception:
+                parsed = None
+            if isinstance(parsed, dict):
+                return parsed
             candidates.extend(find_all_balanced_jsons(block) or [block])
     else:
         # No fences: try stripping triple-backticks then scanning
-        stripped = re.sub(r"```[a-zA-Z0-9_+-]*", "", text)
+        stripped = _FENCE_STRIP_RE.sub("", text)
         stripped = stripped.replace('```', '').strip()
         logger.info('No fenced block - using stripped text preview: %s', (stripped or '')[:200])
         candidates.extend(find_all_balanced_jsons(stripped))
         # Also scan the original text as a fallback
         candidates.extend(find_all_balanced_jsons(text))
 
-    # Deduplicate while preserving order
-    seen = set()
+    # Deduplicate while preserving order. Candidates are bucketed by length and
+    # their ends so long strings aren't hashed in full; only the rare bucket
+    # collision falls back to a full comparison.
+    seen: Dict[Tuple[int, str, str], List[str]] = {}
     uniq_candidates = []
     for c in candidates:
-        if c and c not in seen:
-            seen.add(c)
-            uniq_candidates.append(c)
+        if not c:
+            continue
+        bucket = seen.setdefault((len(c), c[:32], c[-32:]), [])
+        if c in bucket:
+            continue
+        bucket.append(c)
+        uniq_candidates.append(c)
 
     # Sort by length (largest first) - prefer full objects
     uniq_candidates.sort(key=len, reverse=True)
@@ -94,28 +190,32 @@ def extract_json_from_text(text: Optional[str]) -> Optional[dict]:
         preview = (cand or '')[:400]
         logger.info('Trying JSON candidate #%d (len=%d): %s', idx + 1, len(cand or ''), preview)
         try:
-            parsed = json.loads(cand)
+            parsed = loads(cand)
             logger.info('Parsed JSON candidate #%d successfully', idx + 1)
             return parsed
         except Exception as e:
-            logger.debug('Failed to json.loads candidate #%d: %s', idx + 1, str(e))
+            logger.debug('Failed to parse candidate #%d: %s', idx + 1, str(e))
             # Attempt simple repairs
-            # 1) Remove trailing commas before } or ]
-            repaired = re.sub(r",\s*(\}|\])", r"\1", cand)
-            try:
-                parsed = json.loads(repaired)
-                logger.info('Parsed repaired JSON candidate #%d successfully', idx + 1)
-                return parsed
-            except Exception:
-                pass
-            # 2) Replace single quotes with double quotes (best-effort)
-            try:
-                swapped = cand.replace("'", '"')
-                parsed = json.loads(swapped)
-                logger.info('Parsed single-quote-replaced candidate #%d successfully', idx + 1)
-                return parsed
-            except Exception:
-                pass
+            # 1) Remove trailing commas before } or ] (only reparse if any were removed)
+            if ',' in cand:
+                repaired, removed = _TRAILING_COMMA_RE.subn(r"\1", cand)
+                if removed:
+                    try:
+                        parsed = loads(repaired)
+                        logger.info('Parsed repaired JSON candidate #%d successfully', idx + 1)
+                        return parsed
+                    except Exception:
+                        pass
+            # 2) Replace single quotes with double quotes (best-effort); only for
+            # candidates without any double quotes, where it can't break valid strings
+            if '"' not in cand and "'" in cand:
+                try:
+                    swapped = cand.replace("'", '"')
+                    parsed = loads(swapped)
+                    logger.info('Parsed single-quote-replaced candidate #%d successfully', idx + 1)
+                    return parsed
+                except Exception:
+                    pass
 
     return None
 
@@ -130,6 +230,12 @@ def normalize_connections(analysis_json: dict) -> List[dict]:
     services = analysis_json.get("services", []) or []
     raw_conns = analysis_json.get("connections", []) or []
 
+    # Lower-case each service name once; exact lookups keep the first match
+    svc_lower = [(s.lower(), s) for s in services if isinstance(s, str)]
+    exact: Dict[str, str] = {}
+    for lo, s in svc_lower:
+        exact.setdefault(lo, s)
+
     def pick_key(d: dict, candidates):
         for k in candidates:
             if k in d and isinstance(d[k], str):
@@ -142,12 +248,11 @@ def normalize_connections(analysis_json: dict) -> List[dict]:
         n = name.strip()
         low = n.lower()
         # exact match
-        for s in services:
-            if isinstance(s, str) and s.lower() == low:
-                return s
+        if low in exact:
+            return exact[low]
         # substring match
-        for s in services:
-            if isinstance(s, str) and (low in s.lower() or s.lower() in low):
+        for lo, s in svc_lower:
+            if low in lo or lo in low:
                 return s
         # no match - return original
         return n
@@ -278,6 +383,128 @@ class ImageAnalysisResponse(BaseModel):
     analysis: DiagramAnalysisResult
 
 
+# Grouped or generic service names and the detailed sub-services they expand to
+_COGNITIVE_SERVICES = (
+    "Azure Cognitive Services - Text Analytics",
+    "Azure Cognitive Services - Translator",
+    "Azure Cognitive Services - Vision",
+)
+_EXPANSION_MAP: Dict[str, Tuple[str, ...]] = {
+    "Azure Cognitive Services": _COGNITIVE_SERVICES,
+    "Cognitive Services": _COGNITIVE_SERVICES,
+    "AI Search": ("Azure AI Search (Cognitive Search)",),
+    "Azure AI Search": ("Azure AI Search (Cognitive Search)",),
+    "AI Document Intelligence": ("Azure AI Document Intelligence (Form Recognizer)",),
+    "Document Intelligence": ("Azure AI Document Intelligence (Form Recognizer)",),
+}
+
+# System prompt for diagram analysis
+_SYSTEM_PROMPT = """You are an expert Azure cloud architect analyzing architecture diagrams.
+
+        Your task is to:
+        1. Identify every individual Azure service or feature icon visible in the diagram — even if multiple appear inside one box (for example: Text Analytics, Translator, and Vision should each be listed separately, not grouped under 'Cognitive Services').
+        2. Detect and describe all logical connections or data flows between services.
+        3. Provide a concise summary of the architecture’s purpose and flow.
+        4. Suggest additional Azure services that would strengthen or secure the architecture.
+
+            Return your analysis strictly in this JSON format:
+            {
+                "services": ["Service Name 1", "Service Name 2", ...],
+                "connections": [{"from_service": "Service A", "to_service": "Service B", "label": "connection type"}],
+                "description": "Brief description of the architecture",
+                "suggested_services": ["Suggested Service 1", "Suggested Service 2", ...]
+            }
+
+            Guidelines:
+            - List every distinct Azure icon or capability you see (e.g., Azure Cognitive Services - Text Analytics, Translator, Vision, Azure Functions, AI Document Intelligence, Azure Machine Learning, Azure Cognitive Search, Blob Storage, Table Storage, Web Application, etc.).
+            - Do **not** merge icons or label groups.
+            - Be specific with complete Azure service names (e.g., 'Azure Cognitive Services - Text Analytics' instead of 'Cognitive Services').
+            - Use precise connection labels (Ingestion, Enrichment, Projection, Query, Indexing, etc.).
+            """
+
+_USER_TEXT = "Please analyze this Azure architecture diagram and identify all services and their connections."
+
+
+def _build_messages(image_data: str) -> Any:
+    """Chat messages asking the model to analyze the diagram at ``image_data`` (a data: URL).
+
+    Typed as Any to avoid strict static type mismatches across SDK versions.
+    """
+    return [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": _USER_TEXT},
+                # Use proper OpenAI vision message format with separate image content;
+                # "low" detail reduces token usage
+                {"type": "image_url", "image_url": {"url": image_data, "detail": "low"}},
+            ],
+        },
+    ]
+
+
+# Images larger than this (decoded bytes) are downscaled before being sent to
+# the model; with "low" detail it only looks at a 512px version anyway
+_DOWNSCALE_MIN_BYTES = 200_000
+_DOWNSCALE_MAX_SIDE = 512
+_DOWNSCALE_JPEG_QUALITY = 85
+
+
+def _downscale_image(image_bytes: bytes, image_b64: str, image_format: str) -> Tuple[str, str]:
+    """Shrink a large image to at most 512px as JPEG to cut upload size.
+
+    ``image_bytes`` is the decoded form of ``image_b64``. Returns
+    ``(base64, mime_type)``; the input is returned unchanged when Pillow is
+    not installed, the image is already small, or it can't be decoded.
+    """
+    if Image is None or len(image_bytes) <= _DOWNSCALE_MIN_BYTES:
+        return image_b64, image_format
+    try:
+        img = Image.open(BytesIO(image_bytes))
+        img.thumbnail((_DOWNSCALE_MAX_SIDE, _DOWNSCALE_MAX_SIDE))
+        buf = BytesIO()
+        img.convert("RGB").save(buf, "JPEG", quality=_DOWNSCALE_JPEG_QUALITY)
+    except Exception as e:
+        logger.debug("Could not downscale image, sending original: %s", e)
+        return image_b64, image_format
+    return base64.b64encode(buf.getvalue()).decode(), "image/jpeg"
+
+
+# Maximum images per /analyze-diagrams call, to stay within the model context
+_MAX_BATCH_IMAGES = 8
+
+_BATCH_USER_TEXT = (
+    "Please analyze each of the following %d Azure architecture diagrams and identify all "
+    "services and their connections. Return a single JSON object of the form "
+    '{"analyses": [...]} with one analysis object per image, in the order the images are given.'
+)
+
+
+def _build_batch_messages(image_urls: List[str]) -> Any:
+    """Chat messages asking the model to analyze several diagrams in one call."""
+    return [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": _BATCH_USER_TEXT % len(image_urls)},
+                *({"type": "image_url", "image_url": {"url": url, "detail": "low"}} for url in image_urls),
+            ],
+        },
+    ]
+
+
+# LRU cache of model analyses keyed by a digest of the submitted image
+_IMAGE_ANALYSIS_CACHE_SIZE = 256
+_IMAGE_ANALYSIS_CACHE: "OrderedDict[Tuple[bytes, str], ImageAnalysisResponse]" = OrderedDict()
+
+
+def _image_cache_key(request: ImageAnalysisRequest) -> Tuple[bytes, str]:
+    """Cache key for an analysis request: SHA-256 of the base64 image plus its format."""
+    return hashlib.sha256(request.image.encode()).digest(), request.format
+
+
 def _choose_parent_group(a: DiagramGroup, b: DiagramGroup) -> DiagramGroup:
     index_a = GROUP_TYPE_ORDER.index(a.group_type) if a.group_type in GROUP_TYPE_ORDER else len(GROUP_TYPE_ORDER)
     index_b = GROUP_TYPE_ORDER.index(b.group_type) if b.group_type in GROUP_TYPE_ORDER else len(GROUP_TYPE_ORDER)
@@ -453,8 +680,37 @@ def build_group_structures(
 
     return list(groups.values())
 
-@router.post("/analyze-diagram", response_model=ImageAnalysisResponse)
-async def analyze_diagram(request: ImageAnalysisRequest, force_model: bool = False):
+def build_analysis_result(analysis_json: dict) -> DiagramAnalysisResult:
+    """Turn a parsed model analysis into a DiagramAnalysisResult."""
+    # --- Expand grouped or generic service names into detailed sub-services ---
+    # (deduplicated while preserving order)
+    expanded_services: Dict[str, None] = {}
+    for s in analysis_json.get("services", []):
+        for x in _EXPANSION_MAP.get(s, (s,)):
+            expanded_services[x] = None
+    analysis_json["services"] = list(expanded_services)
+    # Normalize and convert connections to the expected format
+    raw_connections = normalize_connections(analysis_json)
+    connections = [DiagramConnection(
+        from_service=rc.get("from_service", ""),
+        to_service=rc.get("to_service", ""),
+        label=rc.get("label", "connection")
+    ) for rc in raw_connections]
+
+    raw_groups = analysis_json.get("groups") or analysis_json.get("groupings") or []
+    groups = build_group_structures(analysis_json.get("services", []), connections, raw_groups)
+
+    # Create the analysis result
+    return DiagramAnalysisResult(
+        services=analysis_json.get("services", []),
+        connections=connections,
+        description=analysis_json.get("description", "Architecture diagram analyzed"),
+        suggested_services=analysis_json.get("suggested_services", []),
+        groups=groups
+    )
+
+@router.post("/analyze-diagram", response_model=ImageAnalysisResponse, response_class=FastJSONResponse)
+async def analyze_diagram(request: ImageAnalysisRequest, http_request: Request, force_model: bool = False):
     """
     Analyze an uploaded architecture diagram using OpenAI Vision API
     """
@@ -464,86 +720,53 @@ async def analyze_diagram(request: ImageAnalysisRequest, force_model: bool = Fal
         # Validate the image input
         if not request.image or not isinstance(request.image, str) or len(request.image.strip()) == 0:
             raise HTTPException(status_code=400, detail="Missing or empty image data (expected base64 string without data: prefix)")
-
-        # Prepare the image for OpenAI Vision API
-        image_data = f"data:{request.format};base64,{request.image}"
-
-        # Create the system prompt for diagram analysis
-        system_prompt = """You are an expert Azure cloud architect analyzing architecture diagrams.
-
-        Your task is to:
-        1. Identify every individual Azure service or feature icon visible in the diagram — even if multiple appear inside one box (for example: Text Analytics, Translator, and Vision should each be listed separately, not grouped under 'Cognitive Services').
-        2. Detect and describe all logical connections or data flows between services.
-        3. Provide a concise summary of the architecture’s purpose and flow.
-        4. Suggest additional Azure services that would strengthen or secure the architecture.
-
-            Return your analysis strictly in this JSON format:
-            {
-                "services": ["Service Name 1", "Service Name 2", ...],
-                "connections": [{"from_service": "Service A", "to_service": "Service B", "label": "connection type"}],
-                "description": "Brief description of the architecture",
-                "suggested_services": ["Suggested Service 1", "Suggested Service 2", ...]
-            }
-
-            Guidelines:
-            - List every distinct Azure icon or capability you see (e.g., Azure Cognitive Services - Text Analytics, Translator, Vision, Azure Functions, AI Document Intelligence, Azure Machine Learning, Azure Cognitive Search, Blob Storage, Table Storage, Web Application, etc.).
-            - Do **not** merge icons or label groups.
-            - Be specific with complete Azure service names (e.g., 'Azure Cognitive Services - Text Analytics' instead of 'Cognitive Services').
-            - Use precise connection labels (Ingestion, Enrichment, Projection, Query, Indexing, etc.).
-            """
-
+        # Reject malformed base64 here rather than after a model round-trip
+        try:
+            image_bytes = base64.b64decode(request.image, validate=True)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid image data (expected base64 string without data: prefix)")
+
+        # Identical images (e.g. re-posted while iterating on the frontend) reuse
+        # the earlier analysis; force_model always asks the model again
+        cache_key = _image_cache_key(request)
+        if not force_model:
+            cached = _IMAGE_ANALYSIS_CACHE.get(cache_key)
+            if cached is not None:
+                _IMAGE_ANALYSIS_CACHE.move_to_end(cache_key)
+                logger.info("Returning cached diagram analysis")
+                return cached
+
+        # Prepare the image for OpenAI Vision API, downscaled off the event loop
+        image_b64, image_format = await asyncio.to_thread(
+            _downscale_image, image_bytes, request.image, request.format
+        )
+        image_data = f"data:{image_format};base64,{image_b64}"
+        # Drop the other copies of the (possibly multi-MB) image so only the data
+        # URL stays alive during the model round-trip
+        del image_bytes, image_b64
+        request.image = ""
 
         # Call OpenAI Vision API using the async client if available. We send the
         # image as an inline data:<mime>;base64,... URL in the user message text
         # so that both async OpenAI clients and simple fallbacks can process it.
         response = None
         try:
-            openai_api_key = os.getenv("OPENAI_API_KEY")
-            if AsyncOpenAI is not None and openai_api_key:
+            async_client = getattr(http_request.app.state, "openai", None)
+            if async_client is None and AsyncOpenAI is not None and os.getenv("OPENAI_API_KEY"):
+                logger.warning("Shared AsyncOpenAI client missing from app state — trying sync client fallback")
+            if async_client is not None:
                 logger.info("Using AsyncOpenAI client for vision analysis")
-                async_client = AsyncOpenAI(api_key=openai_api_key)
-                try:
-                    # Use proper OpenAI vision message format with separate image content
-                    messages = [
-                        {"role": "system", "content": system_prompt},
-                        {
-                            "role": "user", 
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": "Please analyze this Azure architecture diagram and identify all services and their connections."
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": image_data,
-                                        "detail": "low"  # Use "low" to reduce token usage
-                                    }
-                                }
-                            ]
-                        }
-                    ]
-                    # Cast to Any to avoid strict static type mismatch with the SDK
-                    from typing import Any
-                    messages_any: Any = messages
-                    response = await async_client.chat.completions.create(
+                messages = _build_messages(image_data)
+                # Streamed so parsing can start as soon as the JSON object is complete
+                async with _OPENAI_SEMAPHORE:
+                    response = await stream_completion_json_text(
+                        async_client,
                         model=os.getenv("OPENAI_MODEL", "gpt-4o"),
-                        messages=messages_any,
+                        messages=messages,
                         max_tokens=1500,
-                        temperature=0.1
+                        temperature=0.1,
+                        timeout=_OPENAI_TIMEOUT
                     )
-                finally:
-                    # Close the async client to free resources if supported.
-                    # The close helper may be sync or async depending on the SDK,
-                    # so call it and await only if it returns a coroutine.
-                    aclose = getattr(async_client, 'aclose', None) or getattr(async_client, 'close', None)
-                    if callable(aclose):
-                        try:
-                            maybe_coro = aclose()
-                            if asyncio.iscoroutine(maybe_coro):
-                                await maybe_coro
-                        except Exception:
-                            pass
             else:
                 # Fall back to the synchronous OpenAI client if present (best-effort)
                 logger.info("AsyncOpenAI not available or OPENAI_API_KEY missing — trying sync client fallback")
@@ -552,34 +775,17 @@ async def analyze_diagram(request: ImageAnalysisRequest, force_model: bool = Fal
                     sync_client = getattr(openai, 'OpenAI', None)
                     if sync_client and os.getenv("OPENAI_API_KEY"):
                         client = sync_client(api_key=os.getenv("OPENAI_API_KEY"))
-                        messages = [
-                            {"role": "system", "content": system_prompt},
-                            {
-                                "role": "user", 
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": "Please analyze this Azure architecture diagram and identify all services and their connections."
-                                    },
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": image_data,
-                                            "detail": "low"
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                        # Cast messages to Any for compatibility with different SDK shapes
-                        from typing import Any
-                        messages_any: Any = messages
-                        response = client.chat.completions.create(
-                            model=os.getenv("OPENAI_MODEL", "gpt-4o"),
-                            messages=messages_any,
-                            max_tokens=1500,
-                            temperature=0.1
-                        )
+                        messages = _build_messages(image_data)
+                        # Run the blocking call in a worker thread so the event loop keeps serving
+                        async with _OPENAI_SEMAPHORE:
+                            response = await asyncio.to_thread(
+                                client.chat.completions.create,
+                                model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+                                messages=messages,
+                                max_tokens=1500,
+                                temperature=0.1,
+                                timeout=_OPENAI_TIMEOUT
+                            )
                 except Exception as e:
                     logger.warning("Sync OpenAI client call failed: %s", e)
                     response = None
@@ -594,11 +800,15 @@ async def analyze_diagram(request: ImageAnalysisRequest, force_model: bool = Fal
         if response is None:
             logger.warning("No OpenAI response received — using deterministic image analyzer fallback")
             try:
-                from app.agents.azure_architect_agent import analyze_image_for_architecture as deterministic_image_analyze
-                raw_content = deterministic_image_analyze(image_data)
+                if _det_image_analyze is None:
+                    raise RuntimeError("deterministic image analyzer unavailable")
+                raw_content = _det_image_analyze(image_data)
             except Exception as e:
                 logger.error("Deterministic image analyzer failed: %s", e)
                 raw_content = "{\"services\": [], \"connections\": [], \"description\": \"No analysis available\", \"suggested_services\": []}"
+        elif isinstance(response, str):
+            # Text already collected from a streamed completion
+            raw_content = response
         else:
             try:
                 # Support both async/sync client shapes. Prefer structured access
@@ -655,77 +865,32 @@ async def analyze_diagram(request: ImageAnalysisRequest, force_model: bool = Fal
         logger.info('OpenAI Vision analysis (type=%s, len=%d): %s', type(raw_content).__name__, len(analysis_text or ''), analysis_text[:1000])
 
         # Parse the JSON response robustly (strip Markdown/code fences, extract JSON block)
-        analysis_json = extract_json_from_text(analysis_text)
+        if len(analysis_text) > _EXTRACT_JSON_THREAD_THRESHOLD:
+            analysis_json = await asyncio.to_thread(extract_json_from_text, analysis_text)
+        else:
+            analysis_json = extract_json_from_text(analysis_text)
+        # Only model analyses are cached; fallbacks are retried next time
+        cacheable = response is not None and analysis_json is not None
         if analysis_json is None:
             # If JSON parsing fails, extract information manually
             logger.warning("Failed to parse JSON response, using fallback parsing")
             # Try the deterministic analyzer from azure_architect_agent as a
             # final fallback. This will at least return structured symbols.
-            try:
-                from app.agents.azure_architect_agent import analyze_diagram as deterministic_analyze
-                det = deterministic_analyze(analysis_text)
-                # deterministic_analyze returns a JSON string of resource symbols
+            services = []
+            if _det_analyze is not None:
+                # _det_analyze returns the resource symbol map directly
                 try:
-                    det_json = json.loads(det)
+                    det_json = _det_analyze(analysis_text)
                     services = [v.get("title") for k, v in det_json.items() if isinstance(v, dict)]
                 except Exception:
                     services = []
-                analysis_json = {
-                    "services": services,
-                    "connections": [],
-                    "description": (analysis_text or "").strip()[:200] + "...",
-                    "suggested_services": []
-                }
-            except Exception:
-                analysis_json = {
-                    "services": [],
-                    "connections": [],
-                    "description": (analysis_text or "").strip()[:200] + "...",
-                    "suggested_services": []
-                }
-        # --- Expand grouped or generic service names into detailed sub-services ---
-        EXPANSION_MAP = {
-            "Azure Cognitive Services": [
-                "Azure Cognitive Services - Text Analytics",
-                "Azure Cognitive Services - Translator",
-                "Azure Cognitive Services - Vision"
-            ],
-            "Cognitive Services": [
-                "Azure Cognitive Services - Text Analytics",
-                "Azure Cognitive Services - Translator",
-                "Azure Cognitive Services - Vision"
-            ],
-            "AI Search": ["Azure AI Search (Cognitive Search)"],
-            "Azure AI Search": ["Azure AI Search (Cognitive Search)"],
-            "AI Document Intelligence": ["Azure AI Document Intelligence (Form Recognizer)"],
-            "Document Intelligence": ["Azure AI Document Intelligence (Form Recognizer)"]
-        }
-
-        expanded_services = []
-        for s in analysis_json.get("services", []):
-            expanded_services.extend(EXPANSION_MAP.get(s, [s]))
-
-        # Deduplicate while preserving order
-        analysis_json["services"] = list(dict.fromkeys(expanded_services))
-        # Normalize and convert connections to the expected format
-        raw_connections = normalize_connections(analysis_json)
-        connections = [DiagramConnection(
-            from_service=rc.get("from_service", ""),
-            to_service=rc.get("to_service", ""),
-            label=rc.get("label", "connection")
-        ) for rc in raw_connections]
-
-        raw_groups = analysis_json.get("groups") or analysis_json.get("groupings") or []
-        groups = build_group_structures(analysis_json.get("services", []), connections, raw_groups)
-
-        # Create the analysis result
-        result = DiagramAnalysisResult(
-            services=analysis_json.get("services", []),
-            connections=connections,
-            description=analysis_json.get("description", "Architecture diagram analyzed"),
-            suggested_services=analysis_json.get("suggested_services", []),
-            groups=groups
-        )
+            analysis_json = {
+                "services": services,
+                "connections": [],
+                "description": (analysis_text or "").strip()[:200] + "...",
+                "suggested_services": []
+            }
+        result = build_analysis_result(analysis_json)
 
         logger.info(
             "Successfully analyzed diagram: %d services, %d connections, %d groups",
@@ -734,8 +899,98 @@ async def analyze_diagram(request: ImageAnalysisRequest, force_model: bool = Fal
             len(result.groups),
         )
 
-        return ImageAnalysisResponse(analysis=result)
+        analysis_response = ImageAnalysisResponse(analysis=result)
+        if cacheable:
+            _IMAGE_ANALYSIS_CACHE[cache_key] = analysis_response
+            if len(_IMAGE_ANALYSIS_CACHE) > _IMAGE_ANALYSIS_CACHE_SIZE:
+                _IMAGE_ANALYSIS_CACHE.popitem(last=False)
+        return analysis_response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing diagram: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to analyze diagram: {str(e)}")
+
+
+@router.post("/analyze-diagrams", response_model=List[ImageAnalysisResponse], response_class=FastJSONResponse)
+async def analyze_diagrams(
+    requests: List[ImageAnalysisRequest],
+    http_request: Request,
+    force_model: bool = False,
+):
+    """
+    Analyze several architecture diagrams with a single OpenAI Vision call.
+
+    Results are returned in request order. Cached images are answered from the
+    cache; if the batched call fails or returns the wrong number of analyses,
+    the remaining images are analyzed one by one via analyze_diagram.
+    """
+    if not requests:
+        return []
+    if len(requests) > _MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {_MAX_BATCH_IMAGES} images per request")
+
+    results: List[Optional[ImageAnalysisResponse]] = [None] * len(requests)
+    pending: List[int] = []
+    image_urls: List[str] = []
+    for i, req in enumerate(requests):
+        if not req.image or not req.image.strip():
+            raise HTTPException(status_code=400, detail=f"Missing or empty image data for image {i}")
+        try:
+            image_bytes = base64.b64decode(req.image, validate=True)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid image data for image {i}")
+        if not force_model:
+            cache_key = _image_cache_key(req)
+            cached = _IMAGE_ANALYSIS_CACHE.get(cache_key)
+            if cached is not None:
+                _IMAGE_ANALYSIS_CACHE.move_to_end(cache_key)
+                results[i] = cached
+                continue
+        image_b64, image_format = await asyncio.to_thread(_downscale_image, image_bytes, req.image, req.format)
+        image_urls.append(f"data:{image_format};base64,{image_b64}")
+        pending.append(i)
+
+    async_client = getattr(http_request.app.state, "openai", None)
+    if pending and async_client is not None:
+        try:
+            async with _OPENAI_SEMAPHORE:
+                text = await stream_completion_json_text(
+                    async_client,
+                    model=os.getenv("OPENAI_MODEL", "gpt-4o"),
+                    messages=_build_batch_messages(image_urls),
+                    max_tokens=1500 * len(pending),
+                    temperature=0.1,
+                    timeout=_OPENAI_TIMEOUT
+                )
+            if len(text) > _EXTRACT_JSON_THREAD_THRESHOLD:
+                parsed = await asyncio.to_thread(extract_json_from_text, text)
+            else:
+                parsed = extract_json_from_text(text)
+            analyses = (parsed or {}).get("analyses")
+            if isinstance(analyses, list) and len(analyses) == len(pending):
+                for i, analysis_json in zip(pending, analyses):
+                    if not isinstance(analysis_json, dict):
+                        continue
+                    response = ImageAnalysisResponse(analysis=build_analysis_result(analysis_json))
+                    _IMAGE_ANALYSIS_CACHE[_image_cache_key(requests[i])] = response
+                    if len(_IMAGE_ANALYSIS_CACHE) > _IMAGE_ANALYSIS_CACHE_SIZE:
+                        _IMAGE_ANALYSIS_CACHE.popitem(last=False)
+                    results[i] = response
+            else:
+                logger.warning("Batched diagram analysis returned an unexpected shape; analyzing images individually")
+        except Exception as e:
+            logger.warning("Batched diagram analysis failed, analyzing images individually: %s", e)
+
+    # Anything the batch didn't cover goes through the single-image path
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        singles = await asyncio.gather(*(
+            analyze_diagram(requests[i], http_request, force_model) for i in missing
+        ))
+        for i, response in zip(missing, singles):
+            results[i] = response
+
+    logger.info("Analyzed %d diagrams (%d in one batched call)", len(requests), len(pending) - len(missing))
+    return results
@@ -113,7 +113,7 @@ async def generate_iac(
                 extra_files['backend.tf'] = request_data.remote_backend
             if request_data.variables:
                 extra_files['variables.tf'] = request_data.variables
-            validation = validate_iac_with_cli(target, content or '', extra_files)
+            validation = await validate_iac_with_cli(target, content or '', extra_files)
             parameters.setdefault('validation', {})
             parameters['validation'].update(validation)
 
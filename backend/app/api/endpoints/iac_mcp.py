@@ -64,23 +64,22 @@ async def generate_iac_mcp(
     try:
         agent = azure_clients.get_azure_architect_agent()
         
-        # Generate Bicep using MCP enhancement
-        result = await agent.generate_bicep_via_mcp(
-            diagram=request_data.diagram,
-            region=request_data.region
-        )
+        # Generate Bicep using MCP enhancement; when validation is requested the
+        # agent generates and validates in a single run
+        if request_data.validate_output:
+            result = await agent.generate_and_validate_bicep(
+                diagram=request_data.diagram,
+                region=request_data.region
+            )
+        else:
+            result = await agent.generate_bicep_via_mcp(
+                diagram=request_data.diagram,
+                region=request_data.region
+            )
         
         bicep_code = result.get("bicep_code", "")
         parameters = result.get("parameters", {})
-        
-        # Optional validation using MCP
-        validation = {}
-        if request_data.validate_output and bicep_code:
-            try:
-                validation = await agent.validate_bicep_with_mcp(bicep_code)
-            except Exception as e:
-                logger.warning(f"MCP validation failed: {e}")
-                validation = {"valid": False, "errors": [f"Validation error: {str(e)}"]}
+        validation = result.get("validation", {})
         
         iac_id = str(uuid4())
         now = datetime.utcnow()
@@ -128,28 +127,24 @@ async def generate_terraform_mcp(
     try:
         agent = azure_clients.get_azure_architect_agent()
         
-        # Generate Terraform using MCP enhancement
-        result = await agent.generate_terraform_via_mcp(
-            diagram=request_data.diagram,
-            provider=request_data.provider
-        )
+        # Generate Terraform using MCP enhancement; when validation is requested
+        # the agent generates and validates in a single run
+        if request_data.validate_output:
+            result = await agent.generate_and_validate_terraform(
+                diagram=request_data.diagram,
+                provider=request_data.provider
+            )
+        else:
+            result = await agent.generate_terraform_via_mcp(
+                diagram=request_data.diagram,
+                provider=request_data.provider
+            )
         
         terraform_code = result.get("terraform_code", "")
         variables = result.get("variables", {})
         outputs = result.get("outputs", {})
         parameters = result.get("parameters", {"provider": request_data.provider})
-        
-        # Optional validation using MCP
-        validation = {}
-        if request_data.validate_output and terraform_code:
-            try:
-                validation = await agent.validate_terraform_with_mcp(
-                    terraform_code, 
-                    provider=request_data.provider
-                )
-            except Exception as e:
-                logger.warning(f"MCP Terraform validation failed: {e}")
-                validation = {"valid": False, "errors": [f"Validation error: {str(e)}"]}
+        validation = result.get("validation", {})
         
         iac_id = str(uuid4())
         now = datetime.utcnow()
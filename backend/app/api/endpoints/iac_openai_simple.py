@@ -5,12 +5,14 @@ with a structured prompt containing the diagram JSON and extract a JSON
 object with bicep_code/terraform_code. NO DETERMINISTIC FALLBACKS.
 """
 from __future__ import annotations
-import os, json, logging
+import os, logging
 from datetime import datetime
 from typing import Any, Dict
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from app.core.serialization import dumps, extract_json_object
+
 try:
     from openai import OpenAI
 except Exception:
@@ -81,7 +83,7 @@ async def generate_iac_simple(req: IaCGenerateRequest) -> IaCResponse:
         payload = {"diagram": diagram, "requirements": {"include_monitoring": req.include_monitoring, "include_security": req.include_security}}
         messages = [
             {"role": "system", "content": instruction},
-            {"role": "user", "content": json.dumps(payload)}
+            {"role": "user", "content": dumps(payload)}
         ]
         resp = client.chat.completions.create(model=model, messages=messages, temperature=0.2)
         text = resp.choices[0].message.content if resp.choices else ""
@@ -92,29 +94,8 @@ async def generate_iac_simple(req: IaCGenerateRequest) -> IaCResponse:
         logger.debug("Raw OpenAI response: %s", text[:2000])
 
         # Try parse JSON
-        def extract_json(txt: str):
-            start = txt.find("{")
-            if start == -1: return None
-            depth = 0
-            for i, ch in enumerate(txt[start:]):
-                if ch == '{': depth += 1
-                elif ch == '}':
-                    depth -= 1
-                    if depth == 0:
-                        end = start + i + 1
-                        try:
-                            return json.loads(txt[start:end])
-                        except Exception:
-                            return None
-            return None
-            
-        parsed = extract_json(text)
-        if not parsed:
-            try:
-                parsed = json.loads(text) if text.strip().startswith('{') else None
-            except:
-                parsed = None
-                
+        parsed = extract_json_object(text)
+
         if parsed and isinstance(parsed, dict) and parsed.get(code_key):
             content = parsed.get(code_key, "")
             parameters = parsed.get("parameters", {})
@@ -4,8 +4,32 @@ from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 from typing import Any, Dict
 
+from app.core.responses import FastJSONResponse
+
 router = APIRouter()
 
+_BICEP_HEADER = (
+    "// Stub Bicep template (agent deps missing)\n"
+    "// Generated locally without AI model\n"
+    "targetScope = 'resourceGroup'\n\n"
+    "param location string = 'westeurope'\n"
+    "param namePrefix string = 'stub'\n\n"
+    "var uniqueSuffix = substring(uniqueString(resourceGroup().id), 0, 6)\n"
+)
+
+# One placeholder resource per diagram node (braces doubled for str.format)
+_BICEP_NODE_TPL = (
+    "// Placeholder for {title}\n"
+    "resource res{i}_stub 'Microsoft.Resources/deployments@2020-10-01' = {{\n"
+    "  name: '${{namePrefix}}res${{uniqueSuffix}}{i}'\n"
+    "  properties: {{ mode: 'Incremental', template: {{}} }}\n"
+    "}}\n"
+)
+
+
+def _node_title(node: Dict[str, Any], index: int) -> str:
+    return str((node.get("data") or {}).get("title") or node.get("id") or f"resource{index}")
+
 
 class IaCGenerateRequest(BaseModel):
     diagram_data: Dict[str, Any]
@@ -15,7 +39,7 @@ class IaCGenerateRequest(BaseModel):
     resource_naming_convention: str = "standard"
 
 
-@router.post("/generate")
+@router.post("/generate", response_class=FastJSONResponse)
 async def generate_iac_shim(request_data: IaCGenerateRequest):
     """Return a deterministic stub Bicep (or Terraform) template instead of 503.
 
@@ -27,22 +51,10 @@ async def generate_iac_shim(request_data: IaCGenerateRequest):
     fmt = request_data.target_format.lower()
 
     if fmt == "bicep":
-        lines = []
-        lines.append("// Stub Bicep template (agent deps missing)")
-        lines.append("// Generated locally without AI model")
-        lines.append("targetScope = 'resourceGroup'\n")
-        lines.append("param location string = 'westeurope'")
-        lines.append("param namePrefix string = 'stub'\n")
-        lines.append("var uniqueSuffix = substring(uniqueString(resourceGroup().id), 0, 6)\n")
-        for i, n in enumerate(nodes):
-            title = str((n.get("data") or {}).get("title") or n.get("id") or f"resource{i}")
-            sym = f"res{i}_stub"
-            lines.append(f"// Placeholder for {title}")
-            lines.append(f"resource {sym} 'Microsoft.Resources/deployments@2020-10-01' = {{")
-            lines.append(f"  name: '${{namePrefix}}res${{uniqueSuffix}}{i}'")
-            lines.append("  properties: { mode: 'Incremental', template: {} }")
-            lines.append("}\n")
-        content = "\n".join(lines)
+        content = "\n".join([
+            _BICEP_HEADER,
+            *(_BICEP_NODE_TPL.format(i=i, title=_node_title(n, i)) for i, n in enumerate(nodes)),
+        ])
         return {
             "id": "stub",
             "format": "bicep",
@@ -55,8 +67,7 @@ async def generate_iac_shim(request_data: IaCGenerateRequest):
         # Terraform stub (very minimal)
         lines = ["# Stub Terraform template (agent deps missing)"]
         for i, n in enumerate(nodes):
-            title = str((n.get("data") or {}).get("title") or n.get("id") or f"resource{i}")
-            lines.append(f"# Placeholder for {title}")
+            lines.append(f"# Placeholder for {_node_title(n, i)}")
         content = "\n".join(lines)
         return {
             "id": "stub",
@@ -1,20 +1,107 @@
 """Project management endpoints."""
 
-import json
+import asyncio
+import gzip
 import logging
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 from uuid import uuid4
 
-from fastapi import APIRouter, HTTPException, Request, Depends
-from pydantic import BaseModel
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError,
+)
+from azure.storage.blob import ContentSettings
+from azure.storage.blob.aio import ContainerClient
+from fastapi import APIRouter, HTTPException, Header, Request, Depends
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
 
-# from app.core.azure_client import AzureClientManager
+from app.core.azure_client import AzureClientManager
 from app.core.config import settings
+from app.core.serialization import dumps_bytes, loads
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Maximum number of sub-requests in a single blob batch call
+_DELETE_BATCH_SIZE = 256
+
+# Maximum concurrent project downloads when listing
+_LIST_DOWNLOAD_CONCURRENCY = 16
+
+# Read-modify-write attempts for update_project before giving up
+_UPDATE_ATTEMPTS = 3
+
+# Summary index of all projects (ProjectSummary fields, and the ETag of the
+# project.json version each entry was taken from) so list_projects is a
+# single download instead of one per project
+_INDEX_BLOB = "_index.json"
+_INDEX_UPDATE_ATTEMPTS = 5
+
+# Minimum seconds between background reconciliations of the index with the
+# stored projects (per process), which repair entries lost to a failed or
+# raced index update
+_INDEX_RECONCILE_INTERVAL = 300.0
+_next_reconcile_at = 0.0
+_reconcile_task: "Optional[asyncio.Task[None]]" = None
+
+# The diagram is stored in its own blob next to the project.json metadata, as
+# MessagePack when available, so metadata-only updates don't rewrite it and
+# listings don't parse it. project.json records the diagram blob's name under
+# "diagram_blob"; older documents without it keep diagram_data inline.
+if msgpack is not None:
+    _DIAGRAM_BLOB = "diagram.msgpack"
+    _DIAGRAM_CONTENT_TYPE = "application/msgpack"
+else:
+    _DIAGRAM_BLOB = "diagram.json"
+    _DIAGRAM_CONTENT_TYPE = "application/json"
+
+# Project blobs are stored gzip-compressed with Content-Encoding: gzip, which
+# HTTP clients reading them directly decode transparently. Reads check the
+# gzip magic number, so blobs written uncompressed still load.
+_GZIP_LEVEL = 4
+_GZIP_MAGIC = b"\x1f\x8b"
+_JSON_CONTENT_SETTINGS = ContentSettings(content_type="application/json", content_encoding="gzip")
+_DIAGRAM_CONTENT_SETTINGS = ContentSettings(content_type=_DIAGRAM_CONTENT_TYPE, content_encoding="gzip")
+
+# Recently read or written project documents with their ETags, keyed by
+# project ID, so repeat reads skip blob storage and updates can write with
+# If-Match without downloading first. Entries expire after the TTL so changes
+# made by other instances are picked up.
+_PROJECT_CACHE_SIZE = 1024
+_PROJECT_CACHE_TTL = 30.0
+_project_cache: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+
+# Seconds to wait after the last update before writing a project to storage
+_WRITE_DEBOUNCE_SEC = 0.5
+
+# Failed writes are retried automatically, backing off exponentially from the
+# debounce delay up to this many seconds
+_WRITE_RETRY_MAX_SEC = 60.0
+
 
 class ProjectCreate(BaseModel):
     """Project creation request model."""
@@ -30,21 +117,39 @@ class ProjectUpdate(BaseModel):
     diagram_data: Dict[str, Any] | None = None
 
 
-class ProjectResponse(BaseModel):
-    """Project response model."""
+class ProjectSummary(BaseModel):
+    """Project listing model, without the diagram."""
     id: str
     name: str
     description: str
-    diagram_data: Dict[str, Any]
     created_at: datetime
     updated_at: datetime
 
 
+class ProjectResponse(ProjectSummary):
+    """Project response model."""
+    diagram_data: Dict[str, Any]
+
+
+_INDEX_FIELDS = tuple(ProjectSummary.model_fields)
+_SUMMARY_LIST_ADAPTER = TypeAdapter(List[ProjectSummary])
+
+# Serialized summary listing per response format, with the index ETag it was
+# built from; reused while the index blob is unchanged
+_summary_list_cache: Dict[str, Tuple[str, bytes]] = {}
+
+_LIST_MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+
 def get_azure_clients(request: Request) -> AzureClientManager:
     """Dependency to get Azure clients from app state."""
     return request.app.state.azure_clients
 
 
+def _projects_container(azure_clients: AzureClientManager) -> ContainerClient:
+    return azure_clients.get_container_client(settings.AZURE_STORAGE_CONTAINER_NAME_PROJECTS)
+
+
 @router.post("/", response_model=ProjectResponse)
 async def create_project(
     project: ProjectCreate,
@@ -60,20 +165,13 @@ async def create_project(
             "name": project.name,
             "description": project.description,
             "diagram_data": project.diagram_data,
-            "created_at": now.isoformat(),
-            "updated_at": now.isoformat(),
+            "created_at": now,
+            "updated_at": now,
         }
         
         # Save to blob storage
-        blob_client = azure_clients.get_blob_client()
-        container_name = settings.AZURE_STORAGE_CONTAINER_NAME_PROJECTS
-        blob_name = f"{project_id}/project.json"
-        
-        blob_data = json.dumps(project_data, indent=2)
-        await blob_client.get_blob_client(
-            container=container_name, 
-            blob=blob_name
-        ).upload_blob(blob_data, overwrite=True)
+        etag = await _save_project(_projects_container(azure_clients), project_data)
+        _cache_project(project_id, project_data, etag)
         
         logger.info(f"Created project {project_id}: {project.name}")
         return ProjectResponse(**project_data)
@@ -86,22 +184,34 @@ async def create_project(
 @router.get("/{project_id}", response_model=ProjectResponse)
 async def get_project(
     project_id: str,
+    consistent: bool = False,
     azure_clients: AzureClientManager = Depends(get_azure_clients)
 ) -> ProjectResponse:
-    """Get a project by ID."""
+    """Get a project by ID.
+    
+    With ``consistent=true`` any debounced changes are written to storage
+    before the project is returned.
+    """
     try:
-        blob_client = azure_clients.get_blob_client()
-        container_name = "projects"
-        blob_name = f"{project_id}/project.json"
+        if consistent or (project_id in _pending_writes and project_id not in _project_cache):
+            try:
+                await flush_project(project_id)
+            except Exception as e:
+                logger.error(f"Failed to save pending changes for project {project_id}: {e}")
+                raise HTTPException(status_code=500, detail="Failed to save pending project changes")
         
-        blob_data = await blob_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        ).download_blob()
+        cached = _cached_project(project_id)
+        if cached is not None:
+            return ProjectResponse(**cached[0])
         
-        project_data = json.loads(await blob_data.readall())
+        project_data, etag = await _download_project(
+            _projects_container(azure_clients), project_id
+        )
+        _cache_project(project_id, project_data, etag)
         return ProjectResponse(**project_data)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get project {project_id}: {e}")
         raise HTTPException(status_code=404, detail="Project not found")
@@ -112,36 +222,39 @@ async def update_project(
     project_id: str,
     project_update: ProjectUpdate,
     azure_clients: AzureClientManager = Depends(get_azure_clients)
-) -> ProjectResponse:
-    """Update a project."""
+) -> Dict[str, Any]:
+    """Update a project.
+    
+    The change is applied to the cached copy and returned immediately; the
+    blob write is debounced so a burst of edits (e.g. dragging nodes) becomes
+    a single upload of the combined changes. The document is returned as a
+    dict so it is validated only once, against the response model.
+    """
     try:
-        # First get the existing project
-        existing_project = await get_project(project_id, azure_clients)
-        
-        # Update fields
-        updated_data = existing_project.dict()
-        if project_update.name is not None:
-            updated_data["name"] = project_update.name
-        if project_update.description is not None:
-            updated_data["description"] = project_update.description
-        if project_update.diagram_data is not None:
-            updated_data["diagram_data"] = project_update.diagram_data
-        
-        updated_data["updated_at"] = datetime.utcnow().isoformat()
-        
-        # Save back to blob storage
-        blob_client = azure_clients.get_blob_client()
-        container_name = "projects"
-        blob_name = f"{project_id}/project.json"
-        
-        blob_data = json.dumps(updated_data, indent=2)
-        await blob_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        ).upload_blob(blob_data, overwrite=True)
+        container = _projects_container(azure_clients)
+        
+        cached = _cached_project(project_id)
+        if cached is None:
+            try:
+                cached = await _download_project(container, project_id)
+            except ResourceNotFoundError:
+                raise HTTPException(status_code=404, detail="Project not found")
+        updated_data, etag = cached
+        
+        changes = project_update.model_dump(exclude_none=True)
+        changes["updated_at"] = datetime.utcnow()
+        
+        updated_data.update(changes)
+        _cache_project(project_id, updated_data, etag)
+        
+        pending = _pending_writes.get(project_id)
+        if pending is None:
+            pending = _pending_writes[project_id] = _PendingWrite(container)
+        pending.changes.update(changes)
+        pending.schedule(project_id)
         
         logger.info(f"Updated project {project_id}")
-        return ProjectResponse(**updated_data)
+        return updated_data
         
     except HTTPException:
         raise
@@ -155,49 +268,621 @@ async def delete_project(
     project_id: str,
     azure_clients: AzureClientManager = Depends(get_azure_clients)
 ) -> Dict[str, str]:
-    """Delete a project."""
+    """Delete a project along with its assets, IaC and exports."""
     try:
-        blob_client = azure_clients.get_blob_client()
-        container_name = "projects"
+        pending = _pending_writes.pop(project_id, None)
+        if pending is not None:
+            pending.cancel()
+        _project_cache.pop(project_id, None)
+        container_names = [
+            settings.AZURE_STORAGE_CONTAINER_NAME_PROJECTS,
+            settings.AZURE_STORAGE_CONTAINER_NAME_ASSETS,
+            settings.AZURE_STORAGE_CONTAINER_NAME_IAC,
+            settings.AZURE_STORAGE_CONTAINER_NAME_EXPORTS,
+        ]
+        
+        # Clear every container concurrently, each with batch requests
+        deleted_counts = await asyncio.gather(*(
+            _delete_prefix(azure_clients.get_container_client(name), f"{project_id}/")
+            for name in container_names
+        ))
         
-        # Delete the project blob
-        blob_name = f"{project_id}/project.json"
-        await blob_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        ).delete_blob()
+        try:
+            await _update_index(_projects_container(azure_clients), project_id, None)
+        except Exception as e:
+            logger.warning(f"Failed to remove project {project_id} from index: {e}")
         
-        logger.info(f"Deleted project {project_id}")
+        if deleted_counts[0] == 0:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        logger.info(f"Deleted project {project_id} ({sum(deleted_counts)} files)")
         return {"message": "Project deleted successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to delete project {project_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to delete project: {str(e)}")
 
 
-@router.get("/", response_model=List[ProjectResponse])
+def _cached_project(project_id: str) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Return a copy of the cached project document and its ETag, if fresh."""
+    entry = _project_cache.get(project_id)
+    if entry is None:
+        return None
+    expires_at, etag, project_data = entry
+    if expires_at < time.monotonic():
+        del _project_cache[project_id]
+        return None
+    _project_cache.move_to_end(project_id)
+    return dict(project_data), etag
+
+
+def _cache_project(project_id: str, project_data: Dict[str, Any], etag: str) -> None:
+    """Store a project document and its ETag, evicting the least recently used."""
+    _project_cache[project_id] = (time.monotonic() + _PROJECT_CACHE_TTL, etag, project_data)
+    _project_cache.move_to_end(project_id)
+    if len(_project_cache) > _PROJECT_CACHE_SIZE:
+        _project_cache.popitem(last=False)
+
+
+class _PendingWrite:
+    """Project changes accepted but not yet written to blob storage.
+    
+    ``changes`` maps field names to their latest values. The flush re-applies
+    them on top of the stored document with an If-Match write, so updates from
+    other instances are merged rather than overwritten.
+    """
+    
+    def __init__(self, container: ContainerClient) -> None:
+        self.container = container
+        self.changes: Dict[str, Any] = {}
+        self.failures = 0
+        self.lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+    
+    def schedule(self, project_id: str, delay: float = _WRITE_DEBOUNCE_SEC) -> None:
+        """(Re)start the timer for writing this project after ``delay`` seconds."""
+        self.cancel()
+        self._timer = asyncio.get_running_loop().call_later(
+            delay, _start_background_flush, project_id
+        )
+    
+    def cancel(self) -> None:
+        """Stop a pending debounce timer, if any."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+_pending_writes: Dict[str, _PendingWrite] = {}
+_flush_tasks: Set["asyncio.Task[None]"] = set()
+
+
+def _start_background_flush(project_id: str) -> None:
+    task = asyncio.create_task(_flush_in_background(project_id))
+    _flush_tasks.add(task)
+    task.add_done_callback(_flush_tasks.discard)
+
+
+async def _flush_in_background(project_id: str) -> None:
+    try:
+        await flush_project(project_id)
+    except Exception as e:
+        logger.error(f"Failed to save project {project_id}: {e}")
+
+
+async def flush_project(project_id: str) -> None:
+    """Write any debounced changes for a project to blob storage now.
+    
+    Changes that fail to save are kept, a retry is scheduled with backoff
+    and the error is re-raised; changes to a project that no longer exists
+    are dropped.
+    """
+    pending = _pending_writes.get(project_id)
+    if pending is None:
+        return
+    pending.cancel()
+    
+    async with pending.lock:
+        changes, pending.changes = pending.changes, {}
+        if changes:
+            try:
+                project_data, etag = await _write_changes(pending.container, project_id, changes)
+            except ResourceNotFoundError:
+                logger.warning(f"Project {project_id} was deleted; dropping unsaved changes")
+                _project_cache.pop(project_id, None)
+            except Exception:
+                pending.changes = {**changes, **pending.changes}
+                if _pending_writes.get(project_id) is pending:
+                    pending.failures += 1
+                    pending.schedule(
+                        project_id,
+                        min(_WRITE_DEBOUNCE_SEC * 2 ** pending.failures, _WRITE_RETRY_MAX_SEC),
+                    )
+                raise
+            else:
+                pending.failures = 0
+                # Keep changes that arrived during the upload in the cached copy
+                project_data.update(pending.changes)
+                _cache_project(project_id, project_data, etag)
+        
+        if not pending.changes and _pending_writes.get(project_id) is pending:
+            del _pending_writes[project_id]
+
+
+async def flush_pending_writes() -> None:
+    """Write debounced changes for every project; used at shutdown."""
+    results = await asyncio.gather(
+        *(flush_project(project_id) for project_id in list(_pending_writes)),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error(f"Failed to save pending project changes: {result}")
+
+
+async def _write_changes(
+    container: ContainerClient, project_id: str, changes: Dict[str, Any]
+) -> Tuple[Dict[str, Any], str]:
+    """Apply ``changes`` to the stored project with a conditional write.
+    
+    The cached copy and its ETag are tried first, making the common case a
+    single upload; on a concurrent modification the blob is re-read and the
+    changes applied again. Returns the written document and its new ETag.
+    """
+    cached = _cached_project(project_id)
+    for attempt in range(_UPDATE_ATTEMPTS):
+        if cached is not None:
+            project_data, etag = cached
+            cached = None
+        else:
+            project_data, etag = await _download_project(container, project_id)
+        project_data.update(changes)
+        
+        try:
+            etag = await _save_project(
+                container, project_data, etag, diagram_changed="diagram_data" in changes
+            )
+            return project_data, etag
+        except ResourceModifiedError:
+            _project_cache.pop(project_id, None)
+            if attempt == _UPDATE_ATTEMPTS - 1:
+                raise
+            logger.debug(f"Project {project_id} changed during update; retrying")
+
+
+async def _download_bytes(
+    container: ContainerClient, blob_name: str, **kwargs: Any
+) -> Tuple[bytes, str]:
+    """Download a blob, decompressing it if gzipped; return it with its ETag.
+    
+    The transport leaves Content-Encoding: gzip bodies encoded, since a blob
+    fetched as several ranged GETs can only be inflated once reassembled.
+    Extra keyword arguments go to ``download_blob``.
+    """
+    stream = await container.get_blob_client(blob_name).download_blob(**kwargs)
+    data = await stream.readall()
+    if data[:2] == _GZIP_MAGIC:
+        data = gzip.decompress(data)
+    return data, stream.properties.etag
+
+
+async def _upload_compressed(
+    container: ContainerClient, blob_name: str, body: bytes, **kwargs: Any
+) -> Dict[str, Any]:
+    """Gzip and upload a blob; extra keyword arguments go to ``upload_blob``."""
+    kwargs.setdefault("content_settings", _JSON_CONTENT_SETTINGS)
+    return await container.get_blob_client(blob_name).upload_blob(
+        gzip.compress(body, compresslevel=_GZIP_LEVEL), **kwargs
+    )
+
+
+async def _download_json(container: ContainerClient, blob_name: str) -> Tuple[Any, str]:
+    """Download and parse a JSON blob; return it with its ETag."""
+    data, etag = await _download_bytes(container, blob_name)
+    return loads(data), etag
+
+
+async def _download_diagram(container: ContainerClient, blob_name: str) -> Dict[str, Any]:
+    """Download and decode a diagram blob in the format given by its extension."""
+    data, _ = await _download_bytes(container, blob_name)
+    if blob_name.endswith(".msgpack"):
+        if msgpack is None:
+            raise RuntimeError("msgpack is required to read MessagePack diagrams")
+        return msgpack.unpackb(data, raw=False)
+    return loads(data)
+
+
+async def _download_project(
+    container: ContainerClient, project_id: str, with_diagram: bool = True
+) -> Tuple[Dict[str, Any], str]:
+    """Download a project document, with its diagram, and the metadata ETag.
+    
+    The diagram is fetched alongside the metadata on the assumption that it
+    is in the current format; it is re-fetched only if the metadata says
+    otherwise.
+    """
+    meta_blob = f"{project_id}/project.json"
+    if not with_diagram:
+        return await _download_json(container, meta_blob)
+    
+    meta, diagram = await asyncio.gather(
+        _download_json(container, meta_blob),
+        _download_diagram(container, f"{project_id}/{_DIAGRAM_BLOB}"),
+        return_exceptions=True
+    )
+    if isinstance(meta, BaseException):
+        raise meta
+    project_data, etag = meta
+    
+    diagram_blob = project_data.get("diagram_blob")
+    if diagram_blob is not None:
+        if diagram_blob != _DIAGRAM_BLOB or isinstance(diagram, BaseException):
+            diagram = await _download_diagram(container, f"{project_id}/{diagram_blob}")
+        project_data["diagram_data"] = diagram
+    return project_data, etag
+
+
+async def _save_project(
+    container: ContainerClient,
+    project_data: Dict[str, Any],
+    etag: Optional[str] = None,
+    diagram_changed: bool = True
+) -> str:
+    """Upload a project document, refresh its index entry and return the new ETag.
+    
+    The diagram blob is only written when ``diagram_changed`` is set or the
+    stored diagram isn't in the current format; it goes first so the metadata
+    never points at a missing diagram. With ``etag`` the metadata write only
+    succeeds if it is unchanged since that version was read; otherwise
+    ``ResourceModifiedError`` is raised.
+    """
+    project_id = project_data["id"]
+    if diagram_changed or project_data.get("diagram_blob") != _DIAGRAM_BLOB:
+        diagram = project_data.get("diagram_data") or {}
+        if msgpack is not None:
+            body = msgpack.packb(diagram, use_bin_type=True)
+        else:
+            body = dumps_bytes(diagram)
+        await _upload_compressed(
+            container,
+            f"{project_id}/{_DIAGRAM_BLOB}",
+            body,
+            overwrite=True,
+            content_settings=_DIAGRAM_CONTENT_SETTINGS
+        )
+        project_data["diagram_blob"] = _DIAGRAM_BLOB
+    
+    meta = {key: value for key, value in project_data.items() if key != "diagram_data"}
+    conditions = {}
+    if etag is not None:
+        conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified}
+    result = await _upload_compressed(
+        container, f"{project_id}/project.json", dumps_bytes(meta), overwrite=True, **conditions
+    )
+    try:
+        await _update_index(container, project_id, _index_entry(project_data, result["etag"]))
+    except Exception as e:
+        # The project itself is saved; the next index reconcile repairs the entry
+        logger.warning(f"Failed to update projects index for {project_id}: {e}")
+    return result["etag"]
+
+
+def _index_entry(project_data: Dict[str, Any], etag: Optional[str]) -> Dict[str, Any]:
+    """Summary of a project document, as of metadata version ``etag``, as kept in the index blob."""
+    entry = {key: project_data[key] for key in _INDEX_FIELDS if key in project_data}
+    entry["etag"] = etag.strip('"') if etag else None
+    return entry
+
+
+async def _summary_listing(container: ContainerClient, format: str) -> Tuple[bytes, Optional[str]]:
+    """Sorted, serialized project summaries and the index ETag they reflect.
+    
+    The index is downloaded conditionally on the ETag of the cached listing,
+    so while it is unchanged a listing costs one 304 from storage and no
+    parsing or serialization. Without a usable index the projects are
+    scanned, the index is seeded and no ETag is returned.
+    """
+    cached = _summary_list_cache.get(format)
+    conditions = {}
+    if cached is not None:
+        conditions = {"etag": cached[0], "match_condition": MatchConditions.IfModified}
+    
+    entries = etag = None
+    try:
+        data, etag = await _download_bytes(container, _INDEX_BLOB, **conditions)
+        entries = list(loads(data).values())
+    except ResourceNotModifiedError:
+        _schedule_reconcile(container)
+        return cached[1], cached[0]
+    except ResourceNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to read projects index, listing projects instead: {e}")
+        etag = None
+    
+    if entries is None:
+        loaded = [pair async for pair in _load_projects(container, with_diagrams=False)]
+        # A full listing seeds the index so later calls are one download;
+        # projects saved while it was being seeded are merged in by an
+        # immediate reconcile
+        try:
+            await _create_index(container, loaded)
+        except Exception as e:
+            logger.warning(f"Failed to create projects index: {e}")
+        _schedule_reconcile(container, force=True)
+        entries = [_index_entry(project_data, etag) for project_data, etag in loaded]
+    else:
+        _schedule_reconcile(container)
+    
+    summaries = []
+    for entry in entries:
+        try:
+            summaries.append(ProjectSummary(**entry))
+        except Exception as e:
+            logger.warning(f"Skipping invalid project {entry.get('id')}: {e}")
+    summaries.sort(key=lambda p: p.updated_at, reverse=True)
+    
+    if format == "ndjson":
+        body = b"".join(summary.model_dump_json().encode() + b"\n" for summary in summaries)
+    else:
+        body = _SUMMARY_LIST_ADAPTER.dump_json(summaries)
+    if etag is not None:
+        _summary_list_cache[format] = (etag, body)
+    return body, etag
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(",")
+    )
+
+
+async def _create_index(
+    container: ContainerClient,
+    loaded: List[Tuple[Dict[str, Any], str]],
+    overwrite: bool = False
+) -> None:
+    """Write the index blob from a full listing of (project, ETag) pairs.
+    
+    Unless ``overwrite`` is set, a concurrently created index wins.
+    """
+    index = {
+        project["id"]: _index_entry(project, etag) for project, etag in loaded if "id" in project
+    }
+    try:
+        await _upload_compressed(container, _INDEX_BLOB, dumps_bytes(index), overwrite=overwrite)
+    except ResourceExistsError:
+        pass
+
+
+async def _modify_index(
+    container: ContainerClient, mutate: Callable[[Dict[str, Any]], Awaitable[int]]
+) -> Optional[int]:
+    """Apply ``mutate`` to the index blob and write it back if anything changed.
+    
+    Read-modify-write guarded by the blob ETag so concurrent writers don't drop
+    each other's entries; retried on conflict. ``mutate`` returns how many
+    entries it changed, which is returned; None means there is no index yet.
+    """
+    for _ in range(_INDEX_UPDATE_ATTEMPTS):
+        try:
+            index, etag = await _download_json(container, _INDEX_BLOB)
+        except ResourceNotFoundError:
+            return None
+        changed = await mutate(index)
+        if not changed:
+            return 0
+        try:
+            await _upload_compressed(
+                container,
+                _INDEX_BLOB,
+                dumps_bytes(index),
+                overwrite=True,
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified,
+            )
+            return changed
+        except ResourceModifiedError:
+            continue
+    raise RuntimeError(f"index still changing after {_INDEX_UPDATE_ATTEMPTS} attempts")
+
+
+async def _update_index(
+    container: ContainerClient, project_id: str, entry: Optional[Dict[str, Any]]
+) -> None:
+    """Upsert a project's summary in the index blob, or remove it if ``entry`` is None.
+    
+    An upsert for a project whose project.json no longer exists removes the
+    entry instead, so a write that finishes after the project was deleted
+    can't bring it back. Does nothing until the index has been seeded by
+    list_projects.
+    """
+    meta_blob = container.get_blob_client(f"{project_id}/project.json")
+    
+    async def _apply(index: Dict[str, Any]) -> int:
+        # Checked after each read of the index, so a delete that lands in
+        # between changes the index and fails this attempt's write
+        if entry is None or not await meta_blob.exists():
+            return int(index.pop(project_id, None) is not None)
+        index[project_id] = entry
+        return 1
+    
+    await _modify_index(container, _apply)
+
+
+async def _reconcile_index(container: ContainerClient) -> Optional[int]:
+    """Bring the index in line with the stored projects.
+    
+    Each project.json blob's ETag, from a single listing, is compared with
+    the one its index entry was taken from, so only projects missing from
+    the index or changed behind its back are downloaded; entries whose
+    project is gone are dropped. Entries rewritten while this runs are left
+    alone. Returns the number of entries changed, or None when there is no
+    index yet.
+    """
+    try:
+        index, _ = await _download_json(container, _INDEX_BLOB)
+    except ResourceNotFoundError:
+        return None
+    # Listed after the index was read, and project.json is written before its
+    # entry, so every indexed project that still exists is in the listing
+    stored = {
+        blob.name.split("/", 1)[0]: blob.etag.strip('"')
+        async for blob in container.list_blobs()
+        if blob.name.endswith("/project.json")
+    }
+    expected = {}
+    for project_id in stored.keys() | index.keys():
+        indexed_etag = (index.get(project_id) or {}).get("etag")
+        if stored.get(project_id) != indexed_etag:
+            expected[project_id] = indexed_etag
+    if not expected:
+        return 0
+    
+    fresh = {
+        project_data["id"]: _index_entry(project_data, etag)
+        async for project_data, etag in _load_projects(
+            container,
+            with_diagrams=False,
+            project_ids=[project_id for project_id in expected if project_id in stored],
+        )
+        if "id" in project_data
+    }
+    
+    async def _merge(current: Dict[str, Any]) -> int:
+        changed = 0
+        for project_id, indexed_etag in expected.items():
+            if (current.get(project_id) or {}).get("etag") != indexed_etag:
+                continue
+            if project_id in fresh:
+                current[project_id] = fresh[project_id]
+            elif project_id in stored or current.pop(project_id, None) is None:
+                continue
+            changed += 1
+        return changed
+    
+    return await _modify_index(container, _merge)
+
+
+def _schedule_reconcile(container: ContainerClient, force: bool = False) -> None:
+    """Start a background index reconcile if the interval has passed (or ``force``)."""
+    global _next_reconcile_at, _reconcile_task
+    if _reconcile_task is not None and not _reconcile_task.done():
+        return
+    now = time.monotonic()
+    if not force and now < _next_reconcile_at:
+        return
+    _next_reconcile_at = now + _INDEX_RECONCILE_INTERVAL
+    _reconcile_task = asyncio.create_task(_reconcile_in_background(container))
+
+
+async def _reconcile_in_background(container: ContainerClient) -> None:
+    try:
+        changed = await _reconcile_index(container)
+    except Exception as e:
+        logger.warning(f"Failed to reconcile projects index: {e}")
+        return
+    if changed:
+        logger.info(f"Repaired {changed} projects index entries")
+
+
+async def _load_projects(
+    container: ContainerClient,
+    with_diagrams: bool = True,
+    project_ids: Optional[List[str]] = None
+) -> AsyncIterator[Tuple[Dict[str, Any], str]]:
+    """Download project documents concurrently, yielding each with its ETag as it arrives.
+    
+    Every stored project is loaded unless ``project_ids`` is given. Projects
+    that fail to load are logged and skipped.
+    """
+    if project_ids is None:
+        project_ids = [
+            blob.name.split("/", 1)[0]
+            async for blob in container.list_blobs()
+            if blob.name.endswith("/project.json")
+        ]
+    semaphore = asyncio.Semaphore(_LIST_DOWNLOAD_CONCURRENCY)
+    
+    async def _load(project_id: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        async with semaphore:
+            try:
+                return await _download_project(container, project_id, with_diagram=with_diagrams)
+            except Exception as e:
+                logger.warning(f"Failed to load project {project_id}: {e}")
+                return None
+    
+    for next_project in asyncio.as_completed([_load(project_id) for project_id in project_ids]):
+        loaded = await next_project
+        if loaded is not None:
+            yield loaded
+
+
+async def _delete_prefix(container_client: ContainerClient, prefix: str) -> int:
+    """Delete every blob under ``prefix`` in batches; return how many were found."""
+    blob_names = [
+        blob.name async for blob in container_client.list_blobs(name_starts_with=prefix)
+    ]
+    for start in range(0, len(blob_names), _DELETE_BATCH_SIZE):
+        await container_client.delete_blobs(*blob_names[start:start + _DELETE_BATCH_SIZE])
+    return len(blob_names)
+
+
+@router.get("/", response_model=List[Union[ProjectResponse, ProjectSummary]])
 async def list_projects(
+    full: bool = False,
+    format: Literal["json", "ndjson"] = "json",
+    if_none_match: Optional[str] = Header(default=None),
     azure_clients: AzureClientManager = Depends(get_azure_clients)
-) -> List[ProjectResponse]:
-    """List all projects."""
+) -> Union[List[ProjectResponse], Response]:
+    """List all projects, most recently updated first.
+    
+    Summaries come from the projects index in a single download; the index
+    is seeded by the first listing. Summary listings carry an ETag derived
+    from the index and answer a matching If-None-Match with 304. With
+    ``full=true`` every project is downloaded including its diagram.
+    
+    With ``format=ndjson`` projects are written one JSON object per line.
+    Full projects are streamed unsorted as each download completes, so the
+    client can render them incrementally and the server never holds the
+    whole list.
+    """
     try:
-        blob_client = azure_clients.get_blob_client()
-        container_name = "projects"
+        container = _projects_container(azure_clients)
+        
+        if not full:
+            body, index_etag = await _summary_listing(container, format)
+            headers = {}
+            if index_etag is not None:
+                etag = '"{}-{}"'.format(index_etag.strip('"'), format)
+                if _etag_matches(if_none_match, etag):
+                    return Response(status_code=304, headers={"ETag": etag})
+                headers["ETag"] = etag
+            return Response(content=body, media_type=_LIST_MEDIA_TYPES[format], headers=headers)
+        
+        if format == "ndjson":
+            async def _stream() -> AsyncIterator[bytes]:
+                async for project_data, _ in _load_projects(container):
+                    try:
+                        yield ProjectResponse(**project_data).model_dump_json().encode() + b"\n"
+                    except Exception as e:
+                        logger.warning(f"Skipping invalid project {project_data.get('id')}: {e}")
+            
+            return StreamingResponse(_stream(), media_type="application/x-ndjson")
         
         projects = []
-        async for blob in blob_client.get_container_client(container_name).list_blobs():
-            if blob.name.endswith("/project.json"):
-                try:
-                    blob_data = await blob_client.get_blob_client(
-                        container=container_name,
-                        blob=blob.name
-                    ).download_blob()
-                    
-                    project_data = json.loads(await blob_data.readall())
-                    projects.append(ProjectResponse(**project_data))
-                except Exception as e:
-                    logger.warning(f"Failed to load project from {blob.name}: {e}")
-                    continue
+        async for project_data, _ in _load_projects(container):
+            try:
+                projects.append(ProjectResponse(**project_data))
+            except Exception as e:
+                logger.warning(f"Skipping invalid project {project_data.get('id')}: {e}")
         
         # Sort by updated_at descending
         projects.sort(key=lambda p: p.updated_at, reverse=True)
@@ -205,4 +890,22 @@ async def list_projects(
         
     except Exception as e:
         logger.error(f"Failed to list projects: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to list projects: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to list projects: {str(e)}")
+
+
+@router.post("/index/rebuild")
+async def rebuild_projects_index(
+    azure_clients: AzureClientManager = Depends(get_azure_clients)
+) -> Dict[str, str]:
+    """Rebuild the projects index from the stored project documents."""
+    try:
+        container = _projects_container(azure_clients)
+        loaded = [pair async for pair in _load_projects(container, with_diagrams=False)]
+        await _create_index(container, loaded, overwrite=True)
+        
+        logger.info(f"Rebuilt projects index ({len(loaded)} projects)")
+        return {"message": f"Projects index rebuilt ({len(loaded)} projects)"}
+        
+    except Exception as e:
+        logger.error(f"Failed to rebuild projects index: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild projects index: {str(e)}")
@@ -1,20 +1,50 @@
 """Simple mock endpoints for testing."""
 
+import bisect
+import gzip
 import json
 import logging
 from datetime import datetime
-from typing import Any, Dict, List
+from operator import itemgetter
+from typing import Any, Dict, List, Optional
 from uuid import uuid4
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
 from pydantic import BaseModel
 
+from app.core.serialization import dumps_bytes
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # In-memory storage for testing
 projects_storage = {}
 
+# The stored projects ordered by updated_at (oldest first), kept in step with
+# projects_storage so listing never sorts, plus the serialized list response
+# and its gzip encoding, reset on every change. Handlers mutate them without
+# awaiting in between, so they stay consistent on the event loop.
+_projects_by_update: List[Dict[str, Any]] = []
+_list_response_body: Optional[bytes] = None
+_list_response_gzip: Optional[bytes] = None
+_updated_at = itemgetter("updated_at")
+
+
+def _index_project(project_data: Dict[str, Any]) -> None:
+    global _list_response_body, _list_response_gzip
+    bisect.insort(_projects_by_update, project_data, key=_updated_at)
+    _list_response_body = _list_response_gzip = None
+
+
+def _unindex_project(project_data: Dict[str, Any]) -> None:
+    global _list_response_body, _list_response_gzip
+    i = bisect.bisect_left(_projects_by_update, project_data["updated_at"], key=_updated_at)
+    while _projects_by_update[i] is not project_data:
+        i += 1
+    del _projects_by_update[i]
+    _list_response_body = _list_response_gzip = None
+
 
 class ProjectCreate(BaseModel):
     """Project creation request model."""
@@ -57,6 +87,7 @@ async def create_project(project: ProjectCreate) -> ProjectResponse:
         }
         
         projects_storage[project_id] = project_data
+        _index_project(project_data)
         logger.info(f"Created project {project_id}: {project.name}")
         return ProjectResponse(**project_data)
         
@@ -90,7 +121,9 @@ async def update_project(project_id: str, project_update: ProjectUpdate) -> Proj
         project_data["diagram_data"] = project_update.diagram_data
     
     project_data["updated_at"] = datetime.utcnow()
+    _unindex_project(projects_storage[project_id])
     projects_storage[project_id] = project_data
+    _index_project(project_data)
     
     logger.info(f"Updated project {project_id}")
     return ProjectResponse(**project_data)
@@ -102,14 +135,29 @@ async def delete_project(project_id: str) -> Dict[str, str]:
     if project_id not in projects_storage:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    del projects_storage[project_id]
+    _unindex_project(projects_storage.pop(project_id))
     logger.info(f"Deleted project {project_id}")
     return {"message": "Project deleted successfully"}
 
 
 @router.get("/", response_model=List[ProjectResponse])
-async def list_projects() -> List[ProjectResponse]:
-    """List all projects."""
-    projects = [ProjectResponse(**data) for data in projects_storage.values()]
-    projects.sort(key=lambda p: p.updated_at, reverse=True)
-    return projects
\ No newline at end of file
+async def list_projects(request: Request) -> Response:
+    """List all projects, most recently updated first.
+    
+    The serialized list, and its gzip encoding for clients that accept it,
+    are reused until a project changes. The preset Content-Encoding makes the
+    compression middleware pass the gzipped body through untouched.
+    """
+    global _list_response_body, _list_response_gzip
+    if _list_response_body is None:
+        _list_response_body = dumps_bytes([
+            ProjectResponse(**data).model_dump(mode="json")
+            for data in reversed(_projects_by_update)
+        ])
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" not in request.headers.get("accept-encoding", ""):
+        return Response(content=_list_response_body, media_type="application/json", headers=headers)
+    if _list_response_gzip is None:
+        _list_response_gzip = gzip.compress(_list_response_body, compresslevel=9)
+    headers["Content-Encoding"] = "gzip"
+    return Response(content=_list_response_gzip, media_type="application/json", headers=headers)
\ No newline at end of file
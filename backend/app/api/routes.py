@@ -11,21 +11,8 @@ _iac_module = None
 iac = None
 _HAS_IAC = False
 try:
-	# Compatibility shim: some versions export `prepare_function_call_results`
-	# inside `agent_framework.openai._shared` while other packages expect it on
-	# the top-level `agent_framework` module. Attempt to copy the symbol if
-	# present to avoid import-time errors when loading the `iac` endpoints.
-	try:
-		import importlib
-		af_shared = importlib.import_module("agent_framework.openai._shared")
-		af_mod = importlib.import_module("agent_framework")
-		if not hasattr(af_mod, "prepare_function_call_results") and hasattr(
-			af_shared, "prepare_function_call_results"
-		):
-			setattr(af_mod, "prepare_function_call_results", af_shared.prepare_function_call_results)
-	except Exception:
-		# Non-fatal; we'll fall back to the shim router if the real iac module fails
-		pass
+	# The iac endpoints don't import agent_framework at import time; the
+	# compatibility shim is applied where it is first imported
 	from app.api.endpoints import iac as _iac_module
 	iac = _iac_module
 	_HAS_IAC = True
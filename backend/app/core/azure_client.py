@@ -1,19 +1,47 @@
-"""Azure client manager for centralized Azure service access."""
+"""Azure client manager for centralized Azure service access.
 
-import logging
-from typing import Optional, Union
+The Azure, OpenAI and agent framework SDKs are imported inside ``initialize``
+on the branch that uses them, so an OpenAI-only process never loads the Azure
+SDKs (and vice versa); they dominate startup time and memory otherwise.
+"""
+
+from __future__ import annotations
 
-from azure.identity.aio import DefaultAzureCredential
-from azure.storage.blob.aio import BlobServiceClient
-from azure.ai.projects.aio import AIProjectClient
-from agent_framework.azure import AzureAIAgentClient
-from openai import AsyncOpenAI
-from agent_framework.openai import OpenAIAssistantsClient, OpenAIResponsesClient
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Awaitable, Dict, List, Optional
 
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    import aiohttp
+    from azure.identity.aio import DefaultAzureCredential
+    from azure.storage.blob import UserDelegationKey
+    from azure.storage.blob.aio import BlobServiceClient, ContainerClient
+    from azure.ai.projects.aio import AIProjectClient
+    from agent_framework.azure import AzureAIAgentClient
+    from openai import AsyncOpenAI
+    from agent_framework.openai import OpenAIAssistantsClient, OpenAIResponsesClient
+
 logger = logging.getLogger(__name__)
 
+# A user delegation key is re-fetched after this long...
+USER_DELEGATION_KEY_REFRESH = timedelta(hours=1)
+# ...but stays valid long enough to cover SAS tokens of up to this lifetime
+# issued at the end of that window
+MAX_SAS_LIFETIME = timedelta(hours=24)
+# After a failed fetch (e.g. shared key or emulator accounts, or missing
+# RBAC) callers get the same error without a round trip for this long
+USER_DELEGATION_KEY_RETRY = timedelta(minutes=5)
+
+# Size of the initial GET and of each subsequent ranged GET for blob downloads;
+# larger than the SDK defaults so big blobs aren't split into many tiny requests
+BLOB_TRANSFER_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Seconds an idle blob storage connection is kept open for reuse
+BLOB_KEEPALIVE_TIMEOUT = 60
+
 
 class AzureClientManager:
     """Manages Azure service clients with proper lifecycle management."""
@@ -21,20 +49,33 @@ class AzureClientManager:
     def __init__(self) -> None:
         self.credential: Optional[DefaultAzureCredential] = None
         self.blob_client: Optional[BlobServiceClient] = None
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._container_clients: Dict[str, ContainerClient] = {}
         self.ai_project_client: Optional[AIProjectClient] = None
         self.agent_client: Optional[AzureAIAgentClient] = None
         self.openai_client: Optional[AsyncOpenAI] = None
         self.openai_assistants_client: Optional[OpenAIAssistantsClient] = None
         self.openai_responses_client: Optional[OpenAIResponsesClient] = None
         self._azure_architect_agent = None  # Will be AzureArchitectAgent instance
+        self._user_delegation_key: Optional[UserDelegationKey] = None
+        self._user_delegation_key_fetched_at: Optional[datetime] = None
+        self._user_delegation_key_error: Optional[Exception] = None
+        self._user_delegation_key_failed_at: Optional[datetime] = None
+        self._user_delegation_key_lock = asyncio.Lock()
         
     async def initialize(self) -> None:
         """Initialize all Azure clients and OpenAI clients if configured."""
         logger.info("Initializing clients...")
         
+        from app.core.compat import apply_agent_framework_shim
+        apply_agent_framework_shim()
+        
         if settings.USE_OPENAI_FALLBACK:
+            from agent_framework.openai import OpenAIAssistantsClient, OpenAIResponsesClient
+            from app.core.openai_client import create_async_openai_client
+            
             # Initialize OpenAI clients
-            self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            self.openai_client = create_async_openai_client()
             # Some wrappers require a model id at construction time; pass the
             # configured OPENAI_MODEL from settings to be explicit.
             self.openai_assistants_client = OpenAIAssistantsClient(
@@ -53,20 +94,47 @@ class AzureClientManager:
             )
             logger.info("OpenAI clients initialized successfully")
         else:
+            import aiohttp
+            from azure.ai.projects.aio import AIProjectClient
+            from azure.core.pipeline.transport import AioHttpTransport
+            from azure.identity.aio import DefaultAzureCredential
+            from azure.storage.blob.aio import BlobServiceClient
+            from agent_framework.azure import AzureAIAgentClient
+            
             # Initialize Azure credential
             self.credential = DefaultAzureCredential()
             
-            # Initialize Blob Storage client
+            # One explicitly sized, long-lived connection pool shared by the
+            # Azure SDK clients, so concurrent calls reuse warm connections.
+            # Bodies are left encoded, as on the sessions azure-core creates
+            # itself: gzip-encoded blobs fetched as ranged GETs can't be
+            # inflated range by range, so readers decompress the whole blob.
+            self._http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=settings.AZURE_HTTP_MAX_CONNECTIONS,
+                    limit_per_host=settings.AZURE_STORAGE_MAX_CONNECTIONS_PER_HOST,
+                    keepalive_timeout=BLOB_KEEPALIVE_TIMEOUT,
+                ),
+                auto_decompress=False,
+                trust_env=True,
+            )
             blob_url = f"https://{settings.AZURE_STORAGE_ACCOUNT_NAME}.blob.core.windows.net"
             self.blob_client = BlobServiceClient(
                 account_url=blob_url,
-                credential=self.credential
+                credential=self.credential,
+                transport=AioHttpTransport(session=self._http_session, session_owner=False),
+                max_single_get_size=BLOB_TRANSFER_CHUNK_SIZE,
+                max_chunk_get_size=BLOB_TRANSFER_CHUNK_SIZE
             )
+            # Build the container clients once; requests reuse them
+            for container_name in self._container_names():
+                self.get_container_client(container_name)
             
             # Initialize AI Project client
             self.ai_project_client = AIProjectClient(
                 endpoint=settings.AZURE_AI_PROJECT_ENDPOINT,
-                credential=self.credential
+                credential=self.credential,
+                transport=AioHttpTransport(session=self._http_session, session_owner=False),
             )
             
             # Initialize Agent client for MAF
@@ -95,6 +163,8 @@ class AzureClientManager:
             await self.blob_client.close()
         if self.ai_project_client:
             await self.ai_project_client.close()
+        if self._http_session:
+            await self._http_session.close()
         if self.credential:
             await self.credential.close()
         if self.openai_client:
@@ -107,7 +177,41 @@ class AzureClientManager:
         if not self.blob_client:
             raise RuntimeError("Blob client not initialized")
             
-        containers = [
+        await asyncio.gather(*(self._create_container(name) for name in self._container_names()))
+    
+    async def warm_up(self, connections: int, openai_client: Optional[AsyncOpenAI] = None) -> int:
+        """Open pooled connections to the configured services ahead of traffic.
+        
+        Issues ``connections`` concurrent cheap reads per service so the pools
+        hold that many established TLS connections before the first request.
+        ``openai_client`` defaults to the manager's own. Returns the number of
+        reads that succeeded; a failed read may still have warmed its socket.
+        """
+        if connections <= 0:
+            return 0
+        openai_client = openai_client or self.openai_client
+        requests: List[Awaitable[Any]] = []
+        if self.blob_client:
+            container = self.get_container_client(settings.AZURE_STORAGE_CONTAINER_NAME_PROJECTS)
+            requests.extend(container.exists() for _ in range(connections))
+        if openai_client:
+            requests.extend(self._list_models(openai_client) for _ in range(connections))
+        if not requests:
+            return 0
+        
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        warmed = sum(1 for result in results if not isinstance(result, BaseException))
+        logger.info(f"Warmed {warmed}/{len(requests)} service connections")
+        return warmed
+    
+    @staticmethod
+    async def _list_models(openai_client: AsyncOpenAI) -> None:
+        await openai_client.models.list()
+    
+    @staticmethod
+    def _container_names() -> list[str]:
+        """Names of the blob containers the application uses."""
+        return [
             settings.AZURE_STORAGE_CONTAINER_NAME_PROJECTS,
             settings.AZURE_STORAGE_CONTAINER_NAME_ASSETS,
             settings.AZURE_STORAGE_CONTAINER_NAME_EXPORTS,
@@ -115,14 +219,15 @@ class AzureClientManager:
             settings.AZURE_STORAGE_CONTAINER_NAME_DEPLOYMENTS,
             settings.AZURE_STORAGE_CONTAINER_NAME_CONVERSATIONS,
         ]
-        
-        for container_name in containers:
-            try:
-                await self.blob_client.create_container(container_name)
-                logger.info(f"Created container: {container_name}")
-            except Exception as e:
-                if "ContainerAlreadyExists" not in str(e):
-                    logger.warning(f"Failed to create container {container_name}: {e}")
+    
+    async def _create_container(self, container_name: str) -> None:
+        """Create a blob container, tolerating one that already exists."""
+        try:
+            await self.blob_client.create_container(container_name)
+            logger.info(f"Created container: {container_name}")
+        except Exception as e:
+            if "ContainerAlreadyExists" not in str(e):
+                logger.warning(f"Failed to create container {container_name}: {e}")
                     
     def get_blob_client(self) -> BlobServiceClient:
         """Get the blob storage client."""
@@ -130,6 +235,64 @@ class AzureClientManager:
             raise RuntimeError("Blob client not initialized")
         return self.blob_client
     
+    def get_container_client(self, container_name: str) -> ContainerClient:
+        """Get a cached container client.
+        
+        Container clients share the service client's pipeline and connection
+        pool, so one instance per container is reused for every request.
+        """
+        container_client = self._container_clients.get(container_name)
+        if container_client is None:
+            container_client = self.get_blob_client().get_container_client(container_name)
+            self._container_clients[container_name] = container_client
+        return container_client
+    
+    async def get_user_delegation_key(self) -> UserDelegationKey:
+        """Get a cached user delegation key for signing blob SAS tokens locally.
+        
+        The key is fetched from Azure at most once per USER_DELEGATION_KEY_REFRESH;
+        every SAS signed in between is a local HMAC with no service round-trip.
+        A failed fetch is re-raised without contacting Azure for
+        USER_DELEGATION_KEY_RETRY, so callers fall back to another credential
+        straight away.
+        """
+        key = self._cached_user_delegation_key(datetime.utcnow())
+        if key is not None:
+            return key
+        
+        async with self._user_delegation_key_lock:
+            now = datetime.utcnow()
+            key = self._cached_user_delegation_key(now)
+            if key is None:
+                try:
+                    key = await self.get_blob_client().get_user_delegation_key(
+                        key_start_time=now - timedelta(minutes=5),
+                        key_expiry_time=now + USER_DELEGATION_KEY_REFRESH + MAX_SAS_LIFETIME,
+                    )
+                except Exception as e:
+                    self._user_delegation_key_error = e
+                    self._user_delegation_key_failed_at = now
+                    raise
+                self._user_delegation_key = key
+                self._user_delegation_key_fetched_at = now
+                self._user_delegation_key_error = None
+                logger.info("Fetched new blob storage user delegation key")
+        return key
+    
+    def _cached_user_delegation_key(self, now: datetime) -> Optional[UserDelegationKey]:
+        """The current delegation key, None if one must be fetched, or the recent fetch error raised."""
+        if (
+            self._user_delegation_key is not None
+            and now - self._user_delegation_key_fetched_at < USER_DELEGATION_KEY_REFRESH
+        ):
+            return self._user_delegation_key
+        if (
+            self._user_delegation_key_error is not None
+            and now - self._user_delegation_key_failed_at < USER_DELEGATION_KEY_RETRY
+        ):
+            raise self._user_delegation_key_error
+        return None
+    
     def get_ai_project_client(self) -> AIProjectClient:
         """Get the AI project client."""
         if not self.ai_project_client:
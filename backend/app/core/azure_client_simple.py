@@ -1,12 +1,15 @@
 """Simplified Azure client manager using OpenAI only."""
 
-import logging
-from typing import Optional
+from __future__ import annotations
 
-from openai import AsyncOpenAI
+import logging
+from typing import TYPE_CHECKING, Optional
 
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,8 +25,10 @@ class AzureClientManager:
         
         if not settings.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY is required")
-            
-        self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        
+        # Imported here so the OpenAI SDK loads only when it is used
+        from app.core.openai_client import create_async_openai_client
+        self.openai_client = create_async_openai_client()
         logger.info("OpenAI client initialized successfully")
         
     async def cleanup(self) -> None:
@@ -0,0 +1,26 @@
+"""Compatibility shims for mismatched optional dependency versions."""
+
+import importlib
+import warnings
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def apply_agent_framework_shim() -> None:
+    """Re-export ``prepare_function_call_results`` on the top-level ``agent_framework``.
+
+    Some released versions of agent-related packages place the helper in
+    ``agent_framework.openai._shared`` while other packages import it from the
+    top-level module, which fails at import time. Call this before importing
+    from ``agent_framework``; it runs once, on first use, so processes that
+    never touch the agent framework don't load it.
+    """
+    try:
+        af_shared = importlib.import_module("agent_framework.openai._shared")
+        af_mod = importlib.import_module("agent_framework")
+        if not hasattr(af_mod, "prepare_function_call_results") and hasattr(
+            af_shared, "prepare_function_call_results"
+        ):
+            setattr(af_mod, "prepare_function_call_results", af_shared.prepare_function_call_results)
+    except Exception as _shim_err:  # pragma: no cover - environment-dependent
+        warnings.warn(f"agent_framework compatibility shim not applied: {_shim_err}")
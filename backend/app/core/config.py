@@ -19,6 +19,10 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str | None = Field(default=None, description="OpenAI API key for fallback")
     OPENAI_MODEL: str = Field(default="gpt-4o", description="OpenAI model to use")
     USE_OPENAI_FALLBACK: bool = Field(default=False, description="Use OpenAI instead of Azure OpenAI when available")
+    OPENAI_MAX_CONNECTIONS: int = Field(default=200, description="OpenAI HTTP connection pool size")
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=100, description="Idle OpenAI connections kept for reuse")
+    OPENAI_TIMEOUT_SEC: float = Field(default=60.0, description="OpenAI request timeout")
+    OPENAI_CONNECT_TIMEOUT_SEC: float = Field(default=5.0, description="OpenAI connect timeout")
     
     # Azure configuration (optional when using OpenAI fallback)
     AZURE_SUBSCRIPTION_ID: str | None = Field(default=None, description="Azure subscription ID")
@@ -42,6 +46,9 @@ class Settings(BaseSettings):
     AZURE_STORAGE_CONTAINER_NAME_IAC: str = Field(default="iac", description="IaC templates container")
     AZURE_STORAGE_CONTAINER_NAME_DEPLOYMENTS: str = Field(default="deployments", description="Deployments container")
     AZURE_STORAGE_CONTAINER_NAME_CONVERSATIONS: str = Field(default="conversations", description="Conversations container")
+    AZURE_HTTP_MAX_CONNECTIONS: int = Field(default=100, description="HTTP connection pool size shared by the Azure SDK clients")
+    AZURE_STORAGE_MAX_CONNECTIONS_PER_HOST: int = Field(default=64, description="Blob storage HTTP connections per host")
+    CONNECTION_WARMUP_COUNT: int = Field(default=4, description="Connections opened per service at startup (0 disables)")
     
     # Azure Key Vault
     AZURE_KEY_VAULT_URL: str | None = Field(default=None, description="Key Vault URL")
@@ -53,6 +60,9 @@ class Settings(BaseSettings):
         default=["http://localhost:5173", "http://localhost:3000"],
         description="CORS allowed origins"
     )
+    GZIP_LEVEL: int = Field(default=5, ge=1, le=9, description="gzip compression level for API responses")
+    PROFILE: bool = Field(default=False, description="Profile every HTTP request with pyinstrument")
+    PROFILE_DIR: str = Field(default="/tmp/profiles", description="Directory for request profiles")
     
     # Chat and WebSocket
     CHAT_MAX_HISTORY: int = Field(default=50, description="Max chat history messages")
@@ -76,6 +86,7 @@ class Settings(BaseSettings):
     # Deployment
     DEPLOYMENT_TIMEOUT_MINUTES: int = Field(default=30, description="Deployment timeout")
     MAX_CONCURRENT_DEPLOYMENTS: int = Field(default=3, description="Max concurrent deployments")
+    DEPLOYMENT_SIM_DELAY_SEC: float = Field(default=0.0, description="Delay per simulated deployment step (0 disables)")
     
     @property
     def storage_connection_string(self) -> str | None:
@@ -0,0 +1,111 @@
+"""ASGI middleware shared by the application."""
+
+import asyncio
+import logging
+import os
+from contextvars import ContextVar
+from typing import Any, Iterable, Optional
+from uuid import uuid4
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Media types of responses clients read incrementally
+STREAMING_MEDIA_TYPES = ("text/event-stream", "application/x-ndjson")
+
+# The server's send for the current request, so a response can bypass the
+# compressor once its headers show it is streamed
+_uncompressed_send: ContextVar[Optional[Send]] = ContextVar("uncompressed_send", default=None)
+
+
+class SelectiveCompressionMiddleware:
+    """Run a compression middleware for everything except streaming traffic.
+
+    Compressors buffer output until a block fills, which holds back small
+    streamed chunks. Requests under ``exclude_paths`` go straight to the app;
+    the rest are handed to ``compressor`` built with ``options``, except
+    that a response whose Content-Type is a streaming media type is sent
+    past it uncompressed.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        compressor: Any,
+        exclude_paths: Iterable[str] = (),
+        **options: Any,
+    ) -> None:
+        self.app = app
+        self.compressed_app = compressor(self._route_response, **options)
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (
+            self.exclude_paths and scope["path"].startswith(self.exclude_paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+        token = _uncompressed_send.set(send)
+        try:
+            await self.compressed_app(scope, receive, send)
+        finally:
+            _uncompressed_send.reset(token)
+
+    async def _route_response(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # ``send`` leads into the compressor; streamed responses switch to the
+        # server's send at http.response.start, before the compressor sees them
+        target = send
+
+        async def route(message: Message) -> None:
+            nonlocal target
+            if message["type"] == "http.response.start":
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                media_type = content_type.partition(";")[0].strip().lower()
+                if media_type in STREAMING_MEDIA_TYPES:
+                    target = _uncompressed_send.get() or send
+            await target(message)
+
+        await self.app(scope, receive, route)
+
+
+class ProfileMiddleware:
+    """Profile each HTTP request with pyinstrument.
+
+    For every request an HTML report and a speedscope JSON profile are
+    written to ``output_dir`` as ``<id>.html`` and ``<id>.speedscope.json``.
+    Profiling slows every request down, so this is only registered when
+    ``settings.PROFILE`` is set. Requires the optional ``pyinstrument``
+    package.
+    """
+
+    def __init__(self, app: ASGIApp, output_dir: str) -> None:
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+
+        self.app = app
+        self.output_dir = output_dir
+        self._profiler_cls = Profiler
+        self._renderers = ((".html", HTMLRenderer), (".speedscope.json", SpeedscopeRenderer))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self._profiler_cls(async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            await asyncio.to_thread(self._write_reports, profiler, scope["method"], scope["path"])
+
+    def _write_reports(self, profiler: Any, method: str, path: str) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, uuid4().hex)
+        for suffix, renderer in self._renderers:
+            with open(base + suffix, "w", encoding="utf-8") as f:
+                f.write(profiler.output(renderer=renderer()))
+        logger.info("Profiled %s %s: %s.html", method, path, base)
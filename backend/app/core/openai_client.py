@@ -0,0 +1,31 @@
+"""Factory for OpenAI clients on a shared, explicitly sized connection pool."""
+
+import importlib.util
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+
+# HTTP/2 multiplexes concurrent requests over one connection, but httpx only
+# supports it when the optional h2 package is installed
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def create_async_openai_client(api_key: str | None = None) -> AsyncOpenAI:
+    """Create an AsyncOpenAI client backed by a pooled httpx client.
+
+    The pool limits and timeouts come from settings; closing the OpenAI
+    client also closes the underlying httpx client.
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(
+            settings.OPENAI_TIMEOUT_SEC, connect=settings.OPENAI_CONNECT_TIMEOUT_SEC
+        ),
+        http2=_HTTP2_AVAILABLE,
+    )
+    return AsyncOpenAI(api_key=api_key or settings.OPENAI_API_KEY, http_client=http_client)
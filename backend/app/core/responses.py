@@ -0,0 +1,18 @@
+"""Response classes shared by the API endpoints."""
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.core.serialization import dumps_bytes
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the shared serializer.
+
+    Uses orjson when it is installed, like FastAPI's ``ORJSONResponse``, but
+    falls back to the standard library instead of failing without it.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,117 @@
+"""JSON serialization helpers shared across the backend.
+
+orjson is used when it is installed; otherwise the standard library is used
+with compact separators so both paths produce equivalent, whitespace-free output.
+Decode errors raised by ``loads`` are ``json.JSONDecodeError`` (or a subclass)
+either way. ``extract_json_object`` pulls a JSON object out of free-form model
+output and can use the optional ``json_repair`` package as a last resort.
+"""
+
+import json
+import re
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional accelerator
+    orjson = None
+
+try:
+    import json_repair
+except ImportError:  # pragma: no cover - optional dependency
+    json_repair = None
+
+HAS_ORJSON = orjson is not None
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Serialize ``obj`` to compact UTF-8 encoded JSON bytes."""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+
+    def dumps(obj: Any) -> str:
+        """Serialize ``obj`` to a compact JSON string."""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode()
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        """Parse a JSON document from ``str`` or UTF-8 bytes."""
+        return orjson.loads(data)
+
+else:
+
+    def _default(obj: Any) -> Any:
+        # Match orjson, which writes dates/datetimes natively in ISO 8601
+        if isinstance(obj, (date, datetime)):
+            return obj.isoformat()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Serialize ``obj`` to compact UTF-8 encoded JSON bytes."""
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default).encode()
+
+    def dumps(obj: Any) -> str:
+        """Serialize ``obj`` to a compact JSON string."""
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default)
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        """Parse a JSON document from ``str`` or UTF-8 bytes."""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Markdown code fences wrapped around a model's JSON answer
+_JSON_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+# Outermost brace span, handed to json_repair as a last resort
+_JSON_CANDIDATE_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def extract_json_object(txt: str) -> Optional[Dict[str, Any]]:
+    """Return the JSON object embedded in an LLM response, or None.
+
+    Attempts, cheapest first: the whole response (the common structured
+    output case), the response with Markdown fences stripped, each ``{`` in
+    turn via the C-accelerated ``raw_decode`` (which honours braces inside
+    strings), and finally ``json_repair`` on the outermost brace span when
+    that optional package is installed.
+    """
+    stripped = txt.strip()
+    if stripped.startswith("{"):
+        try:
+            parsed = loads(stripped)
+            if isinstance(parsed, dict):
+                return parsed
+        except ValueError:
+            pass
+
+    unfenced = _JSON_FENCE_RE.sub("", stripped)
+    if unfenced != stripped and unfenced.startswith("{"):
+        try:
+            parsed = loads(unfenced)
+            if isinstance(parsed, dict):
+                return parsed
+        except ValueError:
+            pass
+
+    start = unfenced.find("{")
+    while start != -1:
+        try:
+            return _JSON_DECODER.raw_decode(unfenced, start)[0]
+        except ValueError:
+            start = unfenced.find("{", start + 1)
+
+    if json_repair is not None:
+        candidate = _JSON_CANDIDATE_RE.search(unfenced)
+        if candidate:
+            try:
+                repaired = json_repair.loads(candidate.group(0))
+                if isinstance(repaired, dict) and repaired:
+                    return repaired
+            except Exception:
+                pass
+    return None
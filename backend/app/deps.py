@@ -1,14 +1,23 @@
 """Dependency management for MCP tools and other shared resources."""
 
+import asyncio
 import os
 import logging
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.core.compat import apply_agent_framework_shim
 
 logger = logging.getLogger(__name__)
 
-# Global MCP tool instances for connection pooling
+# Global MCP tool instances for connection pooling. None means not yet
+# initialized; _DISABLED records that MCP is not configured or not installed,
+# so later calls return None without re-checking settings and env vars.
+_DISABLED = object()
 _mcp_bicep_tool: Optional[object] = None
 _mcp_terraform_tool: Optional[object] = None
+_mcp_bicep_lock = asyncio.Lock()
+_mcp_terraform_lock = asyncio.Lock()
 
 
 async def get_mcp_bicep_tool():
@@ -19,43 +28,50 @@ async def get_mcp_bicep_tool():
     """
     global _mcp_bicep_tool
     if _mcp_bicep_tool is None:
-        try:
-            from app.core.config import settings
-            mcp_url = (settings.AZURE_MCP_BICEP_URL or "").strip()
-
-            # Basic guard: don't attempt to initialize when no real MCP endpoint is configured
-            force_init = os.getenv("AZURE_MCP_BICEP_FORCE", "false").lower() in ("1", "true", "yes")
-            if (not mcp_url or "learn.microsoft.com" in mcp_url or "docs.microsoft.com" in mcp_url) and not force_init:
-                logger.info(
-                    "Azure Bicep MCP URL not configured or points to docs; skipping MCP initialization.\n"
-                    "If you intend to use the official learn.microsoft.com MCP endpoint, ensure your environment supports a streamable MCP HTTP transport and set AZURE_MCP_BICEP_FORCE=true to force initialization.\n"
-                    "Note: Browsers and plain HTTP POSTs won't work; use MCPStreamableHTTPTool from agent_framework which establishes a streaming MCP session."
-                )
-                return None
-
-            # Import MCP tool from agent framework
-            from agent_framework import MCPStreamableHTTPTool
-
-            _mcp_bicep_tool = MCPStreamableHTTPTool(
-                name="Azure Bicep MCP",
-                url=mcp_url,
-            )
-
-            # Open connection once and reuse
-            enter_method = getattr(_mcp_bicep_tool, '__aenter__', None)
-            if enter_method:
-                await enter_method()
-            logger.info(f"Initialized Azure Bicep MCP tool at {mcp_url}")
-
-        except ImportError:
-            logger.warning("MCPStreamableHTTPTool not installed - MCP integration disabled.\n" \
-                           "Install the agent_framework package that provides MCPStreamableHTTPTool to enable MCP features.")
-            _mcp_bicep_tool = None
-        except Exception as e:
-            logger.error(f"Failed to initialize MCP Bicep tool: {e}")
-            _mcp_bicep_tool = None
+        # Only one caller opens the MCP session; concurrent callers wait for it
+        async with _mcp_bicep_lock:
+            if _mcp_bicep_tool is None:
+                try:
+                    from app.core.config import settings
+                    mcp_url = (settings.AZURE_MCP_BICEP_URL or "").strip()
+
+                    # Basic guard: don't attempt to initialize when no real MCP endpoint is configured
+                    force_init = os.getenv("AZURE_MCP_BICEP_FORCE", "false").lower() in ("1", "true", "yes")
+                    if (not mcp_url or "learn.microsoft.com" in mcp_url or "docs.microsoft.com" in mcp_url) and not force_init:
+                        logger.info(
+                            "Azure Bicep MCP URL not configured or points to docs; skipping MCP initialization.\n"
+                            "If you intend to use the official learn.microsoft.com MCP endpoint, ensure your environment supports a streamable MCP HTTP transport and set AZURE_MCP_BICEP_FORCE=true to force initialization.\n"
+                            "Note: Browsers and plain HTTP POSTs won't work; use MCPStreamableHTTPTool from agent_framework which establishes a streaming MCP session."
+                        )
+                        _mcp_bicep_tool = _DISABLED
+                        return None
+
+                    # Import MCP tool from agent framework
+                    apply_agent_framework_shim()
+                    from agent_framework import MCPStreamableHTTPTool
+
+                    tool = MCPStreamableHTTPTool(
+                        name="Azure Bicep MCP",
+                        url=mcp_url,
+                    )
+
+                    # Open connection once and reuse; publish the tool only
+                    # once its session is open
+                    enter_method = getattr(tool, '__aenter__', None)
+                    if enter_method:
+                        await enter_method()
+                    _mcp_bicep_tool = tool
+                    logger.info(f"Initialized Azure Bicep MCP tool at {mcp_url}")
+
+                except ImportError:
+                    logger.warning("MCPStreamableHTTPTool not installed - MCP integration disabled.\n" \
+                                   "Install the agent_framework package that provides MCPStreamableHTTPTool to enable MCP features.")
+                    _mcp_bicep_tool = _DISABLED
+                except Exception as e:
+                    logger.error(f"Failed to initialize MCP Bicep tool: {e}")
+                    _mcp_bicep_tool = None
     
-    return _mcp_bicep_tool
+    return None if _mcp_bicep_tool is _DISABLED else _mcp_bicep_tool
 
 
 async def get_mcp_terraform_tool():
@@ -66,42 +82,74 @@ async def get_mcp_terraform_tool():
     """
     global _mcp_terraform_tool
     if _mcp_terraform_tool is None:
+        # Only one caller opens the MCP session; concurrent callers wait for it
+        async with _mcp_terraform_lock:
+            if _mcp_terraform_tool is None:
+                try:
+                    from app.core.config import settings
+                    mcp_url = (settings.TERRAFORM_MCP_URL or "").strip()
+
+                    force_init = os.getenv("TERRAFORM_MCP_FORCE", "false").lower() in ("1", "true", "yes")
+                    if (not mcp_url or "developer.hashicorp.com" in mcp_url or "github.com/hashicorp" in mcp_url) and not force_init:
+                        logger.info(
+                            "Terraform MCP URL not configured or points to docs; skipping MCP initialization.\n"
+                            "If you intend to use the official HashiCorp MCP endpoint, ensure your environment supports a streamable MCP HTTP transport and set TERRAFORM_MCP_FORCE=true to force initialization.\n"
+                            "Note: Browsers and plain HTTP POSTs won't work; use MCPStreamableHTTPTool from agent_framework which establishes a streaming MCP session."
+                        )
+                        _mcp_terraform_tool = _DISABLED
+                        return None
+
+                    # Import MCP tool from agent framework
+                    apply_agent_framework_shim()
+                    from agent_framework import MCPStreamableHTTPTool
+
+                    tool = MCPStreamableHTTPTool(
+                        name="HashiCorp Terraform MCP",
+                        url=mcp_url,
+                    )
+
+                    # Open connection once and reuse; publish the tool only
+                    # once its session is open
+                    enter_method = getattr(tool, '__aenter__', None)
+                    if enter_method:
+                        await enter_method()
+                    _mcp_terraform_tool = tool
+                    logger.info(f"Initialized HashiCorp Terraform MCP tool at {mcp_url}")
+
+                except ImportError:
+                    logger.warning("MCPStreamableHTTPTool not installed - Terraform MCP integration disabled.\n" \
+                                   "Install the agent_framework package that provides MCPStreamableHTTPTool to enable MCP features.")
+                    _mcp_terraform_tool = _DISABLED
+                except Exception as e:
+                    logger.error(f"Failed to initialize MCP Terraform tool: {e}")
+                    _mcp_terraform_tool = None
+    
+    return None if _mcp_terraform_tool is _DISABLED else _mcp_terraform_tool
+
+
+async def preload_mcp_tools() -> None:
+    """Open the configured MCP tool sessions ahead of the first request."""
+    await asyncio.gather(get_mcp_bicep_tool(), get_mcp_terraform_tool())
+
+
+@asynccontextmanager
+async def mcp_tools_lifespan() -> AsyncIterator[None]:
+    """Lifespan of the MCP tools, for composing with the application's.
+    
+    Sessions are opened by a background task on entry, so startup doesn't
+    wait on the MCP servers; a request that needs a tool before then waits
+    on its initialization lock. Sessions are closed on exit.
+    """
+    preload = asyncio.create_task(preload_mcp_tools())
+    try:
+        yield
+    finally:
+        preload.cancel()
+        await asyncio.gather(preload, return_exceptions=True)
         try:
-            from app.core.config import settings
-            mcp_url = (settings.TERRAFORM_MCP_URL or "").strip()
-
-            force_init = os.getenv("TERRAFORM_MCP_FORCE", "false").lower() in ("1", "true", "yes")
-            if (not mcp_url or "developer.hashicorp.com" in mcp_url or "github.com/hashicorp" in mcp_url) and not force_init:
-                logger.info(
-                    "Terraform MCP URL not configured or points to docs; skipping MCP initialization.\n"
-                    "If you intend to use the official HashiCorp MCP endpoint, ensure your environment supports a streamable MCP HTTP transport and set TERRAFORM_MCP_FORCE=true to force initialization.\n"
-                    "Note: Browsers and plain HTTP POSTs won't work; use MCPStreamableHTTPTool from agent_framework which establishes a streaming MCP session."
-                )
-                return None
-
-            # Import MCP tool from agent framework
-            from agent_framework import MCPStreamableHTTPTool
-
-            _mcp_terraform_tool = MCPStreamableHTTPTool(
-                name="HashiCorp Terraform MCP",
-                url=mcp_url,
-            )
-
-            # Open connection once and reuse
-            enter_method = getattr(_mcp_terraform_tool, '__aenter__', None)
-            if enter_method:
-                await enter_method()
-            logger.info(f"Initialized HashiCorp Terraform MCP tool at {mcp_url}")
-
-        except ImportError:
-            logger.warning("MCPStreamableHTTPTool not installed - Terraform MCP integration disabled.\n" \
-                           "Install the agent_framework package that provides MCPStreamableHTTPTool to enable MCP features.")
-            _mcp_terraform_tool = None
+            await cleanup_mcp_tools()
         except Exception as e:
-            logger.error(f"Failed to initialize MCP Terraform tool: {e}")
-            _mcp_terraform_tool = None
-    
-    return _mcp_terraform_tool
+            logger.warning(f"Error cleaning up MCP tools: {e}")
 
 
 async def cleanup_mcp_tools():
@@ -109,7 +157,7 @@ async def cleanup_mcp_tools():
     global _mcp_bicep_tool, _mcp_terraform_tool
     
     # Clean up Bicep MCP tool
-    if _mcp_bicep_tool is not None:
+    if _mcp_bicep_tool is not None and _mcp_bicep_tool is not _DISABLED:
         try:
             cleanup_method = getattr(_mcp_bicep_tool, '__aexit__', None)
             if cleanup_method:
@@ -121,7 +169,7 @@ async def cleanup_mcp_tools():
             _mcp_bicep_tool = None
     
     # Clean up Terraform MCP tool
-    if _mcp_terraform_tool is not None:
+    if _mcp_terraform_tool is not None and _mcp_terraform_tool is not _DISABLED:
         try:
             cleanup_method = getattr(_mcp_terraform_tool, '__aexit__', None)
             if cleanup_method:
@@ -1,7 +1,8 @@
-import json
 import logging
 from typing import Any, Dict, Optional
 
+from app.core.serialization import loads
+
 logger = logging.getLogger(__name__)
 
 
@@ -31,7 +32,7 @@ async def generate_bicep_code(agent_client: Any, diagram: Dict[str, Any], use_mo
                 return raw
             if isinstance(raw, str):
                 try:
-                    return json.loads(raw)
+                    return loads(raw)
                 except Exception:
                     return {'bicep_code': raw, 'parameters': {}}
     except Exception:
@@ -1,33 +1,184 @@
-import copy
-from typing import Any, Dict, List, Tuple, Set
-
-
-def _extract_identifier(metadata: Dict[str, Any], keys: List[str]) -> str:
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Set
+
+from app.core.serialization import dumps_bytes
+
+# Fields of the assignment dicts built below, in insertion order
+_POLICY_FIELDS = ("policyDefinitionId", "displayName", "scope")
+_ROLE_FIELDS = ("roleDefinitionId", "principalId", "principalType", "displayName")
+
+# Metadata keys tried, in order, for the identifier of each scope-bearing group type
+_IDENTIFIER_KEYS: Dict[str, Tuple[str, ...]] = {
+    "managementGroup": ("managementGroupId", "name", "displayName", "id"),
+    "subscription": ("subscriptionId", "id", "name"),
+    "policyAssignment": ("policyDefinitionId", "policyAssignmentId", "id"),
+    "roleAssignment": ("roleDefinitionId", "roleId", "id", "name"),
+}
+
+# Governance summary section for each group type listed there
+_SUMMARY_SECTIONS = {
+    "managementGroup": "managementGroups",
+    "subscription": "subscriptions",
+    "landingZone": "landingZones",
+    "policyAssignment": "policyAssignments",
+    "roleAssignment": "roleAssignments",
+    "virtualNetwork": "virtualNetworks",
+}
+
+
+def _extract_identifier(metadata: Dict[str, Any], keys: Tuple[str, ...]) -> str:
     for key in keys:
         value = metadata.get(key)
-        if isinstance(value, str) and value.strip():
-            return value.strip()
+        if isinstance(value, str):
+            value = value.strip()
+            if value:
+                return value
     return ""
 
 
 def _ensure_list(target: Dict[str, Any], key: str) -> List[Any]:
-    if key not in target or not isinstance(target[key], list):
-        target[key] = []
+    # Always store a new list: an existing one is shared with the caller's diagram
+    value = target.get(key)
+    target[key] = list(value) if isinstance(value, list) else []
     return target[key]
 
 
+def _string_key(item: Any) -> Any:
+    return item
+
+
+def _policy_key(item: Any) -> Optional[Tuple[Any, ...]]:
+    # Dicts with other fields can never equal an assignment built here
+    if isinstance(item, dict) and len(item) == len(_POLICY_FIELDS) and all(f in item for f in _POLICY_FIELDS):
+        return tuple(item[f] for f in _POLICY_FIELDS)
+    return None
+
+
+def _role_key(item: Any) -> Optional[Tuple[Any, ...]]:
+    if isinstance(item, dict) and len(item) == len(_ROLE_FIELDS) and all(f in item for f in _ROLE_FIELDS):
+        return tuple(item[f] for f in _ROLE_FIELDS)
+    return None
+
+
+def _seen_keys(items: List[Any], key_fn: Callable[[Any], Any]) -> Set[Any]:
+    seen: Set[Any] = set()
+    for item in items:
+        key = key_fn(item)
+        if key is None:
+            continue
+        try:
+            seen.add(key)
+        except TypeError:
+            # Unhashable entries can only match values that also fall back to a scan
+            pass
+    return seen
+
+
+def _append_unique(target: List[Any], seen: Set[Any], value: Any, key: Any) -> None:
+    """Append ``value`` to ``target`` unless an equal entry is already there.
+
+    ``seen`` holds the keys of ``target``'s entries so the check is a set
+    lookup; values with unhashable fields fall back to scanning the list.
+    """
+    try:
+        if key in seen:
+            return
+        seen.add(key)
+    except TypeError:
+        if value in target:
+            return
+    target.append(value)
+
+
+def _tracked_list(
+    target: Dict[str, Any],
+    key: str,
+    key_fn: Callable[[Any], Any],
+    trackers: Dict[str, Tuple[List[Any], Set[Any]]],
+) -> Tuple[List[Any], Set[Any]]:
+    """Return ``target[key]`` as a list together with the set of keys it holds."""
+    tracked = trackers.get(key)
+    if tracked is None:
+        items = _ensure_list(target, key)
+        tracked = trackers[key] = (items, _seen_keys(items, key_fn))
+    return tracked
+
+
+# LRU cache of enrichment results keyed by a digest of the serialized diagram;
+# the same diagram is commonly re-submitted while iterating on generated IaC
+_ENRICH_CACHE_SIZE = 64
+_ENRICH_CACHE: "OrderedDict[bytes, Tuple[Dict[str, Any], Dict[str, Any]]]" = OrderedDict()
+
+
 def enrich_diagram_with_governance(diagram: Dict[str, Any] | None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    """Augment diagram JSON with governance summaries and inferred scopes."""
+    """Augment diagram JSON with governance summaries and inferred scopes.
+
+    ``diagram`` is not modified. Only the dicts that gain entries are copied;
+    everything else in the result is shared with ``diagram`` (or, for a
+    repeated diagram, with an earlier equal one and its result), so treat
+    both as read-only afterwards.
+    """
     if not isinstance(diagram, dict):
         diagram = {}
 
-    data = copy.deepcopy(diagram)
-    nodes: List[Dict[str, Any]] = data.setdefault("nodes", [])
-    node_lookup: Dict[str, Dict[str, Any]] = {node.get("id"): node for node in nodes if node.get("id")}
+    try:
+        cache_key = hashlib.blake2b(dumps_bytes(diagram), digest_size=16).digest()
+    except TypeError:
+        # Not JSON-serializable, so there is no stable key to cache under
+        return _enrich(diagram)
 
-    group_nodes: Dict[str, Dict[str, Any]] = {
-        node_id: node for node_id, node in node_lookup.items() if node.get("type") == "azure.group"
-    }
+    cached = _ENRICH_CACHE.get(cache_key)
+    if cached is not None:
+        _ENRICH_CACHE.move_to_end(cache_key)
+        return cached
+
+    result = _ENRICH_CACHE[cache_key] = _enrich(diagram)
+    if len(_ENRICH_CACHE) > _ENRICH_CACHE_SIZE:
+        _ENRICH_CACHE.popitem(last=False)
+    return result
+
+
+def _enrich(diagram: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+
+    data = dict(diagram)
+    nodes: List[Dict[str, Any]] = [dict(node) for node in diagram.get("nodes", [])]
+    data["nodes"] = nodes
+
+    node_lookup: Dict[str, Dict[str, Any]] = {}
+    group_nodes: Dict[str, Dict[str, Any]] = {}
+    has_duplicate_ids = False
+    for node in nodes:
+        node_id = node.get("id")
+        if not node_id:
+            continue
+        if node_id in node_lookup:
+            has_duplicate_ids = True
+        node_lookup[node_id] = node
+        if node.get("type") == "azure.group":
+            group_nodes[node_id] = node
+    if has_duplicate_ids:
+        # The last node with an id wins, in the position of the first one
+        group_nodes = {
+            node_id: node for node_id, node in node_lookup.items() if node.get("type") == "azure.group"
+        }
+
+    # (type, metadata, identifier, label) per group, normalized once for
+    # the loops below. The identifier is the scope id for the group's type.
+    group_info: Dict[str, Tuple[str, Dict[str, Any], str, Any]] = {}
+    for group_id, group in group_nodes.items():
+        group_data = group.get("data", {}) or {}
+        group_type = group_data.get("groupType") or group_data.get("type") or ""
+        group_metadata = group_data.get("metadata")
+        if not isinstance(group_metadata, dict):
+            group_metadata = {}
+        identifier_keys = _IDENTIFIER_KEYS.get(group_type)
+        group_info[group_id] = (
+            group_type,
+            group_metadata,
+            _extract_identifier(group_metadata, identifier_keys) if identifier_keys else "",
+            group_data.get("label") or group_data.get("title") or "",
+        )
 
     group_members: Dict[str, Dict[str, Set[str]]] = {
         group_id: {"services": set(), "groups": set()} for group_id in group_nodes
@@ -51,17 +202,56 @@ def enrich_diagram_with_governance(diagram: Dict[str, Any] | None) -> Tuple[Dict
             current = parent
         return chain
 
+    # Ancestor groups per node id, nearest first. A node's entry is its parent
+    # (when that is a group) followed by the parent's entry, so ancestors
+    # shared by many nodes are walked once.
+    chain_groups_cache: Dict[str, List[Dict[str, Any]]] = {}
+    # Nodes whose ancestry loops; a parent's entry isn't a valid suffix there
+    cyclic: Set[str] = set()
+
+    def get_chain_groups(node_id: str) -> List[Dict[str, Any]]:
+        cached = chain_groups_cache.get(node_id)
+        if cached is not None:
+            return cached
+
+        path: List[str] = []
+        on_path: Set[str] = set()
+        current_id = node_id
+        while current_id not in chain_groups_cache or current_id in cyclic:
+            if current_id in on_path or current_id in cyclic:
+                for path_id in path:
+                    cyclic.add(path_id)
+                    chain_groups_cache[path_id] = [
+                        g for g in get_parent_chain(path_id) if g.get("type") == "azure.group"
+                    ]
+                return chain_groups_cache[node_id]
+            parent_id = node_lookup[current_id].get("parentNode")
+            if not parent_id or parent_id not in node_lookup:
+                chain_groups_cache[current_id] = []
+                break
+            path.append(current_id)
+            on_path.add(current_id)
+            current_id = parent_id
+
+        for path_id in reversed(path):
+            parent_id = node_lookup[path_id]["parentNode"]
+            parent = node_lookup[parent_id]
+            suffix = chain_groups_cache[parent_id]
+            chain_groups_cache[path_id] = [parent, *suffix] if parent.get("type") == "azure.group" else suffix
+        return chain_groups_cache[node_id]
+
     # Assign scopes to service nodes based on parent groups and metadata
     for node_id, node in node_lookup.items():
         if node.get("type") == "azure.group":
             continue
 
-        node_data = node.setdefault("data", {})
-        node_metadata = node_data.setdefault("metadata", {})
-        tags = node_data.get("tags") if isinstance(node_data.get("tags"), dict) else {}
+        node_data = node["data"] = dict(node.get("data", {}))
+        node_metadata = node_data["metadata"] = dict(node_data.get("metadata", {}))
+        tags = node_data.get("tags")
+        if not isinstance(tags, dict):
+            tags = {}
 
-        chain = get_parent_chain(node_id)
-        chain_groups = [g for g in chain if g.get("type") == "azure.group"]
+        chain_groups = get_chain_groups(node_id)
 
         scope_record: Dict[str, Any] = {
             "managementGroups": [],
@@ -69,142 +259,127 @@ def enrich_diagram_with_governance(diagram: Dict[str, Any] | None) -> Tuple[Dict
             "policyAssignments": [],
             "roleAssignments": [],
         }
+        seen_mg: Set[str] = set()
+        seen_sub: Set[str] = set()
+        seen_pol: Set[Any] = set()
+        seen_role: Set[Any] = set()
+        # Lists in node_metadata may already hold entries from the diagram
+        meta_lists: Dict[str, Tuple[List[Any], Set[Any]]] = {}
 
         for group in chain_groups:
-            group_id = group.get("id")
-            if not group_id:
-                continue
-            group_data = group.get("data", {}) or {}
-            group_type = group_data.get("groupType") or group_data.get("type") or ""
-            group_metadata = group_data.get("metadata") if isinstance(group_data.get("metadata"), dict) else {}
+            group_id = group["id"]
+            group_type, group_metadata, identifier, label = group_info[group_id]
 
             # Track memberships
-            group_members.setdefault(group_id, {"services": set(), "groups": set()})
             group_members[group_id]["services"].add(node_id)
 
-            identifier_keys = ["id", "name", "displayName"]
-
             if group_type == "managementGroup":
-                mg_id = _extract_identifier(group_metadata, ["managementGroupId", "name", "displayName", "id"])
+                mg_id = identifier
                 if mg_id:
-                    if mg_id not in scope_record["managementGroups"]:
+                    if mg_id not in seen_mg:
+                        seen_mg.add(mg_id)
                         scope_record["managementGroups"].append(mg_id)
                     if not node_metadata.get("managementGroupId"):
                         node_metadata["managementGroupId"] = mg_id
-                group_members[group_id]["services"].add(node_id)
 
             elif group_type == "subscription":
-                sub_id = _extract_identifier(group_metadata, ["subscriptionId", "id", "name"])
+                sub_id = identifier
                 if sub_id:
-                    if sub_id not in scope_record["subscriptions"]:
+                    if sub_id not in seen_sub:
+                        seen_sub.add(sub_id)
                         scope_record["subscriptions"].append(sub_id)
                     if not node_metadata.get("subscriptionId"):
                         node_metadata["subscriptionId"] = sub_id
-                group_members[group_id]["services"].add(node_id)
 
             elif group_type == "policyAssignment":
-                policy_id = _extract_identifier(group_metadata, ["policyDefinitionId", "policyAssignmentId", "id"])
-                assignment = {
-                    "policyDefinitionId": policy_id or "",
-                    "displayName": group_data.get("label") or group_data.get("title") or "",
-                    "scope": group_metadata.get("scope") or "",
-                }
-                if not any(value for value in assignment.values()):
+                # Every field falls back to "", so all-empty is one tuple comparison
+                assignment_key = (identifier, label, group_metadata.get("scope") or "")
+                if assignment_key == ("", "", ""):
                     continue
-                if assignment not in scope_record["policyAssignments"]:
-                    scope_record["policyAssignments"].append(assignment)
-                policies_meta = _ensure_list(node_metadata, "policyAssignments")
-                if assignment not in policies_meta:
-                    policies_meta.append(assignment)
+                assignment = dict(zip(_POLICY_FIELDS, assignment_key))
+                _append_unique(scope_record["policyAssignments"], seen_pol, assignment, assignment_key)
+                policies_meta, seen_policies_meta = _tracked_list(
+                    node_metadata, "policyAssignments", _policy_key, meta_lists
+                )
+                _append_unique(policies_meta, seen_policies_meta, assignment, assignment_key)
 
             elif group_type == "roleAssignment":
-                role_id = _extract_identifier(group_metadata, ["roleDefinitionId", "roleId", "id", "name"])
-                role_assignment = {
-                    "roleDefinitionId": role_id or "",
-                    "principalId": group_metadata.get("principalId", ""),
-                    "principalType": group_metadata.get("principalType", ""),
-                    "displayName": group_data.get("label") or group_data.get("title") or "",
-                }
-                if not any(value for value in role_assignment.values()):
+                role_key = (
+                    identifier,
+                    group_metadata.get("principalId", ""),
+                    group_metadata.get("principalType", ""),
+                    label,
+                )
+                # principalId/principalType are taken as-is and may be falsy non-strings
+                if not any(role_key):
                     continue
-                if role_assignment not in scope_record["roleAssignments"]:
-                    scope_record["roleAssignments"].append(role_assignment)
-                roles_meta = _ensure_list(node_metadata, "roleAssignments")
-                if role_assignment not in roles_meta:
-                    roles_meta.append(role_assignment)
+                role_assignment = dict(zip(_ROLE_FIELDS, role_key))
+                _append_unique(scope_record["roleAssignments"], seen_role, role_assignment, role_key)
+                roles_meta, seen_roles_meta = _tracked_list(node_metadata, "roleAssignments", _role_key, meta_lists)
+                _append_unique(roles_meta, seen_roles_meta, role_assignment, role_key)
 
         # Tag heuristics
         if not node_metadata.get("subscriptionId"):
-            tag_subscription = tags.get("subscriptionId") if isinstance(tags, dict) else None
+            tag_subscription = tags.get("subscriptionId")
             if isinstance(tag_subscription, str) and tag_subscription.strip():
                 node_metadata["subscriptionId"] = tag_subscription.strip()
-                if tag_subscription.strip() not in scope_record["subscriptions"]:
+                if tag_subscription.strip() not in seen_sub:
+                    seen_sub.add(tag_subscription.strip())
                     scope_record["subscriptions"].append(tag_subscription.strip())
 
         if not node_metadata.get("managementGroupId"):
-            tag_mg = tags.get("managementGroupId") if isinstance(tags, dict) else None
+            tag_mg = tags.get("managementGroupId")
             if isinstance(tag_mg, str) and tag_mg.strip():
                 node_metadata["managementGroupId"] = tag_mg.strip()
-                if tag_mg.strip() not in scope_record["managementGroups"]:
+                if tag_mg.strip() not in seen_mg:
+                    seen_mg.add(tag_mg.strip())
                     scope_record["managementGroups"].append(tag_mg.strip())
 
         if scope_record["managementGroups"]:
-            mg_list = _ensure_list(node_metadata, "managementGroups")
+            mg_list, seen_mg_list = _tracked_list(node_metadata, "managementGroups", _string_key, meta_lists)
             for mg in scope_record["managementGroups"]:
-                if mg not in mg_list and mg:
-                    mg_list.append(mg)
+                if mg:
+                    _append_unique(mg_list, seen_mg_list, mg, mg)
 
         if scope_record["subscriptions"]:
-            subs_list = _ensure_list(node_metadata, "subscriptions")
+            subs_list, seen_subs_list = _tracked_list(node_metadata, "subscriptions", _string_key, meta_lists)
             for sub in scope_record["subscriptions"]:
-                if sub not in subs_list and sub:
-                    subs_list.append(sub)
+                if sub:
+                    _append_unique(subs_list, seen_subs_list, sub, sub)
 
         resource_scopes[node_id] = scope_record
 
-    # Track group-to-group relationships
+    # Build summary
+    summary: Dict[str, List[Dict[str, Any]]] = {section: [] for section in _SUMMARY_SECTIONS.values()}
+    summary_by_type = {group_type: summary[section] for group_type, section in _SUMMARY_SECTIONS.items()}
+    summary_entries: List[Dict[str, Any]] = []
+
+    # One pass records group-to-group relationships and builds the entries;
+    # child groups are only complete after it, so they are filled in below
     for group_id, group in group_nodes.items():
         parent_id = group.get("parentNode")
         if parent_id and parent_id in group_nodes:
             group_members[parent_id]["groups"].add(group_id)
 
-    # Build summary
-    summary: Dict[str, List[Dict[str, Any]]] = {
-        "managementGroups": [],
-        "subscriptions": [],
-        "landingZones": [],
-        "policyAssignments": [],
-        "roleAssignments": [],
-        "virtualNetworks": [],
-    }
-
-    for group_id, group in group_nodes.items():
-        data_block = group.get("data", {}) or {}
-        group_type = data_block.get("groupType") or data_block.get("type") or ""
-        metadata = data_block.get("metadata") if isinstance(data_block.get("metadata"), dict) else {}
-        parent_id = group.get("parentNode")
+        group_type, metadata, _, label = group_info[group_id]
+        section = summary_by_type.get(group_type)
+        if section is None:
+            # Not listed, so don't sort its members
+            continue
 
         base_entry = {
             "id": group_id,
-            "label": data_block.get("label") or data_block.get("title") or group_id,
+            "label": label or group_id,
             "metadata": metadata,
             "parentId": parent_id,
-            "childGroups": sorted(group_members.get(group_id, {}).get("groups", [])),
-            "memberServices": sorted(group_members.get(group_id, {}).get("services", [])),
+            "childGroups": [],
+            "memberServices": sorted(group_members[group_id]["services"]),
         }
+        section.append(base_entry)
+        summary_entries.append(base_entry)
 
-        if group_type == "managementGroup":
-            summary["managementGroups"].append(base_entry)
-        elif group_type == "subscription":
-            summary["subscriptions"].append(base_entry)
-        elif group_type == "landingZone":
-            summary["landingZones"].append(base_entry)
-        elif group_type == "policyAssignment":
-            summary["policyAssignments"].append(base_entry)
-        elif group_type == "roleAssignment":
-            summary["roleAssignments"].append(base_entry)
-        elif group_type == "virtualNetwork":
-            summary["virtualNetworks"].append(base_entry)
+    for base_entry in summary_entries:
+        base_entry["childGroups"] = sorted(group_members[base_entry["id"]]["groups"])
 
     warnings: List[str] = []
 
@@ -217,9 +392,10 @@ def enrich_diagram_with_governance(diagram: Dict[str, Any] | None) -> Tuple[Dict
     if not summary["virtualNetworks"]:
         warnings.append("No virtual network defined: landing zones typically include hub/spoke networking.")
 
-    data.setdefault("metadata", {})
-    data["metadata"]["governance_summary"] = summary
-    data["metadata"]["resource_scopes"] = resource_scopes
+    data_metadata = dict(data.get("metadata", {}))
+    data_metadata["governance_summary"] = summary
+    data_metadata["resource_scopes"] = resource_scopes
+    data["metadata"] = data_metadata
 
     preflight = {
         "warnings": warnings,
@@ -1,7 +1,8 @@
-import json
 import logging
 from typing import Any, Dict, Optional
 
+from app.core.serialization import loads
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,7 +42,7 @@ async def generate_terraform_code(agent_client: Any, diagram: Dict[str, Any], op
                 return raw
             if isinstance(raw, str):
                 try:
-                    return json.loads(raw)
+                    return loads(raw)
                 except Exception:
                     return {'terraform_code': raw, 'parameters': {'provider': provider}}
     except Exception:
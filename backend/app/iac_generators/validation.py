@@ -1,38 +1,61 @@
+import asyncio
+import functools
 import shutil
-import subprocess
 import tempfile
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 
-def validate_iac_with_cli(format: str, content: str, extra_files: Dict[str, str] | None = None, timeout: int = 30) -> Dict[str, Any]:
+@functools.lru_cache(maxsize=None)
+def _find_cli(name: str) -> Optional[str]:
+    # PATH is only scanned once per binary; restart the server after installing one
+    return shutil.which(name)
+
+
+async def _run_cli(args: List[str], timeout: float) -> Tuple[int, str, str]:
+    """Run a CLI without blocking the event loop; returns (returncode, stdout, stderr)."""
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise TimeoutError(f"Command '{args}' timed out after {timeout} seconds")
+    return proc.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+
+
+async def validate_iac_with_cli(format: str, content: str, extra_files: Dict[str, str] | None = None, timeout: int = 30) -> Dict[str, Any]:
     """Run lightweight CLI validations for bicep or terraform when binaries available.
 
     Returns a dict with flags and any errors/warnings captured.
     """
     res: Dict[str, Any] = {'cli_present': False, 'errors': [], 'warnings': []}
     if format == 'bicep':
-        bicep = shutil.which('bicep')
+        bicep = _find_cli('bicep')
         if not bicep:
             return res
         res['cli_present'] = True
         try:
-            with tempfile.NamedTemporaryFile('w', suffix='.bicep', delete=False) as tf:
-                tf.write(content)
-                tmp_name = tf.name
-            proc = subprocess.run([bicep, 'build', tmp_name], capture_output=True, text=True, timeout=timeout)
-            if proc.returncode != 0:
-                res['errors'].append(proc.stderr or proc.stdout)
+            # bicep build writes main.json next to its input; both go with the directory
+            with tempfile.TemporaryDirectory() as td:
+                main_bicep = f"{td}/main.bicep"
+                with open(main_bicep, 'w') as mf:
+                    mf.write(content)
+                returncode, stdout, stderr = await _run_cli([bicep, 'build', main_bicep], timeout)
+            if returncode != 0:
+                res['errors'].append(stderr or stdout)
             else:
-                if proc.stdout:
-                    res['warnings'].append(proc.stdout)
+                if stdout:
+                    res['warnings'].append(stdout)
         except Exception as e:
             res['errors'].append(str(e))
 
     elif format == 'terraform':
-        tf = shutil.which('terraform')
+        tf = _find_cli('terraform')
         if not tf:
             return res
         res['cli_present'] = True
@@ -45,9 +68,9 @@ def validate_iac_with_cli(format: str, content: str, extra_files: Dict[str, str]
                     for name, body in extra_files.items():
                         with open(f"{td}/{name}", 'w') as ef:
                             ef.write(body)
-                proc = subprocess.run([tf, 'fmt', '-check', td], capture_output=True, text=True, timeout=20)
-                if proc.returncode != 0:
-                    res['warnings'].append(proc.stdout or proc.stderr)
+                returncode, stdout, stderr = await _run_cli([tf, 'fmt', '-check', td], 20)
+                if returncode != 0:
+                    res['warnings'].append(stdout or stderr)
         except Exception as e:
             res['errors'].append(str(e))
 
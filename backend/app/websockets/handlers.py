@@ -1,22 +1,30 @@
 """WebSocket handlers for real-time communication."""
 
-import json
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Set
 from datetime import datetime
 
 from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import TypeAdapter
+from app.api.endpoints.deployment import DEPLOYMENTS_CONTAINER, DeploymentLog, read_deployment_logs
 from app.core.azure_client import AzureClientManager
+from app.core.serialization import dumps, loads
 
 logger = logging.getLogger(__name__)
 
+# Validates and re-dumps a whole log list in one pydantic-core call
+_DEPLOYMENT_LOGS_ADAPTER = TypeAdapter(List[DeploymentLog])
+
 
 class ConnectionManager:
     """Manages WebSocket connections."""
     
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.conversation_connections: Dict[str, list] = {}
+        self.conversation_connections: Dict[str, Set[str]] = {}
+        # Architect agent per client, looked up on its first message
+        self.agents: Dict[str, Any] = {}
     
     async def connect(self, websocket: WebSocket, client_id: str):
         """Accept a WebSocket connection."""
@@ -26,10 +34,18 @@ class ConnectionManager:
     
     def disconnect(self, client_id: str):
         """Remove a WebSocket connection."""
+        self.agents.pop(client_id, None)
         if client_id in self.active_connections:
             del self.active_connections[client_id]
             logger.info(f"Client {client_id} disconnected")
     
+    def get_agent(self, client_id: str, azure_clients: AzureClientManager):
+        """Get the architect agent for a client, resolving it once per connection."""
+        agent = self.agents.get(client_id)
+        if agent is None:
+            agent = self.agents[client_id] = azure_clients.get_azure_architect_agent()
+        return agent
+    
     async def send_personal_message(self, message: str, client_id: str):
         """Send a message to a specific client."""
         if client_id in self.active_connections:
@@ -38,29 +54,35 @@ class ConnectionManager:
     
     async def send_json_message(self, data: dict, client_id: str):
         """Send JSON data to a specific client."""
-        if client_id in self.active_connections:
-            websocket = self.active_connections[client_id]
-            await websocket.send_json(data)
+        await self.send_personal_message(dumps(data), client_id)
     
     def add_to_conversation(self, conversation_id: str, client_id: str):
         """Add client to conversation for broadcasting."""
-        if conversation_id not in self.conversation_connections:
-            self.conversation_connections[conversation_id] = []
-        if client_id not in self.conversation_connections[conversation_id]:
-            self.conversation_connections[conversation_id].append(client_id)
+        self.conversation_connections.setdefault(conversation_id, set()).add(client_id)
     
     async def broadcast_to_conversation(self, conversation_id: str, data: dict):
         """Broadcast message to all clients in a conversation."""
         if conversation_id in self.conversation_connections:
-            clients = self.conversation_connections[conversation_id].copy()
-            for client_id in clients:
-                try:
-                    await self.send_json_message(data, client_id)
-                except Exception as e:
-                    logger.warning(f"Failed to send to client {client_id}: {e}")
+            clients = list(self.conversation_connections[conversation_id])
+            # Encode once and send the same text frame to every client
+            # concurrently, so one slow client doesn't hold up the rest
+            message = dumps(data)
+            delivered = await asyncio.gather(
+                *(self._send_to_listener(message, client_id) for client_id in clients)
+            )
+            for client_id, ok in zip(clients, delivered):
+                if not ok:
                     # Remove disconnected client
-                    if client_id in self.conversation_connections[conversation_id]:
-                        self.conversation_connections[conversation_id].remove(client_id)
+                    self.conversation_connections[conversation_id].discard(client_id)
+    
+    async def _send_to_listener(self, message: str, client_id: str) -> bool:
+        """Send a broadcast message to one client, reporting whether it got through."""
+        try:
+            await self.send_personal_message(message, client_id)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to send to client {client_id}: {e}")
+            return False
 
 
 # Global connection manager
@@ -74,7 +96,7 @@ async def handle_chat_websocket(websocket: WebSocket, client_id: str, azure_clie
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
+            data = loads(await websocket.receive_text())
             message_type = data.get("type")
             
             if message_type == "chat_message":
@@ -116,7 +138,7 @@ async def handle_chat_message(data: dict, client_id: str, azure_clients: AzureCl
             return
         
         # Get the agent
-        agent = azure_clients.get_azure_architect_agent()
+        agent = manager.get_agent(client_id, azure_clients)
         
         # Send typing indicator
         await manager.send_json_message({
@@ -127,18 +149,19 @@ async def handle_chat_message(data: dict, client_id: str, azure_clients: AzureCl
         # Enhanced message with context
         enhanced_message = message
         if context:
-            context_str = json.dumps(context, indent=2)
+            context_str = dumps(context)
             enhanced_message = f"Context: {context_str}\n\nUser: {message}"
         
         # Get response from agent
         response = await agent.chat(enhanced_message)
+        timestamp = datetime.utcnow().isoformat()
         
         # Send response
         await manager.send_json_message({
             "type": "chat_response",
             "message": response,
             "conversation_id": conversation_id,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": timestamp
         }, client_id)
         
         # Broadcast to conversation if others are listening
@@ -148,7 +171,7 @@ async def handle_chat_message(data: dict, client_id: str, azure_clients: AzureCl
                 "conversation_id": conversation_id,
                 "user_message": message,
                 "assistant_message": response,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": timestamp
             })
         
     except Exception as e:
@@ -174,7 +197,7 @@ async def handle_stream_chat(data: dict, client_id: str, azure_clients: AzureCli
             return
         
         # Get the agent
-        agent = azure_clients.get_azure_architect_agent()
+        agent = manager.get_agent(client_id, azure_clients)
         
         # Send start streaming indicator
         await manager.send_json_message({
@@ -185,25 +208,32 @@ async def handle_stream_chat(data: dict, client_id: str, azure_clients: AzureCli
         # Enhanced message with context
         enhanced_message = message
         if context:
-            context_str = json.dumps(context, indent=2)
+            context_str = dumps(context)
             enhanced_message = f"Context: {context_str}\n\nUser: {message}"
         
-        # Stream response from agent
-        full_response = ""
+        # Stream response from agent; collect chunks and join once at the end
+        # rather than re-concatenating the growing response on every delta
+        chunks = []
+        # One message dict reused for every chunk; it is encoded before each send returns
+        chunk_message = {
+            "type": "stream_chunk",
+            "chunk": None,
+            "conversation_id": conversation_id
+        }
         async for chunk in agent.stream_chat(enhanced_message):
-            full_response += chunk
-            await manager.send_json_message({
-                "type": "stream_chunk",
-                "chunk": chunk,
-                "conversation_id": conversation_id
-            }, client_id)
+            chunks.append(chunk)
+            chunk_message["chunk"] = chunk
+            await manager.send_json_message(chunk_message, client_id)
         
+        full_response = "".join(chunks)
+        timestamp = datetime.utcnow().isoformat()
+
         # Send end streaming indicator
         await manager.send_json_message({
             "type": "stream_end",
             "conversation_id": conversation_id,
             "full_message": full_response,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": timestamp
         }, client_id)
         
         # Broadcast to conversation if others are listening
@@ -213,7 +243,7 @@ async def handle_stream_chat(data: dict, client_id: str, azure_clients: AzureCli
                 "conversation_id": conversation_id,
                 "user_message": message,
                 "assistant_message": full_response,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": timestamp
             })
         
     except Exception as e:
@@ -266,7 +296,7 @@ async def handle_analyze_diagram(data: dict, client_id: str, azure_clients: Azur
             return
         
         # Get the agent
-        agent = azure_clients.get_azure_architect_agent()
+        agent = manager.get_agent(client_id, azure_clients)
         
         # Send processing indicator
         await manager.send_json_message({
@@ -275,15 +305,16 @@ async def handle_analyze_diagram(data: dict, client_id: str, azure_clients: Azur
         }, client_id)
         
         # Analyze diagram
-        diagram_json = json.dumps(diagram_data)
+        diagram_json = dumps(diagram_data)
         analysis = await agent.analyze_diagram(diagram_json, target_region)
+        timestamp = datetime.utcnow().isoformat()
         
         # Send analysis result
         await manager.send_json_message({
             "type": "analysis_complete",
             "analysis": analysis,
             "conversation_id": conversation_id,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": timestamp
         }, client_id)
         
         # Broadcast to conversation if others are listening
@@ -292,7 +323,7 @@ async def handle_analyze_diagram(data: dict, client_id: str, azure_clients: Azur
                 "type": "diagram_analyzed",
                 "conversation_id": conversation_id,
                 "analysis": analysis,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": timestamp
             })
         
     except Exception as e:
@@ -310,7 +341,7 @@ async def handle_deployment_websocket(websocket: WebSocket, client_id: str, azur
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
+            data = loads(await websocket.receive_text())
             message_type = data.get("type")
             
             if message_type == "monitor_deployment":
@@ -374,22 +405,17 @@ async def handle_get_deployment_logs(data: dict, client_id: str, azure_clients:
             return
         
         # Load logs from blob storage
-        blob_client = azure_clients.get_blob_client()
-        container_name = "deployments"
-        blob_name = f"{deployment_id}/logs.json"
+        container = azure_clients.get_container_client(DEPLOYMENTS_CONTAINER)
         
         try:
-            blob_data = await blob_client.get_blob_client(
-                container=container_name,
-                blob=blob_name
-            ).download_blob()
-            
-            logs_data = json.loads(await blob_data.readall())
+            logs_data = await read_deployment_logs(container, deployment_id)
             
             await manager.send_json_message({
                 "type": "deployment_logs",
                 "deployment_id": deployment_id,
-                "logs": logs_data
+                "logs": _DEPLOYMENT_LOGS_ADAPTER.dump_python(
+                    _DEPLOYMENT_LOGS_ADAPTER.validate_python(logs_data), mode="json"
+                )
             }, client_id)
             
         except Exception:
@@ -8,6 +8,7 @@ FastAPI application providing REST API and WebSocket endpoints for:
 - Azure deployment orchestration
 """
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
@@ -16,33 +17,20 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 
+try:
+    from starlette_compress import CompressMiddleware
+except ImportError:  # pragma: no cover - optional zstd/brotli support
+    CompressMiddleware = None
+
 from app.core.config import settings
 from app.core.logging import setup_logging
-import importlib
-import warnings
-
-# Runtime compatibility shim:
-# Some released versions of agent-related packages place helper functions (e.g.
-# `prepare_function_call_results`) inside submodules (for example
-# `agent_framework.openai._shared`) while other packages import them from the
-# top-level `agent_framework` package. This can cause an ImportError at import
-# time when the top-level symbol isn't exported. To make the app more tolerant
-# in local/dev environments we attempt to re-export the helper on the
-# top-level module if it's present in the submodule.
-try:
-    af_shared = importlib.import_module("agent_framework.openai._shared")
-    af_mod = importlib.import_module("agent_framework")
-    if not hasattr(af_mod, "prepare_function_call_results") and hasattr(
-        af_shared, "prepare_function_call_results"
-    ):
-        setattr(af_mod, "prepare_function_call_results", af_shared.prepare_function_call_results)
-except Exception as _shim_err:  # pragma: no cover - environment-dependent
-    # Non-fatal: if the import fails we'll fall back to guarded imports elsewhere
-    warnings.warn(f"agent_framework compatibility shim not applied: {_shim_err}")
+from app.core.middleware import ProfileMiddleware, SelectiveCompressionMiddleware
 
 from app.api.routes import api_router
 from app.websockets import websocket_router
 from app.core.azure_client import AzureClientManager
+from app.api.endpoints.deployment import DEPLOYMENTS_CONTAINER
+from app.deps import mcp_tools_lifespan
 
 # Set up logging
 setup_logging()
@@ -50,16 +38,17 @@ logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
-async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+async def app_lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Application lifespan manager for startup/shutdown tasks."""
     logger.info("Starting Azure Architect Backend...")
     
-    # Debug: Log registered routes
-    logger.info("Registered routes:")
-    for route in app.routes:
-        route_path = getattr(route, 'path', str(route))
-        route_methods = getattr(route, 'methods', ['WebSocket'])
-        logger.info(f"  {route_path} ({route_methods})")
+    # Debug: Log registered routes (skipped entirely when INFO is disabled)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Registered routes:")
+        for route in app.routes:
+            route_path = getattr(route, 'path', str(route))
+            route_methods = getattr(route, 'methods', ['WebSocket'])
+            logger.info("  %s (%s)", route_path, route_methods)
     
     # Initialize Azure client manager. This is optional in dev; initialize
     # and attach to app.state so request dependencies that expect it don't
@@ -69,11 +58,12 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     azure_clients = AzureClientManager()
     try:
         await azure_clients.initialize()
-        try:
-            await azure_clients.ensure_containers_exist()
-        except Exception:
-            logger.debug("Could not ensure blob containers; continuing")
         app.state.azure_clients = azure_clients
+        # Share one container client for deployment records across requests
+        if azure_clients.blob_client is not None:
+            app.state.deployments_container = azure_clients.get_container_client(
+                DEPLOYMENTS_CONTAINER
+            )
         logger.info("Azure clients initialized and attached to app state")
     except Exception:
         logger.exception("Failed to initialize Azure/OpenAI clients; attaching manager anyway")
@@ -81,26 +71,73 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         # can inspect and raise more helpful errors.
         app.state.azure_clients = azure_clients
     
+    # Shared OpenAI client for endpoints that call the API directly, so each
+    # request reuses one connection pool instead of opening its own. The
+    # client manager's instance is reused when it created one.
+    app.state.openai = azure_clients.openai_client
+    owns_openai_client = False
+    if app.state.openai is None and settings.OPENAI_API_KEY:
+        try:
+            from app.core.openai_client import create_async_openai_client
+            app.state.openai = create_async_openai_client()
+            owns_openai_client = True
+        except ImportError:
+            logger.warning("openai package not installed; direct OpenAI endpoints are unavailable")
+    
+    # Create missing containers and open pooled connections (so the first
+    # requests skip TLS handshakes) concurrently; a failure in either is
+    # logged and startup continues
+    app.state.warm_connections = 0
+    containers_result, warm_result = await asyncio.gather(
+        azure_clients.ensure_containers_exist(),
+        azure_clients.warm_up(settings.CONNECTION_WARMUP_COUNT, openai_client=app.state.openai),
+        return_exceptions=True,
+    )
+    if isinstance(containers_result, Exception):
+        logger.debug("Could not ensure blob containers; continuing")
+    if isinstance(warm_result, Exception):
+        logger.warning("Connection warm-up failed: %s", warm_result)
+    else:
+        app.state.warm_connections = warm_result
+    
     logger.info("Backend started successfully")
     yield
     
     # Cleanup
     logger.info("Shutting down Azure Architect Backend...")
+    
+    if owns_openai_client:
+        try:
+            await app.state.openai.close()
+        except Exception as e:
+            logger.warning("Error closing OpenAI client: %s", e)
+    
     try:
-        # Cleanup MCP tools
-        from app.deps import cleanup_mcp_tools
-        await cleanup_mcp_tools()
+        # Write any debounced project updates before storage clients close
+        from app.api.endpoints.projects import flush_pending_writes
+        await flush_pending_writes()
     except Exception as e:
-        logger.warning(f"Error cleaning up MCP tools: {e}")
+        logger.warning("Error saving pending project changes: %s", e)
     
     try:
         await azure_clients.cleanup()
     except Exception as e:
-        logger.warning(f"Error cleaning up Azure clients: {e}")
+        logger.warning("Error cleaning up Azure clients: %s", e)
     
     logger.info("Backend shutdown complete")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Run the application lifespan inside the MCP tools' lifespan.
+    
+    The MCP tool sessions open in the background while the application
+    starts, and close after it has shut down.
+    """
+    async with mcp_tools_lifespan(), app_lifespan(app):
+        yield
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Azure Architect Backend",
@@ -109,8 +146,29 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# Add middleware
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Add middleware. starlette-compress negotiates zstd/brotli/gzip from
+# Accept-Encoding when installed; otherwise responses are gzipped. WebSocket
+# and streamed responses are never compressed so chunks go out immediately.
+if CompressMiddleware is not None:
+    app.add_middleware(
+        SelectiveCompressionMiddleware,
+        compressor=CompressMiddleware,
+        exclude_paths=["/ws"],
+        minimum_size=1000,
+        zstd_level=4,
+        brotli_quality=4,
+        gzip_level=settings.GZIP_LEVEL,
+    )
+else:
+    app.add_middleware(
+        SelectiveCompressionMiddleware,
+        compressor=GZipMiddleware,
+        exclude_paths=["/ws"],
+        minimum_size=1000,
+        compresslevel=settings.GZIP_LEVEL,
+    )
+if settings.PROFILE:
+    app.add_middleware(ProfileMiddleware, output_dir=settings.PROFILE_DIR)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,